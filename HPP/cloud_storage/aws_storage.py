@@ -1,5 +1,7 @@
 import boto3
 from HPP.configuration.aws_connection import S3Client
+from HPP.cloud_storage.model_cache import ModelFileCache
+from HPP.cloud_storage.s3_transfer import S3TransferManager
 from io import StringIO
 from typing import Union,List
 import os,sys
@@ -8,6 +10,7 @@ from mypy_boto3_s3.service_resource import Bucket
 from HPP.exception import CustomException
 from botocore.exceptions import ClientError
 from pandas import DataFrame,read_csv
+from HPP.utils.main_utils import load_object
 import pickle
 
 class SimpleStorageService:
@@ -15,6 +18,8 @@ class SimpleStorageService:
         s3_client=S3Client()
         self.s3_resource=s3_client.s3_resource
         self.s3_client=s3_client.s3_client
+        self.transfer=S3TransferManager(self.s3_client)
+        self.model_cache=ModelFileCache()
     
     def s3_key_path_available(self,bucketname,s3_key)->bool:
         try:
@@ -101,10 +106,31 @@ class SimpleStorageService:
         except Exception as e:
             raise CustomException(e, sys) from e
 
-    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
+    def download_model_file(self, model_name: str, bucket_name: str, model_dir: str = None, etag: str = None) -> str:
+        """
+        Method Name :   download_model_file
+        Description :   This method makes the model_name model of bucket_name bucket available on the local disk
+                        through the model cache, it is downloaded only when the cached version is not current
+
+        Output      :   Local path of the model file
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the download_model_file method of S3Operations class")
+
+        try:
+            model_file = model_name if model_dir is None else model_dir + "/" + model_name
+            file_path = self.model_cache.get_file(self.transfer, bucket_name, model_file, etag=etag)
+            logging.info("Exited the download_model_file method of S3Operations class")
+            return file_path
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None, etag: str = None) -> object:
         """
         Method Name :   load_model
-        Description :   This method loads the model_name model from bucket_name bucket with kwargs
+        Description :   This method loads the model_name model from bucket_name bucket with kwargs,
+                        through the local model cache when it is enabled
 
         Output      :   list of objects or object is returned based on filename
         On Failure  :   Write an exception log and then raise an exception
@@ -115,6 +141,10 @@ class SimpleStorageService:
         logging.info("Entered the load_model method of S3Operations class")
 
         try:
+            if self.model_cache.enabled:
+                model = load_object(self.download_model_file(model_name, bucket_name, model_dir=model_dir, etag=etag))
+                logging.info("Exited the load_model method of S3Operations class")
+                return model
             func = (
                 lambda: model_name
                 if model_dir is None
@@ -122,7 +152,7 @@ class SimpleStorageService:
             )
             model_file = func()
             file_object = self.get_file_object(model_file, bucket_name)
-            model_obj = self.read_object(file_object, decode=True)
+            model_obj = self.read_object(file_object, decode=False)
             model = pickle.loads(model_obj)
             logging.info("Exited the load_model method of S3Operations class")
             return model
@@ -130,6 +160,29 @@ class SimpleStorageService:
         except Exception as e:
             raise CustomException(e, sys) from e
 
+    def get_object_etag(self, key: str, bucket_name: str) -> Union[str, None]:
+        """
+        Method Name :   get_object_etag
+        Description :   This method fetches the ETag of the key object in bucket_name bucket with a HEAD request
+
+        Output      :   ETag of the object is returned, None if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the get_object_etag method of S3Operations class")
+
+        try:
+            etag = self.s3_resource.Object(bucket_name, key).e_tag
+            logging.info("Exited the get_object_etag method of S3Operations class")
+            return etag
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise CustomException(e, sys) from e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         Method Name :   create_folder
@@ -157,7 +210,8 @@ class SimpleStorageService:
     def upload_file(self, from_filename: str, to_filename: str,  bucket_name: str,  remove: bool = True):
         """
         Method Name :   upload_file
-        Description :   This method uploads the from_filename file to bucket_name bucket with to_filename as bucket filename
+        Description :   This method uploads the from_filename file to bucket_name bucket with to_filename as bucket filename,
+                        in parallel parts above the multipart threshold, and verifies the checksum of the object
 
         Output      :   Folder is created in s3 bucket
         On Failure  :   Write an exception log and then raise an exception
@@ -172,9 +226,7 @@ class SimpleStorageService:
                 f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket"
             )
 
-            self.s3_resource.meta.client.upload_file(
-                from_filename, bucket_name, to_filename
-            )
+            self.transfer.upload_file(from_filename, bucket_name, to_filename)
 
             logging.info(
                 f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket"
@@ -193,6 +245,60 @@ class SimpleStorageService:
         except Exception as e:
             raise CustomException(e, sys) from e
 
+    def download_file(self, key: str, bucket_name: str, file_path: str) -> None:
+        """
+        Method Name :   download_file
+        Description :   This method downloads the key object of bucket_name bucket to file_path, with parallel
+                        ranged requests above the multipart threshold, and verifies its checksum
+
+        Output      :   File is written to file_path
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the download_file method of S3Operations class")
+
+        try:
+            self.transfer.download_file(bucket_name, key, file_path)
+            logging.info("Exited the download_file method of S3Operations class")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def upload_directory(self, local_dir: str, prefix: str, bucket_name: str) -> dict:
+        """
+        Method Name :   upload_directory
+        Description :   This method uploads every file under local_dir to the prefix folder of bucket_name bucket,
+                        skipping files whose checksum matches the object already stored
+
+        Output      :   Returns the s3 key of every file with uploaded or skipped
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the upload_directory method of S3Operations class")
+
+        try:
+            results = self.transfer.upload_directory(local_dir, bucket_name, prefix)
+            logging.info("Exited the upload_directory method of S3Operations class")
+            return results
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+    def delete_object(self, key: str, bucket_name: str) -> None:
+        """
+        Method Name :   delete_object
+        Description :   This method deletes the key object from bucket_name bucket, a missing key is not an error
+
+        Output      :   Object is removed from s3 bucket
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the delete_object method of S3Operations class")
+
+        try:
+            self.s3_client.delete_object(Bucket=bucket_name, Key=key)
+            logging.info("Exited the delete_object method of S3Operations class")
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
     def upload_df_as_csv(self,data_frame: DataFrame,local_filename: str, bucket_filename: str,bucket_name: str,) -> None:
         """
         Method Name :   upload_df_as_csv
@@ -0,0 +1,170 @@
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from botocore.exceptions import ClientError
+
+from HPP.cloud_storage.s3_transfer import S3TransferManager, normalize_etag
+from HPP.entity.config_entity import ModelCacheConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on windows, a process local lock is used instead
+    fcntl = None
+
+LOCK_FILE_NAME = ".lock"
+LATEST_FILE_NAME = ".latest"
+PART_FILE_SUFFIX = ".part"
+
+
+class ModelFileCache:
+    """
+    This class keeps the model files downloaded from s3 on the local disk, keyed by bucket,
+    key and ETag, so that process starts and model reloads do not download an unchanged model
+    again. When the ETag is known (the model registry gets it with a HEAD request) a cached file
+    is used without any request and a missing one is downloaded with parallel ranged GETs,
+    otherwise a conditional GET (If-None-Match) returns 304 for an unchanged model.
+    Downloads are streamed to a temporary file and renamed into place while
+    holding a file lock, so worker processes sharing the directory download a version once and
+    never read a partial file. Only the newest versions of every key are kept.
+    """
+    def __init__(self, model_cache_config: ModelCacheConfig = ModelCacheConfig()):
+        """
+        :param model_cache_config: Configuration with the cache directory and the number of versions to keep
+        """
+        self.model_cache_config = model_cache_config
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.model_cache_config.enabled
+
+    def get_entry_dir(self, bucket_name: str, key: str) -> str:
+        return os.path.join(self.model_cache_config.cache_dir, bucket_name, *key.split("/"))
+
+    @staticmethod
+    def get_version_path(entry_dir: str, key: str, etag: str) -> str:
+        # the extension of the key is kept, loaders such as numpy look at it
+        return os.path.join(entry_dir, etag + os.path.splitext(key)[1])
+
+    @contextmanager
+    def _lock(self, entry_dir: str) -> Iterator[None]:
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+        with open(os.path.join(entry_dir, LOCK_FILE_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_latest(entry_dir: str) -> Optional[str]:
+        try:
+            with open(os.path.join(entry_dir, LATEST_FILE_NAME)) as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_latest(entry_dir: str, etag: str) -> None:
+        file_descriptor, tmp_file_path = tempfile.mkstemp(dir=entry_dir, suffix=PART_FILE_SUFFIX)
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(etag)
+        os.replace(tmp_file_path, os.path.join(entry_dir, LATEST_FILE_NAME))
+
+    def get_file(self, s3_transfer: S3TransferManager, bucket_name: str, key: str, etag: Optional[str] = None) -> str:
+        """
+        Returns the local path of the key object, downloading it unless the cached version is current
+        :param s3_transfer: transfer manager of the s3 client
+        :param etag: ETag of the version wanted, when None the latest cached version is revalidated
+        """
+        try:
+            entry_dir = self.get_entry_dir(bucket_name, key)
+            etag = normalize_etag(etag)
+            if etag is not None and os.path.exists(self.get_version_path(entry_dir, key, etag)):
+                logging.info(f"Model cache hit for {bucket_name}/{key} version {etag}")
+                return self.get_version_path(entry_dir, key, etag)
+            os.makedirs(entry_dir, exist_ok=True)
+            with self._lock(entry_dir):
+                # another worker may have downloaded it while this one waited for the lock
+                if etag is not None and os.path.exists(self.get_version_path(entry_dir, key, etag)):
+                    logging.info(f"Model cache hit for {bucket_name}/{key} version {etag}")
+                    return self.get_version_path(entry_dir, key, etag)
+                self._remove_partial_files(entry_dir)
+                if etag is not None:
+                    file_descriptor, tmp_file_path = tempfile.mkstemp(dir=entry_dir, suffix=PART_FILE_SUFFIX)
+                    os.close(file_descriptor)
+                    head = s3_transfer.download_file(bucket_name, key, tmp_file_path)
+                    if head is not None and normalize_etag(head["ETag"]) == etag:
+                        file_path = self.get_version_path(entry_dir, key, etag)
+                        os.replace(tmp_file_path, file_path)
+                        self._write_latest(entry_dir, etag)
+                        logging.info(f"Model cache downloaded {bucket_name}/{key} version {etag}, "
+                                     f"{os.path.getsize(file_path)} bytes")
+                        self._prune(entry_dir, keep=file_path)
+                        return file_path
+                    # the object changed since its ETag was read, the file may hold either version
+                    os.remove(tmp_file_path)
+                latest = self._read_latest(entry_dir)
+                request = {"Bucket": bucket_name, "Key": key}
+                if etag is None and latest is not None and os.path.exists(self.get_version_path(entry_dir, key, latest)):
+                    request["IfNoneMatch"] = f'"{latest}"'
+                try:
+                    response = s3_transfer.s3_client.get_object(**request)
+                except ClientError as e:
+                    if "IfNoneMatch" in request and e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+                        logging.info(f"Model cache revalidated {bucket_name}/{key} version {latest}")
+                        return self.get_version_path(entry_dir, key, latest)
+                    raise
+                downloaded_etag = normalize_etag(response["ETag"])
+                file_path = self.get_version_path(entry_dir, key, downloaded_etag)
+                size = self._stream_to_file(response["Body"], entry_dir, file_path)
+                self._write_latest(entry_dir, downloaded_etag)
+                logging.info(f"Model cache downloaded {bucket_name}/{key} version {downloaded_etag}, {size} bytes")
+                self._prune(entry_dir, keep=file_path)
+                return file_path
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _stream_to_file(self, body, entry_dir: str, file_path: str) -> int:
+        file_descriptor, tmp_file_path = tempfile.mkstemp(dir=entry_dir, suffix=PART_FILE_SUFFIX)
+        size = 0
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                for chunk in body.iter_chunks(chunk_size=self.model_cache_config.chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_file_path, file_path)
+            return size
+        except BaseException:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
+
+    @staticmethod
+    def _remove_partial_files(entry_dir: str) -> None:
+        # called under the lock, partial files left are from downloads which crashed
+        for name in os.listdir(entry_dir):
+            if name.endswith(PART_FILE_SUFFIX):
+                os.remove(os.path.join(entry_dir, name))
+
+    def _prune(self, entry_dir: str, keep: str) -> None:
+        """
+        Removes all but the newest keep_versions versions, processes still reading an older
+        version keep their open file
+        """
+        versions = [os.path.join(entry_dir, name) for name in os.listdir(entry_dir)
+                    if not name.startswith(".") and not name.endswith(PART_FILE_SUFFIX)]
+        versions.sort(key=os.path.getmtime, reverse=True)
+        for file_path in versions[max(self.model_cache_config.keep_versions, 1):]:
+            if file_path != keep:
+                os.remove(file_path)
+                logging.info(f"Model cache removed old version {file_path}")
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from HPP.entity.config_entity import S3TransferConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+MB = 1024 * 1024
+# s3 limits of multipart uploads, boto3 grows the part size the same way to stay below them
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+UPLOADED = "uploaded"
+SKIPPED = "skipped"
+
+
+def md5(data: bytes = b""):
+    """
+    md5 of data for ETags, marked as not used for security where python supports it (3.9+),
+    so it also works on FIPS builds
+    """
+    try:
+        return hashlib.md5(data, usedforsecurity=False)
+    except TypeError:
+        return hashlib.md5(data)
+
+
+def normalize_etag(etag: Optional[str]) -> Optional[str]:
+    """
+    ETag without the quotes s3 wraps it in, usable as a file name
+    """
+    return etag.strip('"') if etag else None
+
+
+class S3TransferManager:
+    """
+    This class moves files between the local disk and s3 with the boto3 transfer manager, tuned
+    by S3TransferConfig: files above the multipart threshold are uploaded in parts and downloaded
+    with ranged GETs, max_concurrency parts at a time, always streamed from and to disk.
+    Uploads carry the sha256 of the file in the object metadata and are checked against the
+    ETag s3 computed (the md5 of the file, or of its parts for multipart uploads), downloads are
+    checked against the sha256 and only renamed into place once complete.
+    """
+    def __init__(self, s3_client, s3_transfer_config: S3TransferConfig = S3TransferConfig()):
+        """
+        :param s3_client: boto3 s3 client
+        :param s3_transfer_config: Configuration with the multipart threshold, chunk size and concurrency
+        """
+        self.s3_client = s3_client
+        self.s3_transfer_config = s3_transfer_config
+        self.transfer_config = TransferConfig(multipart_threshold=s3_transfer_config.multipart_threshold_mb * MB,
+                                              multipart_chunksize=s3_transfer_config.multipart_chunk_size_mb * MB,
+                                              max_concurrency=s3_transfer_config.max_concurrency,
+                                              use_threads=s3_transfer_config.max_concurrency > 1)
+        # upload_directory already runs max_concurrency files at a time, its files are sent part by part
+        # so that the connections in use stay at max_concurrency instead of its square
+        self.serial_transfer_config = TransferConfig(multipart_threshold=self.transfer_config.multipart_threshold,
+                                                     multipart_chunksize=self.transfer_config.multipart_chunksize,
+                                                     max_concurrency=1, use_threads=False)
+
+    def get_part_size(self, size: int) -> int:
+        part_size = max(self.transfer_config.multipart_chunksize, MIN_PART_SIZE)
+        while -(-size // part_size) > MAX_PARTS:
+            part_size *= 2
+        return part_size
+
+    def hash_file(self, file_path: str) -> Tuple[str, str]:
+        """
+        Returns the ETag s3 gives the file when uploaded with this configuration and its sha256, in one read
+        """
+        size = os.path.getsize(file_path)
+        multipart = size >= self.transfer_config.multipart_threshold
+        part_size = self.get_part_size(size) if multipart else MIN_PART_SIZE
+        sha256 = hashlib.sha256()
+        file_md5 = md5()
+        part_digests = []
+        with open(file_path, "rb") as file:
+            for part in iter(lambda: file.read(part_size), b""):
+                sha256.update(part)
+                if multipart:
+                    part_digests.append(md5(part).digest())
+                else:
+                    file_md5.update(part)
+        if not multipart:
+            return file_md5.hexdigest(), sha256.hexdigest()
+        etag = md5(b"".join(part_digests)).hexdigest()
+        return f"{etag}-{len(part_digests)}", sha256.hexdigest()
+
+    def head_object(self, bucket_name: str, key: str) -> Optional[dict]:
+        try:
+            return self.s3_client.head_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+
+    def upload_file(self, from_filename: str, bucket_name: str, key: str, skip_unchanged: bool = False,
+                    transfer_config: Optional[TransferConfig] = None) -> str:
+        """
+        Uploads a file, verifying the object s3 stored against the local file
+        :param skip_unchanged: do not upload when the object already holds a file with the same sha256
+        :param transfer_config: boto3 transfer configuration, the one of S3TransferConfig when None
+        :return: uploaded or skipped
+        """
+        try:
+            etag, sha256 = self.hash_file(from_filename)
+            metadata_key = self.s3_transfer_config.checksum_metadata_key
+            if skip_unchanged:
+                head = self.head_object(bucket_name, key)
+                if head is not None and head.get("Metadata", {}).get(metadata_key) == sha256:
+                    return SKIPPED
+            self.s3_client.upload_file(from_filename, bucket_name, key, ExtraArgs={"Metadata": {metadata_key: sha256}},
+                                       Config=transfer_config or self.transfer_config)
+            if self.s3_transfer_config.verify_checksums:
+                head = self.head_object(bucket_name, key)
+                # with kms or customer key encryption the ETag is not an md5 of the content
+                encrypted = head.get("ServerSideEncryption") == "aws:kms" or "SSECustomerAlgorithm" in head
+                if not encrypted and normalize_etag(head["ETag"]) != etag:
+                    raise Exception(f"Checksum mismatch after uploading {from_filename} to {bucket_name}/{key}: "
+                                    f"expected ETag {etag}, got {head['ETag']}")
+            return UPLOADED
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def download_file(self, bucket_name: str, key: str, file_path: str) -> dict:
+        """
+        Downloads an object to file_path through a temporary file in the same directory, so
+        file_path never holds a partial download
+        :return: metadata (HEAD response) of the object read after the download
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(file_path))
+            os.makedirs(directory, exist_ok=True)
+            file_descriptor, tmp_file_path = tempfile.mkstemp(dir=directory, suffix=".part")
+            os.close(file_descriptor)
+            try:
+                self.s3_client.download_file(bucket_name, key, tmp_file_path, Config=self.transfer_config)
+                head = self.head_object(bucket_name, key)
+                expected = (head or {}).get("Metadata", {}).get(self.s3_transfer_config.checksum_metadata_key)
+                if self.s3_transfer_config.verify_checksums and expected is not None \
+                        and self.hash_file(tmp_file_path)[1] != expected:
+                    raise Exception(f"Checksum mismatch after downloading {bucket_name}/{key}")
+                os.replace(tmp_file_path, file_path)
+                return head
+            finally:
+                if os.path.exists(tmp_file_path):
+                    os.remove(tmp_file_path)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def upload_directory(self, local_dir: str, bucket_name: str, prefix: str, skip_unchanged: bool = True) -> Dict[str, str]:
+        """
+        Uploads every file under local_dir to prefix, max_concurrency files at a time with the
+        parts of each file uploaded one after the other
+        :return: key -> uploaded or skipped
+        """
+        try:
+            files = {}
+            for root, _, file_names in os.walk(local_dir):
+                for file_name in file_names:
+                    file_path = os.path.join(root, file_name)
+                    relative_path = os.path.relpath(file_path, local_dir).replace(os.sep, "/")
+                    files[f"{prefix.rstrip('/')}/{relative_path}"] = file_path
+            with ThreadPoolExecutor(max_workers=max(self.s3_transfer_config.max_concurrency, 1)) as executor:
+                futures = {key: executor.submit(self.upload_file, file_path, bucket_name, key, skip_unchanged,
+                                                self.serial_transfer_config)
+                           for key, file_path in files.items()}
+                results = {key: future.result() for key, future in futures.items()}
+            uploaded = sum(result == UPLOADED for result in results.values())
+            logging.info(f"Uploaded {uploaded} files of {local_dir} to {bucket_name}/{prefix}, "
+                         f"{len(results) - uploaded} unchanged files skipped")
+            return results
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -4,10 +4,15 @@ import sys
 from HPP.logger import logging
 from HPP.utils import *
 from HPP.exception import CustomException
+from HPP.constants import DATA_INGESTION_WATERMARK_FIELD
 from HPP.entity.config_entity import DataIngestionConfig
 from HPP.entity.artifact_entity import DataIngestionArtifact
 from HPP.data_access.HP_data_access import HPData
+from HPP.utils.main_utils import save_dataframe, load_dataframe, read_yaml, write_yaml
 import os
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
 from sklearn.model_selection import train_test_split
 
 
@@ -19,23 +24,112 @@ class DataIngestion:
         except Exception as e:
             logging.info(e)
             raise CustomException(e)
+    def read_ingestion_state(self)->Optional[dict]:
+        """
+        Method Name :   read_ingestion_state
+        Description :   This method reads the watermark of the last ingestion run
+        
+        Output      :   state dict, None when the next run has to be a full refresh
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config=self.data_ingestion_config
+            if config.full_refresh:
+                logging.info("Full refresh of the feature store requested")
+                return None
+            if not (os.path.exists(config.state_file_path) and os.path.exists(config.master_feature_store_path)):
+                logging.info("No ingestion state found, doing a full refresh of the feature store")
+                return None
+            state=read_yaml(filepath=config.state_file_path)
+            if state.get("watermark_field")!=config.watermark_field:
+                logging.info(f"Watermark field changed from {state.get('watermark_field')} to {config.watermark_field}, "
+                             f"doing a full refresh of the feature store")
+                return None
+            return state
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    @staticmethod
+    def _encode_watermark(value)->dict:
+        if isinstance(value,ObjectId):
+            return {"watermark":str(value),"watermark_type":"objectid"}
+        if isinstance(value,(pd.Timestamp,datetime)):
+            return {"watermark":pd.Timestamp(value).isoformat(),"watermark_type":"datetime"}
+        return {"watermark":value.item() if isinstance(value,np.generic) else value,"watermark_type":"value"}
+
+    @staticmethod
+    def _decode_watermark(state:dict):
+        if state["watermark_type"]=="objectid":
+            return ObjectId(state["watermark"])
+        if state["watermark_type"]=="datetime":
+            return pd.Timestamp(state["watermark"]).to_pydatetime()
+        return state["watermark"]
+
+    def get_incremental_query(self,state:dict)->dict:
+        """
+        documents after the watermark. _id only grows so the boundary is exclusive,
+        for an update timestamp documents written in the same instant as the watermark
+        are read again and de-duplicated on _id while merging
+        """
+        field=self.data_ingestion_config.watermark_field
+        operator="$gt" if field=="_id" else "$gte"
+        return {field:{operator:self._decode_watermark(state)}}
+
     def export_data_into_featurestore(self)->pd.DataFrame:
         """
         Method Name :   export_data_into_feature_store
-        Description :   This method exports data from mongodb to csv file
+        Description :   This method exports data from mongodb to parquet file. Only documents after the
+                        watermark of the last run are fetched and merged into the master feature store kept in
+                        the ingestion state directory, the first run and full_refresh export the whole collection.
+                        With an update timestamp as watermark field added and updated documents are fetched, with
+                        the default _id only added ones. Documents deleted in mongodb are only dropped by a full refresh.
         
         Output      :   data is returned as artifact of data ingestion components
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            logging.info(f"Exporting data from mongo db")
+            config=self.data_ingestion_config
             HPP_data=HPData()
-            dataframe=HPP_data.export_collection_as_df(collection_name=self.data_ingestion_config.collection_name)
+            state=self.read_ingestion_state()
+            query=None if state is None else self.get_incremental_query(state)
+            if query is not None and config.watermark_field=="_id":
+                logging.warning(f"Incremental ingestion on the _id watermark only fetches documents inserted since the "
+                                f"last run, updated documents are missed until a full refresh. Set "
+                                f"{DATA_INGESTION_WATERMARK_FIELD} to an update timestamp field to fetch them")
+            logging.info(f"Exporting data from mongo db with query {query}")
+            new_df=HPP_data.export_collection_as_df(collection_name=config.collection_name,
+                                                    query=query,
+                                                    chunk_size=config.export_batch_size,
+                                                    n_partitions=config.export_partitions,
+                                                    include_id=True)
+            logging.info(f"Fetched {len(new_df)} documents from mongo db")
+            if len(new_df)>0 and (config.watermark_field not in new_df or new_df[config.watermark_field].isna().any()):
+                raise Exception(f"Documents without the watermark field {config.watermark_field} can never be "
+                                f"fetched incrementally, fill it in mongodb or change {DATA_INGESTION_WATERMARK_FIELD}")
+            if len(new_df)>0:
+                new_state={"watermark_field":config.watermark_field,
+                           **self._encode_watermark(new_df[config.watermark_field].max()),
+                           "updated_at":datetime.now().isoformat()}
+                new_df["_id"]=new_df["_id"].astype(str)
+            else:
+                new_state=state
+            if state is None:
+                master_df=new_df
+            else:
+                master_df=load_dataframe(config.master_feature_store_path)
+                if len(new_df)>0:
+                    master_df=pd.concat([master_df,new_df],ignore_index=True)
+                    master_df=master_df.drop_duplicates(subset="_id",keep="last").reset_index(drop=True)
+            if len(new_df)>0 or state is None:
+                save_dataframe(config.master_feature_store_path,master_df,compression=config.file_compression)
+                if new_state is not None:
+                    new_state["rows"]=len(master_df)
+                    write_yaml(filepath=config.state_file_path,content=new_state,replace=True)
+                logging.info(f"Master feature store has {len(master_df)} rows, watermark {new_state}")
+            dataframe=master_df.drop(columns=["_id"],errors="ignore")
             logging.info(f"data frame is strored in dataframe varaible and shape of data frame is{dataframe.shape}")
-            feature_store_file_path=self.data_ingestion_config.feature_store_path
-            dir_path=os.path.dirname(feature_store_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
+            feature_store_file_path=config.feature_store_path
+            save_dataframe(feature_store_file_path,dataframe,compression=config.file_compression)
             logging.info(f"Saved Exported data frame into feature store path {feature_store_file_path}")
             return dataframe
         except Exception as e:
@@ -55,30 +149,29 @@ class DataIngestion:
             logging.info(
                 "Exited split_data_as_train_test method of Data_Ingestion class")
             
-            dir_path=os.path.dirname(self.data_ingestion_config.train_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            
             logging.info(f"exporting train and test files to path ")
             
-            train_set.to_csv(self.data_ingestion_config.train_file_path,index=False,header=True)
-            test_set.to_csv(self.data_ingestion_config.test_file_path,index=False,header=True)
+            save_dataframe(self.data_ingestion_config.train_file_path,train_set,compression=self.data_ingestion_config.file_compression)
+            save_dataframe(self.data_ingestion_config.test_file_path,test_set,compression=self.data_ingestion_config.file_compression)
             
             logging.info(f"Exported train and test file to path ")
         except Exception as e:
             logging.info(e)
             raise CustomException(e,sys)
     
-    def initiate_data_ingestion(self,)->DataIngestionArtifact:
+    def initiate_data_ingestion(self,dataframe:Optional[pd.DataFrame]=None)->DataIngestionArtifact:
         """
         Method Name :   initiate_data_ingestion
         Description :   This method initiates the data ingestion components of training pipeline 
         
-        Output      :   train set and test set are returned as the artifacts of data ingestion components
+        Output      :   train set and test set are returned as the artifacts of data ingestion components,
+                        dataframe already exported to the feature store is split without exporting it again
         On Failure  :   Write an exception log and then raise an exception
         """
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
         try:
-            dataframe=self.export_data_into_featurestore()
+            if dataframe is None:
+                dataframe=self.export_data_into_featurestore()
             logging.info("Got the data from Mongodb")
             self.split_data_as_train_test(dataframe)
             logging.info("Performed train test split on dataset")
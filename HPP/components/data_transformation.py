@@ -11,9 +11,10 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder,StandardScaler,OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.model_selection import train_test_split
-from HPP.utils.main_utils import (save_object, save_numpy_array_data, read_yaml,
-                                   drop_columns,convert_sqft_to_num,remove_pps_outliers,
-                                   remove_bhk_outliers)
+from HPP.entity.housing_cleaner import HousingCleaner
+from HPP.pipeline.stage_profiler import get_stage_profiler
+from HPP.utils.main_utils import (save_object, save_numpy_array_data, save_sparse_matrix_data, read_yaml,
+                                   drop_columns, load_dataframe, get_required_columns)
 from HPP.constants import SCHEMA_FILE_PATH,TARGET_COLUMN
 from pathlib import Path
 
@@ -34,9 +35,9 @@ class DataTransformation:
 
     
     @staticmethod
-    def read_data(file_path)->pd.DataFrame:
+    def read_data(file_path,columns:list=None)->pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path,columns=columns)
         except Exception as e:
             raise CustomException(e,sys)
     def get_data_transformer_object(self)->Pipeline:
@@ -59,7 +60,7 @@ class DataTransformation:
             preprocessor=ColumnTransformer([
                 ('OnehotEncoder',oh_transformer,oh_columns),
                 ('StandardScaler',st_transformer,num_columns)
-               ])
+               ],sparse_threshold=1.0)
             
 
             logging.info(f"Created Preprocessor object from columntransformer")
@@ -69,6 +70,19 @@ class DataTransformation:
             raise CustomException(e,sys)
         
     
+    def get_data_cleaner_object(self)->HousingCleaner:
+        """
+        Method Name :   get_data_cleaner_object
+        Description :   This method creates the cleaning stage shared by training, evaluation and serving
+        
+        Output      :   unfitted housing cleaner object is returned
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return HousingCleaner(drop_cols=self._schema_config['drop_columns'])
+        except Exception as e:
+            raise CustomException(e,sys)
+
     def initiate_data_transformation(self)->DataTransformationArtifact:
         """
         Method Name :   initiate_data_transformation
@@ -84,24 +98,14 @@ class DataTransformation:
                 logging.info(f"Got preprocessor object")
                 # train_df=DataTransformation.read_data(self.data_ingestion_artifact.train_file_path)
                 # test_df=DataTransformation.read_data(self.data_ingestion_artifact.test_file_path)
-                Total_df=DataTransformation.read_data(self.data_ingestion_artifact.feature_store_path)
-                print(Total_df.columns)
+                Total_df=DataTransformation.read_data(self.data_ingestion_artifact.feature_store_path,
+                                                      columns=get_required_columns(self._schema_config))
+                logging.info(f"Read feature store columns {list(Total_df.columns)}")
                 # df=DataTransformation.read_data(self.data_ingestion_artifact.feature_store_path)
-                drop_cols = self._schema_config['drop_columns']
-                print(drop_cols)
-                df1=drop_columns(df=Total_df,cols=drop_cols)
-                df1=df1.dropna()
-                df1['no_of_BHK']=df1['size'].apply(lambda x: int(x.split(' ')[0]) if pd.notna(x) else None)
-                df1['total_sqft']=df1['total_sqft'].apply(convert_sqft_to_num)
-                df1['price_per_sqft']=df1['price']*100000/(df1['total_sqft'])
-                location_count=df1['location'].value_counts()
-                location_less_than_10=location_count[location_count<=10]
-                df1['location']=df1['location'].apply(lambda x:"other" if x in location_less_than_10 else x)
-                df2=df1[~(df1['total_sqft']/df1['no_of_BHK']<300)]
-                df3=remove_pps_outliers(df2)
-                df4=remove_bhk_outliers(df3)
-                df5=df4[df4.bath<df4.no_of_BHK+2]
-                df6=drop_columns(df=df5,cols=['size','price_per_sqft'])
+                cleaner=self.get_data_cleaner_object()
+                with get_stage_profiler().step("cleaning",rows=len(Total_df)):
+                    cleaner.fit(Total_df)
+                    df6=cleaner.clean(Total_df)
                 print(df6)
                 train_set,test_set=train_test_split(df6,test_size=DataIngestionConfig.train_test_split_ratio)
                 # if df6.isna().sum().sum() > 0:
@@ -112,55 +116,40 @@ class DataTransformation:
                 input_feature_train_df=drop_columns(df=train_set,cols=['price'])
                 output_feature_train_df=train_set['price']
                 # test_df=DataTransformation.read_data(self.data_ingestion_artifact.test_file_path)
-                transformed_train_array=preprocessor.fit_transform(input_feature_train_df)
-                print(transformed_train_array.toarray())
-                logging.info("drop the columns in drop_cols of Test dataset")
-                input_feature_test_df=drop_columns(df=test_set,cols=['price'])
-                output_feature_test_df=test_set['price']
-                transformed_test_array=preprocessor.transform(input_feature_test_df)
-                
-                
-                transformed_train_array_dense = transformed_train_array.toarray()
-                transformed_test_array_dense = transformed_test_array.toarray()
-
-                # Reshape the target arrays if needed
-                output_feature_train_df = np.array(output_feature_train_df).reshape(-1, 1)
-                output_feature_test_df = np.array(output_feature_test_df).reshape(-1, 1)
-
-                print("Reshaped output feature train array shape:", output_feature_train_df.shape)
-                print("Reshaped output feature test array shape:", output_feature_test_df.shape)
-
-                print("Transformed train array (dense) shape:", transformed_train_array_dense.shape)
-                print("Output feature train array shape:", output_feature_train_df.shape)
-
-                print("Transformed test array (dense) shape:", transformed_test_array_dense.shape)
-                print("Output feature test array shape:", output_feature_test_df.shape)
+                with get_stage_profiler().step("preprocessing",rows=len(df6)):
+                    transformed_train_array=preprocessor.fit_transform(input_feature_train_df).tocsr()
+                    logging.info("drop the columns in drop_cols of Test dataset")
+                    input_feature_test_df=drop_columns(df=test_set,cols=['price'])
+                    output_feature_test_df=test_set['price']
+                    transformed_test_array=preprocessor.transform(input_feature_test_df).tocsr()
 
-                # Check dimensions before concatenation
-                assert transformed_train_array_dense.shape[0] == output_feature_train_df.shape[0], "Mismatch in number of rows between transformed train array and output feature train array"
-                assert transformed_test_array_dense.shape[0] == output_feature_test_df.shape[0], "Mismatch in number of rows between transformed test array and output feature test array"
+                output_feature_train_arr=output_feature_train_df.to_numpy(dtype=np.float64)
+                output_feature_test_arr=output_feature_test_df.to_numpy(dtype=np.float64)
 
-                # Concatenate transformed arrays with target arrays
-                train_arr = np.c_[transformed_train_array_dense, output_feature_train_df]
-                test_arr = np.c_[transformed_test_array_dense, output_feature_test_df]
+                logging.info(f"Transformed train matrix shape: {transformed_train_array.shape}, nnz: {transformed_train_array.nnz}")
+                logging.info(f"Transformed test matrix shape: {transformed_test_array.shape}, nnz: {transformed_test_array.nnz}")
 
-                print("Train array shape after concatenation:", train_arr.shape)
-                print("Test array shape after concatenation:", test_arr.shape)
+                # Check dimensions before saving
+                assert transformed_train_array.shape[0] == output_feature_train_arr.shape[0], "Mismatch in number of rows between transformed train array and output feature train array"
+                assert transformed_test_array.shape[0] == output_feature_test_arr.shape[0], "Mismatch in number of rows between transformed test array and output feature test array"
 
-  
-                # print(train_arr.shape)
-                # print(test_arr.shape)         
                 save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-                save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-                save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+                save_object(self.data_transformation_config.cleaner_object_file_path, cleaner)
+                save_sparse_matrix_data(self.data_transformation_config.transformed_train_file_path, matrix=transformed_train_array)
+                save_sparse_matrix_data(self.data_transformation_config.transformed_test_file_path, matrix=transformed_test_array)
+                save_numpy_array_data(self.data_transformation_config.transformed_train_target_file_path, array=output_feature_train_arr)
+                save_numpy_array_data(self.data_transformation_config.transformed_test_target_file_path, array=output_feature_test_arr)
 
                 logging.info("Saved the preprocessor object")
                 logging.info(
                     "Exited initiate_data_transformation method of Data_Transformation class"
                 )
                 data_transformation_artifact=DataTransformationArtifact(transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
+                                                                        cleaner_object_file_path=self.data_transformation_config.cleaner_object_file_path,
                                                                         transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                                                                        transformed_test_file_path=self.data_transformation_config.transformed_test_file_path) 
+                                                                        transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                                                                        transformed_train_target_file_path=self.data_transformation_config.transformed_train_target_file_path,
+                                                                        transformed_test_target_file_path=self.data_transformation_config.transformed_test_target_file_path) 
                 return data_transformation_artifact
             else:
                 logging.info(self.data_validation_artifact.message)
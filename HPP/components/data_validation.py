@@ -7,7 +7,7 @@ from evidently.model_profile.sections import DataDriftProfileSection
 
 from HPP.exception import CustomException
 from HPP.logger import logging
-from HPP.utils.main_utils import read_yaml,write_yaml
+from HPP.utils.main_utils import read_yaml,write_yaml,load_dataframe
 
 from HPP.entity.config_entity import DataValidationConfig
 from HPP.entity.artifact_entity import DataValidationArtifact,DataIngestionArtifact
@@ -70,9 +70,9 @@ class DataValidation:
             logging.error(e)
             raise CustomException(e,sys)
     @staticmethod
-    def read_data(file_path)->pd.DataFrame:
+    def read_data(file_path,columns:list=None)->pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path,columns=columns)
         except Exception as e:
             raise CustomException(e,sys)
     
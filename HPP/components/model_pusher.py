@@ -5,6 +5,18 @@ from HPP.logger import logging
 from HPP.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact
 from HPP.entity.config_entity import ModelPusherConfig
 from HPP.entity.s3_estimator import HPPEstimator
+from HPP.entity.estimator import HPPModel
+from HPP.entity.feature_encoder import FeatureEncoder
+from HPP.entity.price_lookup_table import PriceLookupTable
+from HPP.entity.serving_model import ServingModel
+from HPP.entity.tree_ensemble import (TreeEnsemble, compile_tree_ensemble, benchmark_tree_ensemble,
+                                      get_max_faster_batch_rows)
+from typing import Optional
+from pandas import DataFrame
+from HPP.utils.main_utils import load_object, save_object
+from HPP.pipeline.stage_profiler import files_size, get_stage_profiler
+import numpy as np
+import time
 
 
 class ModelPusher:
@@ -19,6 +31,149 @@ class ModelPusher:
         self.model_pusher_config = model_pusher_config
         self.Hpp_estimator = HPPEstimator(bucket_name=model_pusher_config.bucket_name,
                                 model_path=model_pusher_config.s3_model_key_path)
+        self.serving_estimator = HPPEstimator(bucket_name=model_pusher_config.bucket_name,
+                                              model_path=model_pusher_config.s3_serving_model_key_path)
+
+    def compile_model(self, hpp_model: HPPModel) -> Optional[TreeEnsemble]:
+        """
+        Method Name :   compile_model
+        Description :   This function exports the trained tree model to a flat tree ensemble, checks that it
+                        predicts the same as the library on probe inputs and benchmarks both to find the
+                        batch sizes it should serve. compiled_model of the HPPModel is set unless the
+                        library is always faster
+
+        Output      :   Returns the verified tree ensemble, None when the model cannot be compiled or the predictions differ
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            try:
+                tree_ensemble = compile_tree_ensemble(hpp_model.trained_model_object)
+            except Exception as e:
+                logging.info(f"Serving the library model, it could not be compiled: {e}")
+                return None
+            probe = tree_ensemble.make_probe_matrix()
+            max_error = float(np.abs(tree_ensemble.predict(probe) - hpp_model.trained_model_object.predict(probe)).max())
+            logging.info(f"Compiled {tree_ensemble.n_trees} trees, max abs error on probe inputs: {max_error}")
+            if max_error > self.model_pusher_config.compile_tolerance:
+                logging.info(f"Serving the library model, compiled model error is above {self.model_pusher_config.compile_tolerance}")
+                return None
+            latency_report = benchmark_tree_ensemble(hpp_model.trained_model_object, tree_ensemble, probe,
+                                                     batch_sizes=self.model_pusher_config.benchmark_batch_sizes)
+            tree_ensemble.max_batch_rows = get_max_faster_batch_rows(latency_report)
+            tree_ensemble.save(self.model_pusher_config.compiled_model_file_path)
+            if tree_ensemble.max_batch_rows == 0:
+                logging.info("Library model is faster than the compiled model at every batch size")
+            else:
+                logging.info(f"Compiled model serves batches of up to {tree_ensemble.max_batch_rows} rows")
+                hpp_model.compiled_model = tree_ensemble
+            return tree_ensemble
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def attach_feature_encoder(self, hpp_model: HPPModel) -> bool:
+        """
+        Method Name :   attach_feature_encoder
+        Description :   This function exports the cleaner and preprocessor as a FeatureEncoder for single
+                        record predictions and checks its features against the sklearn path on probe inputs
+
+        Output      :   Returns True when the encoder was set on the model
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            try:
+                feature_encoder = FeatureEncoder.from_hpp_model(hpp_model)
+            except Exception as e:
+                logging.info(f"No feature encoder exported: {e}")
+                return False
+            max_error = feature_encoder.check_parity(hpp_model)
+            logging.info(f"Feature encoder max abs feature error on probe inputs: {max_error}")
+            if max_error > self.model_pusher_config.encoder_tolerance:
+                logging.info(f"No feature encoder exported, its error is above {self.model_pusher_config.encoder_tolerance}")
+                return False
+            hpp_model.feature_encoder = feature_encoder
+            return True
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def build_lookup_table(self, hpp_model: HPPModel, tree_ensemble: TreeEnsemble) -> bool:
+        """
+        Method Name :   build_lookup_table
+        Description :   This function predicts every location x BHK x bath cell of the form input grid at one
+                        total_sqft per interval between the total_sqft split thresholds of the trees, stores
+                        the prices as a PriceLookupTable and checks its lookups against the model on random
+                        records of the grid
+
+        Output      :   Returns True when the lookup table was set on the model
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            try:
+                feature_encoder = FeatureEncoder.from_hpp_model(hpp_model)
+                feature_encoder.zero_as_missing = tree_ensemble.sparse_missing_as_nan
+                start = time.perf_counter()
+                lookup_table = PriceLookupTable.build(feature_encoder, tree_ensemble,
+                                                      predict_fn=hpp_model.trained_model_object.predict,
+                                                      bhk_range=self.model_pusher_config.lookup_table_bhk_range,
+                                                      bath_range=self.model_pusher_config.lookup_table_bath_range,
+                                                      sqft_range=self.model_pusher_config.lookup_table_sqft_range)
+            except Exception as e:
+                logging.info(f"No lookup table built: {e}")
+                return False
+            logging.info(f"Built lookup table in {time.perf_counter() - start:.1f}s: {lookup_table.n_cells} cells, "
+                         f"{len(lookup_table.thresholds)} total_sqft thresholds, {len(lookup_table.prices)} prices, "
+                         f"{lookup_table.nbytes / 2 ** 20:.1f} MB")
+            random = np.random.RandomState(42)
+            locations = sorted(feature_encoder.location_mapping)
+            bhk_range = self.model_pusher_config.lookup_table_bhk_range
+            bath_range = self.model_pusher_config.lookup_table_bath_range
+            sqft_range = self.model_pusher_config.lookup_table_sqft_range
+            probe = DataFrame({"location": random.choice(locations, size=1000),
+                               "no_of_BHK": random.randint(bhk_range[0], bhk_range[1] + 1, size=1000),
+                               "total_sqft": random.uniform(sqft_range[0], sqft_range[1], size=1000).round(0),
+                               "bath": random.randint(bath_range[0], bath_range[1] + 1, size=1000).astype(float)})
+            looked_up = np.array([lookup_table.lookup(record) for record in probe.to_dict("records")], dtype=float)
+            library_prediction = hpp_model.trained_model_object.predict(
+                hpp_model.preprocessing_object.transform(hpp_model.cleaning_object.transform(probe)))
+            # records scaling to exactly 0 are left to the model, they are not in the table
+            answered = ~np.isnan(looked_up)
+            max_error = float(np.abs(looked_up[answered] - library_prediction[answered]).max()) if answered.any() else np.inf
+            logging.info(f"Lookup table max abs error on {int(answered.sum())} probe records: {max_error}")
+            if max_error > self.model_pusher_config.compile_tolerance:
+                logging.info(f"No lookup table attached, its error is above {self.model_pusher_config.compile_tolerance}")
+                return False
+            hpp_model.lookup_table = lookup_table
+            return True
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def export_serving_model(self, hpp_model: HPPModel, tree_ensemble: TreeEnsemble) -> Optional[str]:
+        """
+        Method Name :   export_serving_model
+        Description :   This function exports the model as a numpy only ServingModel npz and checks it
+                        against the library model on raw probe inputs
+
+        Output      :   Returns the path of the npz, None when the model cannot be exported or the predictions differ
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            try:
+                serving_model = ServingModel.from_hpp_model(hpp_model, tree_ensemble)
+            except Exception as e:
+                logging.info(f"No serving model exported: {e}")
+                return None
+            probe = serving_model.make_probe_dataframe()
+            library_prediction = hpp_model.trained_model_object.predict(
+                hpp_model.preprocessing_object.transform(hpp_model.cleaning_object.transform(probe)))
+            max_error = float(np.abs(serving_model.predict(probe) - library_prediction).max())
+            logging.info(f"Serving model max abs error on probe inputs: {max_error}")
+            if max_error > self.model_pusher_config.compile_tolerance:
+                logging.info(f"No serving model exported, its error is above {self.model_pusher_config.compile_tolerance}")
+                return None
+            serving_model.save(self.model_pusher_config.serving_model_npz_file_path)
+            return self.model_pusher_config.serving_model_npz_file_path
+        except Exception as e:
+            raise CustomException(e,sys)
+
     def initiate_model_pusher(self,)->ModelPusherArtifact:
         """
         Method Name :   initiate_model_pusher
@@ -31,7 +186,35 @@ class ModelPusher:
 
         try:
             logging.info("Uploading artifacts folder to s3 bucket")
-            self.Hpp_estimator.save_model(from_file=self.model_evaluation_artifact.trained_model_path)
+            model_file_path = self.model_evaluation_artifact.trained_model_path
+            serving_model_file_path = None
+            if self.model_pusher_config.compile_model:
+                hpp_model = load_object(file_path=model_file_path)
+                with get_stage_profiler().step("compile_model"):
+                    tree_ensemble = self.compile_model(hpp_model)
+                    encoder_attached = self.attach_feature_encoder(hpp_model)
+                with get_stage_profiler().step("lookup_table"):
+                    table_attached = (self.model_pusher_config.build_lookup_table and tree_ensemble is not None
+                                      and self.build_lookup_table(hpp_model, tree_ensemble))
+                if getattr(hpp_model, "compiled_model", None) is not None or encoder_attached or table_attached:
+                    # the trained model file is left untouched, it is an input of the stage cache
+                    save_object(self.model_pusher_config.serving_model_file_path, hpp_model)
+                    model_file_path = self.model_pusher_config.serving_model_file_path
+                if tree_ensemble is not None:
+                    serving_model_file_path = self.export_serving_model(hpp_model, tree_ensemble)
+            with get_stage_profiler().step("s3_upload", bytes=files_size([model_file_path, serving_model_file_path])):
+                self.Hpp_estimator.save_model(from_file=model_file_path)
+                if serving_model_file_path is not None:
+                    self.serving_estimator.save_model(from_file=serving_model_file_path)
+                else:
+                    # a serving model of an older version would otherwise be preferred over the new pickle
+                    self.serving_estimator.remove_model()
+                if self.model_pusher_config.upload_artifacts:
+                    # stages reused from the stage cache keep their files in the run directory which built them
+                    results = self.s3.upload_directory(self.model_pusher_config.artifact_dir,
+                                                       prefix=self.model_pusher_config.s3_artifact_key_path,
+                                                       bucket_name=self.model_pusher_config.bucket_name)
+                    get_stage_profiler().record(artifact_files=len(results or {}))
             model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
                                                         s3_model_path=self.model_pusher_config.s3_model_key_path)
             
@@ -4,6 +4,7 @@ from typing import Tuple
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
+from scipy import sparse
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import r2_score,mean_absolute_error,mean_squared_error
 
@@ -12,11 +13,13 @@ from neuro_mf import ModelFactory
 from HPP.exception import CustomException
 from HPP.logger import logging
 
-from HPP.utils.main_utils import load_numpy_array_data, read_yaml, load_object, save_object
+from HPP.utils.main_utils import load_numpy_array_data, load_sparse_matrix_data, read_yaml, write_yaml, load_object, save_object
 from HPP.entity.config_entity import ModelTrainerConfig
 from HPP.entity.artifact_entity import (DataTransformationArtifact, ModelTrainerArtifact,
                                         RegressionMetricArtifact)
 from HPP.entity.estimator import HPPModel
+from HPP.entity.model_factory import ParallelModelFactory
+from HPP.pipeline.stage_profiler import get_stage_profiler
 
 
 
@@ -30,20 +33,29 @@ class ModelTrainer:
         self.data_transformation_artifact=data_transformation_artifact
         self.model_trainer_config=model_trainer_config
     
-    def get_model_object_and_report(self,train:np.array,test:np.array)->Tuple[object,object]:
+    def get_model_object_and_report(self,x_train:sparse.csr_matrix,y_train:np.array,
+                                    x_test:sparse.csr_matrix,y_test:np.array)->Tuple[object,object]:
         """
         Method Name :   get_model_object_and_report
-        Description :   This function uses neuro_mf to get the best model object and report of the best model
+        Description :   This function uses neuro_mf to get the best model object and report of the best model,
+                        the grid search runs on a process pool when model.yaml selects the process_pool search engine
         
         Output      :   Returns metric artifact object and best model object
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             logging.info(f"Starting model training")
-            model_factory=ModelFactory(self.model_trainer_config.model_config_file_path)
-            x_train,x_test,y_train,y_test=train[:,:-1],test[:,:-1],train[:,-1],test[:,-1]
+            model_config=read_yaml(filepath=self.model_trainer_config.model_config_file_path)
+            if ParallelModelFactory.is_enabled(model_config):
+                model_factory=ParallelModelFactory(self.model_trainer_config.model_config_file_path)
+            else:
+                model_factory=ModelFactory(self.model_trainer_config.model_config_file_path)
             best_model_detail=model_factory.get_best_model(x_train,y_train,
                                                            base_accuracy=self.model_trainer_config.expected_accuracy)
+            if isinstance(model_factory,ParallelModelFactory):
+                write_yaml(filepath=self.model_trainer_config.search_report_file_path,
+                           content=model_factory.search_report,replace=True)
+                logging.info(f"Saved model search report to {self.model_trainer_config.search_report_file_path}")
             model_object=best_model_detail.best_model
             y_pred=model_object.predict(x_test)
             r2score=r2_score(y_test,y_pred)
@@ -67,17 +79,23 @@ class ModelTrainer:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            train_arr=load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr=load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
+            x_train=load_sparse_matrix_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
+            x_test=load_sparse_matrix_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
+            y_train=load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_target_file_path)
+            y_test=load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_target_file_path)
 
-            best_model_detail,metric_artifact=self.get_model_object_and_report(train=train_arr,test=test_arr)
+            with get_stage_profiler().step("grid_search",rows=x_train.shape[0],features=x_train.shape[1]):
+                best_model_detail,metric_artifact=self.get_model_object_and_report(x_train=x_train,y_train=y_train,
+                                                                                   x_test=x_test,y_test=y_test)
             preprocessing_obj=load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            cleaning_obj=load_object(file_path=self.data_transformation_artifact.cleaner_object_file_path)
 
             if best_model_detail.best_score < self.model_trainer_config.expected_accuracy:
                 logging.info("No best model found with score more than base score")
                 raise Exception("No best model found with score more than base score")
             hpp_model=HPPModel(preprocessing_obj=preprocessing_obj,
-                              train_model_object=best_model_detail.best_model)
+                              train_model_object=best_model_detail.best_model,
+                              cleaning_obj=cleaning_obj)
             logging.info("Created usvisa model object with preprocessor and model")
             logging.info("Created best model file path.")
             save_object(self.model_trainer_config.trained_model_file_path, hpp_model)
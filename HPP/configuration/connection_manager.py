@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import boto3
+import certifi
+import pymongo
+from botocore.config import Config
+from pymongo.errors import AutoReconnect, ConnectionFailure
+
+from HPP.constants import AWS_ACCESS_KEY, AWS_SECRET_KEY, MONGODB_URL
+from HPP.entity.config_entity import ConnectionConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+
+class ConnectionManager:
+    """
+    This class owns the s3 and mongo db clients of the process. They are created on first use
+    with the pool sizes, timeouts and retries of the configuration and then shared by every
+    component, the s3 client is the one of the s3 resource so that both share one connection
+    pool. Sockets must not be shared with a forked child (multi worker servers fork after
+    import), so a process which is not the one that created the clients drops them and
+    creates its own on next use.
+    """
+    def __init__(self, connection_config: ConnectionConfig = ConnectionConfig()):
+        """
+        :param connection_config: Configuration with the pool sizes, timeouts and retries of both backends
+        """
+        self.connection_config = connection_config
+        self._reset()
+
+    def _reset(self) -> None:
+        # a lock held by another thread at fork time would never be released in the child
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._s3_resources: Dict[Optional[str], object] = {}
+        self._mongo_client: Optional[pymongo.MongoClient] = None
+
+    def _check_process(self) -> None:
+        if self._pid != os.getpid():
+            logging.info(f"Process {os.getpid()} was forked from {self._pid}, creating new connections")
+            self._reset()
+
+    def get_s3_resource(self, region_name: Optional[str] = None):
+        """
+        Returns the shared s3 resource of region_name, the region of the configuration when None
+        """
+        try:
+            self._check_process()
+            region_name = region_name or self.connection_config.s3_region_name
+            s3_resource = self._s3_resources.get(region_name)
+            if s3_resource is None:
+                with self._lock:
+                    s3_resource = self._s3_resources.get(region_name)
+                    if s3_resource is None:
+                        s3_resource = self._create_s3_resource(region_name)
+                        self._s3_resources[region_name] = s3_resource
+            return s3_resource
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_s3_client(self, region_name: Optional[str] = None):
+        return self.get_s3_resource(region_name).meta.client
+
+    def _create_s3_resource(self, region_name: Optional[str]):
+        access_key_id = os.getenv(AWS_ACCESS_KEY)
+        secret_access_key = os.getenv(AWS_SECRET_KEY)
+        if access_key_id is None:
+            raise Exception(f"AWS_ACCESS_KEY {AWS_ACCESS_KEY} is not set")
+        if secret_access_key is None:
+            raise Exception(f"AWS_SECRET_ACCESS_KEY {AWS_SECRET_KEY} is not set")
+        config = self.connection_config
+        s3_resource = boto3.resource("s3", aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key,
+                                     region_name=region_name,
+                                     config=Config(max_pool_connections=config.s3_max_pool_connections,
+                                                   connect_timeout=config.s3_connect_timeout,
+                                                   read_timeout=config.s3_read_timeout,
+                                                   retries={"max_attempts": config.s3_max_attempts,
+                                                            "mode": config.s3_retry_mode}))
+        logging.info(f"Created s3 connection pool of {config.s3_max_pool_connections} connections")
+        return s3_resource
+
+    def get_mongo_client(self) -> pymongo.MongoClient:
+        """
+        Returns the shared mongo db client, connecting with retries on first use
+        """
+        try:
+            self._check_process()
+            if self._mongo_client is None:
+                with self._lock:
+                    if self._mongo_client is None:
+                        self._mongo_client = self._create_mongo_client()
+            return self._mongo_client
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _create_mongo_client(self) -> pymongo.MongoClient:
+        mongo_db_url = os.getenv(MONGODB_URL)
+        if mongo_db_url is None:
+            raise Exception(f"Please provide {MONGODB_URL} environment variable")
+        config = self.connection_config
+        client = pymongo.MongoClient(mongo_db_url, tlsCAFile=certifi.where(),
+                                     maxPoolSize=config.mongodb_max_pool_size,
+                                     minPoolSize=config.mongodb_min_pool_size,
+                                     connectTimeoutMS=config.mongodb_connect_timeout_ms,
+                                     socketTimeoutMS=config.mongodb_socket_timeout_ms,
+                                     serverSelectionTimeoutMS=config.mongodb_server_selection_timeout_ms,
+                                     retryReads=True, retryWrites=True)
+        for attempt in range(1, config.mongodb_connect_attempts + 1):
+            try:
+                client.admin.command("ping")
+                break
+            except (AutoReconnect, ConnectionFailure) as e:
+                if attempt == config.mongodb_connect_attempts:
+                    client.close()
+                    raise
+                backoff = config.mongodb_retry_backoff_seconds * 2 ** (attempt - 1)
+                logging.info(f"Mongo db connection attempt {attempt} failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+        logging.info("Mongo db connection established")
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mongo_client is not None and self._pid == os.getpid():
+                self._mongo_client.close()
+            self._mongo_client = None
+            self._s3_resources = {}
+
+
+_connection_manager: Optional[ConnectionManager] = None
+_connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> ConnectionManager:
+    """
+    Returns the process wide connection manager, creating it on first use
+    """
+    global _connection_manager
+    if _connection_manager is None:
+        with _connection_manager_lock:
+            if _connection_manager is None:
+                _connection_manager = ConnectionManager()
+    return _connection_manager
+
+
+def _reset_after_fork() -> None:
+    global _connection_manager_lock
+    _connection_manager_lock = threading.Lock()
+    if _connection_manager is not None:
+        _connection_manager._check_process()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
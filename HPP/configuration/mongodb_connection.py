@@ -1,35 +1,20 @@
-from distutils.sysconfig import customize_compiler
 import sys
+from HPP.configuration.connection_manager import get_connection_manager
 from HPP.constants import *
 from HPP.exception import CustomException
-from HPP.logger import logging
-import os
-import pymongo
-import certifi
-
-ca = certifi.where()
-##if any timeout issue it will handle
 
 class MongoDBClient:
     """
-    Class Name :   export_data_into_feature_store
-    Description :   This method exports the dataframe from mongodb feature store as dataframe 
+    Class Name :   MongoDBClient
+    Description :   This class gives the mongo db client shared by the whole process and the database_name database
     
     Output      :   connection to mongodb database
     On Failure  :   raises an exception
     """
-    client=None
     def __init__(self,database_name=DATABASE_NAME)->None:
         try:
-            if MongoDBClient.client is None:
-                mongo_db_url=os.getenv(MONGODB_URL)
-                if mongo_db_url is None:
-                    raise Exception(f"Please provide {MONGODB_URL} environment variable")
-                MongoDBClient.client=pymongo.MongoClient(mongo_db_url,tlsCAFile=ca)
-                self.client=MongoDBClient.client
-                self.database=self.client[database_name]
-                self.database_name=database_name
-                logging.info("Mongo db connection established")
+            self.client=get_connection_manager().get_mongo_client()
+            self.database=self.client[database_name]
+            self.database_name=database_name
         except Exception as e:
             raise CustomException(e,sys)
-                
\ No newline at end of file
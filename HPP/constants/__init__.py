@@ -4,14 +4,15 @@ import os
 DATABASE_NAME="HousePrice"
 COLLECTION_NAME="House"
 MONGODB_URL="MONGODB_URL"
+MONGODB_EXPORT_BATCH_SIZE:int=10000
 
 
 PIPELINE_NAME:str="HPP"
 ARTIFACT_DIR:str="artifact"
 
-FILE_NAME:str='HPP.csv'
-TRAIN_FILE_NAME:str="train.csv"
-TEST_FILE_NAME:str="test.csv"
+FILE_NAME:str='HPP.parquet'
+TRAIN_FILE_NAME:str="train.parquet"
+TEST_FILE_NAME:str="test.parquet"
 SCHEMA_FILE_PATH:str=os.path.join('config','schema.yaml')
 
 TARGET_COLUMN="price"
@@ -25,6 +26,16 @@ DATA_INGESTION_DIR_NAME:str="data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR:str="feature_store"
 DATA_INGESTION_INGESTED_DIR:str="ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO:float=0.2
+DATA_INGESTION_EXPORT_PARTITIONS:int=1
+DATA_INGESTION_FILE_COMPRESSION:str="zstd"
+DATA_INGESTION_STATE_DIR:str="ingestion_state"
+DATA_INGESTION_MASTER_FILE_NAME:str="HPP_master.parquet"
+DATA_INGESTION_STATE_FILE_NAME:str="state.yaml"
+# _id only grows, so it picks up inserted documents but not updated ones, an update timestamp
+# field (e.g. updated_at) maintained by the writers picks up both
+DATA_INGESTION_DEFAULT_WATERMARK_FIELD:str="_id"
+DATA_INGESTION_WATERMARK_FIELD="HPP_INGESTION_WATERMARK_FIELD"
+DATA_INGESTION_FULL_REFRESH="HPP_INGESTION_FULL_REFRESH"
 
 """
 Data validation related constants
@@ -43,6 +54,11 @@ DATA_TRANSFORMATION_DIR_NAME:str="transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR:str="transformed"
 DATA_TRANSFORMATION_OBJECT_DIR:str="transformed_object"
 PREPROCESSING_OBJECT_FILE_NAME="preprocessing.pkl"
+CLEANER_OBJECT_FILE_NAME="cleaner.pkl"
+DATA_TRANSFORMATION_TRAIN_FILE_NAME:str="train.npz"
+DATA_TRANSFORMATION_TEST_FILE_NAME:str="test.npz"
+DATA_TRANSFORMATION_TRAIN_TARGET_FILE_NAME:str="train_target.npy"
+DATA_TRANSFORMATION_TEST_TARGET_FILE_NAME:str="test_target.npy"
 
 
 '''
@@ -53,7 +69,9 @@ MODEL_TRAINER_TRAINED_MODEL_DIR:str="trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME:str="model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE:float=0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH:str=os.path.join("config","model.yaml")
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME:str="search_report.yaml"
 MODEL_FILE_NAME="model.pkl"
+SERVING_MODEL_FILE_NAME="serving_model.npz"
 
 '''
 Model Evaluation related constants
@@ -62,6 +80,158 @@ MODEL_EVALUATION_CHNAGED_THRESHOLD_SCORE:float=0.02
 MODEL_BUCKET_NAME="hpp-model"
 MODEL_PUSHER_S3_KEY="model-registry"
 
+"""
+Model pusher related constants
+"""
+MODEL_PUSHER_DIR_NAME:str="model_pusher"
+MODEL_PUSHER_S3_ARTIFACT_KEY_PREFIX:str="artifacts"
+MODEL_PUSHER_UPLOAD_ARTIFACTS="HPP_UPLOAD_ARTIFACTS"
+MODEL_PUSHER_SERVING_MODEL_NAME:str="model.pkl"
+MODEL_PUSHER_COMPILED_MODEL_NAME:str="tree_ensemble.npz"
+MODEL_PUSHER_COMPILE_MODEL="HPP_COMPILE_MODEL"
+MODEL_PUSHER_COMPILE_TOLERANCE:float=1e-2
+MODEL_PUSHER_ENCODER_TOLERANCE:float=1e-5
+MODEL_PUSHER_BENCHMARK_BATCH_SIZES:tuple=(1,8,64,4096)
+# input grid of the form answered from the price lookup table, other inputs go to the model
+MODEL_PUSHER_BUILD_LOOKUP_TABLE="HPP_BUILD_LOOKUP_TABLE"
+MODEL_PUSHER_LOOKUP_TABLE_BHK_RANGE:tuple=(1,6)
+MODEL_PUSHER_LOOKUP_TABLE_BATH_RANGE:tuple=(1,13)
+MODEL_PUSHER_LOOKUP_TABLE_SQFT_RANGE:tuple=(300,30000)
+
+"""
+Model registry related constants
+"""
+MODEL_REGISTRY_REFRESH_INTERVAL_SECONDS:int=60
+# "auto" serves the numpy serving model (npz) when it is published, which loads without unpickling
+# sklearn and the boosting libraries, and loads the pickled model only for batches above the
+# max_batch_rows of the compiled trees, where the boosting library is faster. Without a published
+# serving model the pickled model is served. "npz" never loads the pickled model, "pickle" always does
+SERVING_MODEL_FORMAT="HPP_SERVING_MODEL_FORMAT"
+SERVING_MODEL_FORMAT_AUTO="auto"
+SERVING_MODEL_FORMAT_NPZ="npz"
+SERVING_MODEL_FORMAT_PICKLE="pickle"
+SERVING_MODEL_DEFAULT_FORMAT:str=SERVING_MODEL_FORMAT_AUTO
+
+"""
+Logging related constants, the values can be overridden with the environment variables
+"""
+LOG_LEVEL="HPP_LOG_LEVEL"
+LOG_MODULE_LEVELS="HPP_LOG_MODULE_LEVELS"
+LOG_FORMAT="HPP_LOG_FORMAT"
+LOG_SAMPLED_MODULES="HPP_LOG_SAMPLED_MODULES"
+LOG_SAMPLE_RATE="HPP_LOG_SAMPLE_RATE"
+LOG_QUEUE_SIZE="HPP_LOG_QUEUE_SIZE"
+LOG_DEFAULT_LEVEL:str="INFO"
+# "module=LEVEL" pairs, botocore and urllib3 log every request at debug and info level
+LOG_DEFAULT_MODULE_LEVELS:str="botocore=WARNING,boto3=WARNING,s3transfer=WARNING,urllib3=WARNING"
+LOG_DEFAULT_FORMAT:str="json"
+# modules logging on every prediction, their info records are sampled per call site
+LOG_DEFAULT_SAMPLED_MODULES:str="HPP.entity.estimator,HPP.pipeline.prediction_pipeline"
+LOG_DEFAULT_SAMPLE_RATE:int=100
+LOG_DEFAULT_QUEUE_SIZE:int=10000
+
+"""
+Connection related constants, the values can be overridden with the environment variables
+"""
+S3_REGION_NAME="HPP_S3_REGION_NAME"
+S3_MAX_POOL_CONNECTIONS="HPP_S3_MAX_POOL_CONNECTIONS"
+S3_CONNECT_TIMEOUT_SECONDS="HPP_S3_CONNECT_TIMEOUT_SECONDS"
+S3_READ_TIMEOUT_SECONDS="HPP_S3_READ_TIMEOUT_SECONDS"
+S3_MAX_ATTEMPTS="HPP_S3_MAX_ATTEMPTS"
+S3_RETRY_MODE="HPP_S3_RETRY_MODE"
+S3_DEFAULT_MAX_POOL_CONNECTIONS:int=50
+S3_DEFAULT_CONNECT_TIMEOUT_SECONDS:float=5
+S3_DEFAULT_READ_TIMEOUT_SECONDS:float=60
+S3_DEFAULT_MAX_ATTEMPTS:int=5
+S3_DEFAULT_RETRY_MODE:str="standard"
+MONGODB_MAX_POOL_SIZE="HPP_MONGODB_MAX_POOL_SIZE"
+MONGODB_MIN_POOL_SIZE="HPP_MONGODB_MIN_POOL_SIZE"
+MONGODB_CONNECT_TIMEOUT_MS="HPP_MONGODB_CONNECT_TIMEOUT_MS"
+MONGODB_SOCKET_TIMEOUT_MS="HPP_MONGODB_SOCKET_TIMEOUT_MS"
+MONGODB_SERVER_SELECTION_TIMEOUT_MS="HPP_MONGODB_SERVER_SELECTION_TIMEOUT_MS"
+MONGODB_CONNECT_ATTEMPTS="HPP_MONGODB_CONNECT_ATTEMPTS"
+MONGODB_DEFAULT_MAX_POOL_SIZE:int=50
+MONGODB_DEFAULT_MIN_POOL_SIZE:int=0
+MONGODB_DEFAULT_CONNECT_TIMEOUT_MS:int=10000
+MONGODB_DEFAULT_SOCKET_TIMEOUT_MS:int=120000
+MONGODB_DEFAULT_SERVER_SELECTION_TIMEOUT_MS:int=10000
+MONGODB_DEFAULT_CONNECT_ATTEMPTS:int=3
+MONGODB_RETRY_BACKOFF_SECONDS:float=0.5
+
+"""
+S3 transfer related constants, the values can be overridden with the environment variables
+"""
+S3_TRANSFER_MULTIPART_THRESHOLD_MB="HPP_S3_MULTIPART_THRESHOLD_MB"
+S3_TRANSFER_MULTIPART_CHUNK_SIZE_MB="HPP_S3_MULTIPART_CHUNK_SIZE_MB"
+S3_TRANSFER_MAX_CONCURRENCY="HPP_S3_MAX_CONCURRENCY"
+S3_TRANSFER_VERIFY_CHECKSUMS="HPP_S3_VERIFY_CHECKSUMS"
+S3_TRANSFER_DEFAULT_MULTIPART_THRESHOLD_MB:int=16
+S3_TRANSFER_DEFAULT_MULTIPART_CHUNK_SIZE_MB:int=16
+S3_TRANSFER_DEFAULT_MAX_CONCURRENCY:int=8
+S3_TRANSFER_CHECKSUM_METADATA_KEY:str="sha256"
+
+"""
+Model cache related constants, the values can be overridden with the environment variables
+"""
+MODEL_CACHE_ENABLED="HPP_MODEL_CACHE_ENABLED"
+MODEL_CACHE_DIR="HPP_MODEL_CACHE_DIR"
+MODEL_CACHE_DEFAULT_DIR:str=os.path.join(os.path.expanduser("~"),".cache","hpp","models")
+MODEL_CACHE_KEEP_VERSIONS:int=2
+MODEL_CACHE_CHUNK_SIZE:int=1024*1024
+
+"""
+Prediction related constants
+"""
+PREDICTION_BATCH_MAX_RECORDS:int=10000
+
+"""
+Micro batching related constants, the values can be overridden with the environment variables
+"""
+MICRO_BATCH_ENABLED="HPP_MICRO_BATCH_ENABLED"
+MICRO_BATCH_MAX_SIZE="HPP_MICRO_BATCH_MAX_SIZE"
+MICRO_BATCH_MAX_WAIT_MS="HPP_MICRO_BATCH_MAX_WAIT_MS"
+MICRO_BATCH_DEFAULT_MAX_SIZE:int=64
+MICRO_BATCH_DEFAULT_MAX_WAIT_MS:float=5.0
+
+"""
+Prediction cache related constants, the values can be overridden with the environment variables
+"""
+PREDICTION_CACHE_ENABLED="HPP_PREDICTION_CACHE_ENABLED"
+PREDICTION_CACHE_MAX_SIZE="HPP_PREDICTION_CACHE_MAX_SIZE"
+PREDICTION_CACHE_TTL_SECONDS="HPP_PREDICTION_CACHE_TTL_SECONDS"
+PREDICTION_CACHE_DEFAULT_MAX_SIZE:int=10000
+PREDICTION_CACHE_DEFAULT_TTL_SECONDS:float=3600
+
+"""
+Stage cache related constants, the values can be overridden with the environment variables
+"""
+STAGE_CACHE_DIR_NAME:str="stage_cache"
+STAGE_CACHE_INDEX_FILE_NAME:str="index.yaml"
+STAGE_CACHE_REPORT_FILE_NAME:str="stage_cache_report.yaml"
+STAGE_CACHE_ENABLED="HPP_STAGE_CACHE_ENABLED"
+STAGE_CACHE_MAX_SIZE_MB="HPP_STAGE_CACHE_MAX_SIZE_MB"
+STAGE_CACHE_DEFAULT_MAX_SIZE_MB:float=2048
+
+"""
+Stage profiler related constants, the values can be overridden with the environment variables
+"""
+STAGE_PROFILER_REPORT_FILE_NAME:str="stage_profile_report.yaml"
+STAGE_PROFILER_DIR_NAME:str="profile"
+STAGE_PROFILER_ENABLED="HPP_STAGE_PROFILER_ENABLED"
+# comma separated steps (e.g. model_trainer or model_trainer/grid_search) to run under cProfile
+STAGE_PROFILER_PROFILE_STEPS="HPP_PROFILE_STEPS"
+STAGE_PROFILER_TOP_FUNCTIONS:int=40
+
+"""
+Serving related constants
+"""
+INFERENCE_THREADS="HPP_INFERENCE_THREADS"
+INFERENCE_DEFAULT_THREADS:int=4
+METRICS_ENABLED="HPP_METRICS_ENABLED"
+METRICS_NAMESPACE:str="hpp"
+# seconds, from a lookup table hit (tens of microseconds) to a cold batch prediction
+METRICS_LATENCY_BUCKETS:tuple=(0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+
 
 
 """
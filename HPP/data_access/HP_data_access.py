@@ -1,7 +1,8 @@
 from HPP.configuration.mongodb_connection import MongoDBClient
-from HPP.constants import DATABASE_NAME
+from HPP.constants import DATABASE_NAME, MONGODB_EXPORT_BATCH_SIZE
 from HPP.exception import CustomException
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 import pandas as pd
 import numpy as np
 import sys
@@ -16,19 +17,103 @@ class HPData:
             self.mongo_client=MongoDBClient(database_name=DATABASE_NAME)
         except Exception as e:
             raise CustomException(e,sys)
-    def export_collection_as_df(self,collection_name:str,database_name:Optional[str]=None)->pd.DataFrame:
+
+    def get_collection(self,collection_name:str,database_name:Optional[str]=None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    @staticmethod
+    def _buffers_to_df(buffers:Dict[str,list])->pd.DataFrame:
+        df=pd.DataFrame(buffers)
+        df.replace({"na":np.nan},inplace=True)
+        return df
+
+    def iter_collection_chunks(self,collection_name:str,database_name:Optional[str]=None,
+                               query:Optional[dict]=None,chunk_size:int=MONGODB_EXPORT_BATCH_SIZE,
+                               include_id:bool=False)->Iterator[pd.DataFrame]:
+        """
+        stream the collection as dataframes of at most chunk_size rows.
+        documents are appended to column-wise buffers, so only one chunk of values
+        is held in memory and _id is not fetched unless include_id is set
+        """
+        try:
+            collection=self.get_collection(collection_name,database_name)
+            projection=None if include_id else {"_id":0}
+            cursor=collection.find(query or {},projection=projection,batch_size=chunk_size)
+            buffers:Dict[str,list]={}
+            rows=0
+            for document in cursor:
+                for key in document:
+                    if key not in buffers:
+                        buffers[key]=[None]*rows
+                for key,buffer in buffers.items():
+                    buffer.append(document.get(key))
+                rows+=1
+                if rows==chunk_size:
+                    yield self._buffers_to_df(buffers)
+                    buffers={key:[] for key in buffers}
+                    rows=0
+            if rows>0:
+                yield self._buffers_to_df(buffers)
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def get_partition_queries(self,collection_name:str,n_partitions:int,database_name:Optional[str]=None,
+                              query:Optional[dict]=None)->List[dict]:
+        """
+        split the collection into n_partitions contiguous _id ranges of similar size
+        """
+        try:
+            collection=self.get_collection(collection_name,database_name)
+            query=query or {}
+            total=collection.count_documents(query)
+            step=total//n_partitions
+            boundaries=[]
+            for partition in range(1,n_partitions):
+                document=next(collection.find(query,{"_id":1}).sort("_id",1).skip(partition*step).limit(1),None)
+                if document is not None and (not boundaries or boundaries[-1]!=document["_id"]):
+                    boundaries.append(document["_id"])
+            partition_queries=[]
+            lower=None
+            for upper in boundaries+[None]:
+                id_range={}
+                if lower is not None:
+                    id_range["$gte"]=lower
+                if upper is not None:
+                    id_range["$lt"]=upper
+                partition_query=dict(query)
+                if id_range:
+                    partition_query={"$and":[query,{"_id":id_range}]} if query else {"_id":id_range}
+                partition_queries.append(partition_query)
+                lower=upper
+            return partition_queries
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def export_collection_as_df(self,collection_name:str,database_name:Optional[str]=None,
+                                query:Optional[dict]=None,chunk_size:int=MONGODB_EXPORT_BATCH_SIZE,
+                                n_partitions:int=1,include_id:bool=False)->pd.DataFrame:
         try:
             """export entire collectin as dataframe:
+            the collection is streamed in chunks, and with n_partitions>1 read by
+            parallel cursors over _id ranges which are concatenated in _id order
             return pd.DataFrame of collection
             """
-            if database_name is None:
-                collection=self.mongo_client.database[collection_name]
+            if n_partitions<=1:
+                chunks=list(self.iter_collection_chunks(collection_name,database_name,query=query,
+                                                        chunk_size=chunk_size,include_id=include_id))
             else:
-                collection=self.mongo_client[database_name][collection_name]
-            df=pd.DataFrame(list(collection.find()))
-            if "_id" in df.columns.to_list():
-                df=df.drop(["_id"],axis=1)
-            df.replace({"na":np.nan},inplace=True)
-            return df
+                partition_queries=self.get_partition_queries(collection_name,n_partitions,database_name,query=query)
+                read_partition=lambda partition_query:list(self.iter_collection_chunks(collection_name,database_name,
+                                                                                        query=partition_query,
+                                                                                        chunk_size=chunk_size,
+                                                                                        include_id=include_id))
+                with ThreadPoolExecutor(max_workers=len(partition_queries)) as executor:
+                    chunks=[chunk for partition in executor.map(read_partition,partition_queries) for chunk in partition]
+            if len(chunks)==0:
+                return pd.DataFrame()
+            return pd.concat(chunks,ignore_index=True)
         except Exception as e:
-            raise CustomException(e,sys)
\ No newline at end of file
+            raise CustomException(e,sys)
+
@@ -16,8 +16,11 @@ class DataValidationArtifact:
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path:str
+    cleaner_object_file_path:str
     transformed_train_file_path:str
     transformed_test_file_path:str
+    transformed_train_target_file_path:str
+    transformed_test_target_file_path:str
 
 @dataclass
 class RegressionMetricArtifact:
@@ -19,6 +19,14 @@ class DataIngestionConfig:
     test_file_path:str=os.path.join(data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,TEST_FILE_NAME)
     train_test_split_ratio:float=DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name:str=DATA_INGESTION_COLLECTION_NAME
+    export_batch_size:int=MONGODB_EXPORT_BATCH_SIZE
+    export_partitions:int=DATA_INGESTION_EXPORT_PARTITIONS
+    file_compression:str=DATA_INGESTION_FILE_COMPRESSION
+    ingestion_state_dir:str=os.path.join(ARTIFACT_DIR,DATA_INGESTION_STATE_DIR)
+    master_feature_store_path:str=os.path.join(ingestion_state_dir,DATA_INGESTION_MASTER_FILE_NAME)
+    state_file_path:str=os.path.join(ingestion_state_dir,DATA_INGESTION_STATE_FILE_NAME)
+    watermark_field:str=os.getenv(DATA_INGESTION_WATERMARK_FIELD,DATA_INGESTION_DEFAULT_WATERMARK_FIELD)
+    full_refresh:bool=os.getenv(DATA_INGESTION_FULL_REFRESH,"false").lower() in ("1","true","yes")
 
 
 @dataclass
@@ -30,10 +38,15 @@ class DataValidationConfig:
 class DataTransformationConfig:
     data_transformation_dir:str=os.path.join(TrainingPipelineConfig().artifact_dir,DATA_TRANSFORMATION_DIR_NAME)
     transformed_train_file_path:str=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                 TRAIN_FILE_NAME.replace("csv","npy"))
+                                                 DATA_TRANSFORMATION_TRAIN_FILE_NAME)
     transformed_test_file_path:str=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                TEST_FILE_NAME.replace("csv","npy"))
+                                                DATA_TRANSFORMATION_TEST_FILE_NAME)
+    transformed_train_target_file_path:str=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                        DATA_TRANSFORMATION_TRAIN_TARGET_FILE_NAME)
+    transformed_test_target_file_path:str=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                       DATA_TRANSFORMATION_TEST_TARGET_FILE_NAME)
     transformed_object_file_path=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_OBJECT_DIR,PREPROCESSING_OBJECT_FILE_NAME)
+    cleaner_object_file_path=os.path.join(data_transformation_dir,DATA_TRANSFORMATION_OBJECT_DIR,CLEANER_OBJECT_FILE_NAME)
 
 @dataclass
 class ModelTrainerConfig:
@@ -41,6 +54,7 @@ class ModelTrainerConfig:
     trained_model_file_path:str=os.path.join(model_trainer_dir,MODEL_TRAINER_TRAINED_MODEL_DIR,MODEL_FILE_NAME)
     expected_accuracy:float=MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path:str=MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    search_report_file_path:str=os.path.join(model_trainer_dir,MODEL_TRAINER_SEARCH_REPORT_FILE_NAME)
 
 
 @dataclass
@@ -54,9 +68,119 @@ class ModelEvaluationConfig:
 class ModelPusherConfig:
     bucket_name:str=MODEL_BUCKET_NAME
     s3_model_key_path:str=MODEL_FILE_NAME
+    s3_serving_model_key_path:str=SERVING_MODEL_FILE_NAME
+    s3_artifact_key_path:str=f"{MODEL_PUSHER_S3_ARTIFACT_KEY_PREFIX}/{TrainingPipelineConfig().timestamp}"
+    artifact_dir:str=TrainingPipelineConfig().artifact_dir
+    upload_artifacts:bool=os.getenv(MODEL_PUSHER_UPLOAD_ARTIFACTS,"true").lower() in ("1","true","yes")
+    model_pusher_dir:str=os.path.join(TrainingPipelineConfig().artifact_dir,MODEL_PUSHER_DIR_NAME)
+    serving_model_file_path:str=os.path.join(model_pusher_dir,MODEL_PUSHER_SERVING_MODEL_NAME)
+    compiled_model_file_path:str=os.path.join(model_pusher_dir,MODEL_PUSHER_COMPILED_MODEL_NAME)
+    serving_model_npz_file_path:str=os.path.join(model_pusher_dir,SERVING_MODEL_FILE_NAME)
+    compile_model:bool=os.getenv(MODEL_PUSHER_COMPILE_MODEL,"true").lower() in ("1","true","yes")
+    compile_tolerance:float=MODEL_PUSHER_COMPILE_TOLERANCE
+    encoder_tolerance:float=MODEL_PUSHER_ENCODER_TOLERANCE
+    benchmark_batch_sizes:tuple=MODEL_PUSHER_BENCHMARK_BATCH_SIZES
+    build_lookup_table:bool=os.getenv(MODEL_PUSHER_BUILD_LOOKUP_TABLE,"true").lower() in ("1","true","yes")
+    lookup_table_bhk_range:tuple=MODEL_PUSHER_LOOKUP_TABLE_BHK_RANGE
+    lookup_table_bath_range:tuple=MODEL_PUSHER_LOOKUP_TABLE_BATH_RANGE
+    lookup_table_sqft_range:tuple=MODEL_PUSHER_LOOKUP_TABLE_SQFT_RANGE
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled:bool=os.getenv(PREDICTION_CACHE_ENABLED,"true").lower() in ("1","true","yes")
+    max_size:int=int(os.getenv(PREDICTION_CACHE_MAX_SIZE,PREDICTION_CACHE_DEFAULT_MAX_SIZE))
+    ttl_seconds:float=float(os.getenv(PREDICTION_CACHE_TTL_SECONDS,PREDICTION_CACHE_DEFAULT_TTL_SECONDS))
+
+
+@dataclass
+class StageCacheConfig:
+    enabled:bool=os.getenv(STAGE_CACHE_ENABLED,"true").lower() in ("1","true","yes")
+    artifact_root_dir:str=ARTIFACT_DIR
+    current_artifact_dir:str=TrainingPipelineConfig().artifact_dir
+    cache_dir:str=os.path.join(ARTIFACT_DIR,STAGE_CACHE_DIR_NAME)
+    index_file_path:str=os.path.join(cache_dir,STAGE_CACHE_INDEX_FILE_NAME)
+    report_file_path:str=os.path.join(current_artifact_dir,STAGE_CACHE_REPORT_FILE_NAME)
+    keep_dirs:tuple=(cache_dir,os.path.join(ARTIFACT_DIR,DATA_INGESTION_STATE_DIR))
+    max_size_mb:float=float(os.getenv(STAGE_CACHE_MAX_SIZE_MB,STAGE_CACHE_DEFAULT_MAX_SIZE_MB))
+
+
+@dataclass
+class StageProfilerConfig:
+    enabled:bool=os.getenv(STAGE_PROFILER_ENABLED,"true").lower() in ("1","true","yes")
+    report_file_path:str=os.path.join(TrainingPipelineConfig().artifact_dir,STAGE_PROFILER_REPORT_FILE_NAME)
+    profile_dir:str=os.path.join(TrainingPipelineConfig().artifact_dir,STAGE_PROFILER_DIR_NAME)
+    profile_steps:tuple=tuple(filter(None,(step.strip() for step in os.getenv(STAGE_PROFILER_PROFILE_STEPS,"").split(","))))
+    profile_top_functions:int=STAGE_PROFILER_TOP_FUNCTIONS
 
 
 @dataclass
 class HPPredictorConfig:
     model_file_path:str=MODEL_FILE_NAME
+    serving_model_file_path:str=SERVING_MODEL_FILE_NAME
+    model_format:str=os.getenv(SERVING_MODEL_FORMAT,SERVING_MODEL_DEFAULT_FORMAT).lower()
     model_bucket_name:str=MODEL_BUCKET_NAME
+    model_refresh_interval:int=MODEL_REGISTRY_REFRESH_INTERVAL_SECONDS
+
+
+@dataclass
+class LoggingConfig:
+    level:str=os.getenv(LOG_LEVEL,LOG_DEFAULT_LEVEL)
+    module_levels:str=os.getenv(LOG_MODULE_LEVELS,LOG_DEFAULT_MODULE_LEVELS)
+    log_format:str=os.getenv(LOG_FORMAT,LOG_DEFAULT_FORMAT).lower()
+    sampled_modules:tuple=tuple(filter(None,os.getenv(LOG_SAMPLED_MODULES,LOG_DEFAULT_SAMPLED_MODULES).split(",")))
+    sample_rate:int=int(os.getenv(LOG_SAMPLE_RATE,LOG_DEFAULT_SAMPLE_RATE))
+    queue_size:int=int(os.getenv(LOG_QUEUE_SIZE,LOG_DEFAULT_QUEUE_SIZE))
+
+
+@dataclass
+class ConnectionConfig:
+    s3_region_name:str=os.getenv(S3_REGION_NAME)
+    s3_max_pool_connections:int=int(os.getenv(S3_MAX_POOL_CONNECTIONS,S3_DEFAULT_MAX_POOL_CONNECTIONS))
+    s3_connect_timeout:float=float(os.getenv(S3_CONNECT_TIMEOUT_SECONDS,S3_DEFAULT_CONNECT_TIMEOUT_SECONDS))
+    s3_read_timeout:float=float(os.getenv(S3_READ_TIMEOUT_SECONDS,S3_DEFAULT_READ_TIMEOUT_SECONDS))
+    s3_max_attempts:int=int(os.getenv(S3_MAX_ATTEMPTS,S3_DEFAULT_MAX_ATTEMPTS))
+    s3_retry_mode:str=os.getenv(S3_RETRY_MODE,S3_DEFAULT_RETRY_MODE)
+    mongodb_max_pool_size:int=int(os.getenv(MONGODB_MAX_POOL_SIZE,MONGODB_DEFAULT_MAX_POOL_SIZE))
+    mongodb_min_pool_size:int=int(os.getenv(MONGODB_MIN_POOL_SIZE,MONGODB_DEFAULT_MIN_POOL_SIZE))
+    mongodb_connect_timeout_ms:int=int(os.getenv(MONGODB_CONNECT_TIMEOUT_MS,MONGODB_DEFAULT_CONNECT_TIMEOUT_MS))
+    mongodb_socket_timeout_ms:int=int(os.getenv(MONGODB_SOCKET_TIMEOUT_MS,MONGODB_DEFAULT_SOCKET_TIMEOUT_MS))
+    mongodb_server_selection_timeout_ms:int=int(os.getenv(MONGODB_SERVER_SELECTION_TIMEOUT_MS,MONGODB_DEFAULT_SERVER_SELECTION_TIMEOUT_MS))
+    mongodb_connect_attempts:int=int(os.getenv(MONGODB_CONNECT_ATTEMPTS,MONGODB_DEFAULT_CONNECT_ATTEMPTS))
+    mongodb_retry_backoff_seconds:float=MONGODB_RETRY_BACKOFF_SECONDS
+
+
+@dataclass
+class S3TransferConfig:
+    multipart_threshold_mb:int=int(os.getenv(S3_TRANSFER_MULTIPART_THRESHOLD_MB,S3_TRANSFER_DEFAULT_MULTIPART_THRESHOLD_MB))
+    multipart_chunk_size_mb:int=int(os.getenv(S3_TRANSFER_MULTIPART_CHUNK_SIZE_MB,S3_TRANSFER_DEFAULT_MULTIPART_CHUNK_SIZE_MB))
+    max_concurrency:int=int(os.getenv(S3_TRANSFER_MAX_CONCURRENCY,S3_TRANSFER_DEFAULT_MAX_CONCURRENCY))
+    verify_checksums:bool=os.getenv(S3_TRANSFER_VERIFY_CHECKSUMS,"true").lower() in ("1","true","yes")
+    checksum_metadata_key:str=S3_TRANSFER_CHECKSUM_METADATA_KEY
+
+
+@dataclass
+class ModelCacheConfig:
+    enabled:bool=os.getenv(MODEL_CACHE_ENABLED,"true").lower() in ("1","true","yes")
+    cache_dir:str=os.getenv(MODEL_CACHE_DIR,MODEL_CACHE_DEFAULT_DIR)
+    keep_versions:int=MODEL_CACHE_KEEP_VERSIONS
+    chunk_size:int=MODEL_CACHE_CHUNK_SIZE
+
+
+@dataclass
+class MicroBatcherConfig:
+    enabled:bool=os.getenv(MICRO_BATCH_ENABLED,"false").lower() in ("1","true","yes")
+    max_batch_size:int=int(os.getenv(MICRO_BATCH_MAX_SIZE,MICRO_BATCH_DEFAULT_MAX_SIZE))
+    max_wait_ms:float=float(os.getenv(MICRO_BATCH_MAX_WAIT_MS,MICRO_BATCH_DEFAULT_MAX_WAIT_MS))
+
+
+@dataclass
+class ServingConfig:
+    inference_threads:int=int(os.getenv(INFERENCE_THREADS,INFERENCE_DEFAULT_THREADS))
+
+
+@dataclass
+class ServingMetricsConfig:
+    enabled:bool=os.getenv(METRICS_ENABLED,"true").lower() in ("1","true","yes")
+    namespace:str=METRICS_NAMESPACE
+    latency_buckets:tuple=METRICS_LATENCY_BUCKETS
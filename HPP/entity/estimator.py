@@ -1,18 +1,32 @@
 import pandas as pd
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
+from HPP.entity.feature_encoder import FeatureEncoder
+from HPP.entity.housing_cleaner import HousingCleaner
+from HPP.entity.price_lookup_table import PriceLookupTable
+from HPP.entity.tree_ensemble import TreeEnsemble
 from HPP.exception import CustomException
 from HPP.logger import logging
 import sys 
 
 class HPPModel:
-    def __init__(self, preprocessing_obj: Pipeline, train_model_object: object):
+    def __init__(self, preprocessing_obj: Pipeline, train_model_object: object, cleaning_obj: HousingCleaner = None,
+                 compiled_model: TreeEnsemble = None, feature_encoder: FeatureEncoder = None,
+                 lookup_table: PriceLookupTable = None):
         """
         :param preprocessing_object: Input Object of preprocesser
         :param trained_model_object: Input Object of trained model 
+        :param cleaning_object: Fitted housing cleaner applied to raw inputs before preprocessing
+        :param compiled_model: Tree ensemble compiled from the trained model, used for small batches
+        :param feature_encoder: Encoder exported from the cleaner and preprocessor, used for single records
+        :param lookup_table: Precomputed prices of the form input grid, used for single records inside the grid
         """
         self.preprocessing_object = preprocessing_obj
         self.trained_model_object = train_model_object
+        self.cleaning_object = cleaning_obj
+        self.compiled_model = compiled_model
+        self.feature_encoder = feature_encoder
+        self.lookup_table = lookup_table
     
     def predict(self,dataframe:DataFrame)-> DataFrame:
         """
@@ -23,12 +37,68 @@ class HPPModel:
         logging.info("Entered predict method of USvisaModel class")
         try:
             logging.info("Using the trained model to get predictions")
-            transformed_feature=self.preprocessing_object.transform(dataframe)
-            print(transformed_feature.toarray())
+            transformed_feature=self.transform(dataframe)
             logging.info("Used the trained model to get predictions")
-            return self.trained_model_object.predict(transformed_feature)
+            return self.predict_transformed(transformed_feature)
         except Exception as e:
             raise CustomException(e,sys)
+
+    def transform(self, dataframe: DataFrame):
+        """
+        Cleans and preprocesses raw inputs into the features of the trained model
+        """
+        cleaning_object = getattr(self, "cleaning_object", None)
+        if cleaning_object is not None:
+            dataframe = cleaning_object.transform(dataframe)
+        return self.preprocessing_object.transform(dataframe)
+
+    def predict_transformed(self, transformed_feature):
+        """
+        Predicts already preprocessed features, batches up to the size where the compiled tree
+        ensemble was measured faster than the library go through it, larger ones through the library
+        """
+        compiled_model = getattr(self, "compiled_model", None)
+        if compiled_model is not None and transformed_feature.shape[0] <= compiled_model.max_batch_rows:
+            return compiled_model.predict(transformed_feature)
+        return self.trained_model_object.predict(transformed_feature)
+
+    def predict_record(self, record: dict) -> float:
+        """
+        Predicts a single raw record. Records inside the grid of the lookup table are answered from
+        it. Otherwise, with a feature encoder the record is encoded straight into a feature buffer,
+        skipping the DataFrame, the cleaner and the ColumnTransformer
+        """
+        try:
+            price = self.lookup_record(record)
+            if price is not None:
+                return price
+            return float(self.predict_transformed(self.transform_record(record))[0])
+        except Exception as e:
+            raise CustomException(e,sys)
+
+    def lookup_record(self, record: dict):
+        """
+        Price of the record from the lookup table, None without a table or outside its grid
+        """
+        lookup_table = getattr(self, "lookup_table", None)
+        return lookup_table.lookup(record) if lookup_table is not None else None
+
+    def transform_record(self, record: dict):
+        """
+        Features of a single raw record, with the feature encoder when the model has one
+        """
+        feature_encoder = getattr(self, "feature_encoder", None)
+        if feature_encoder is None:
+            return self.transform(pd.DataFrame([record]))
+        return feature_encoder.encode_record(record)
+
+    def warmup(self) -> None:
+        """
+        Compiles the native evaluator of the compiled model before the first request
+        """
+        compiled_model = getattr(self, "compiled_model", None)
+        if compiled_model is not None:
+            compiled_model.warmup()
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
     
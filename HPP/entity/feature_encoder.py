@@ -0,0 +1,207 @@
+import json
+import sys
+import threading
+from typing import List
+
+import numpy as np
+from pandas import DataFrame
+
+from HPP.exception import CustomException
+from HPP.utils.main_utils import prepare_model_inputs, prepare_model_record, to_float
+
+ONEHOT_BLOCK = "onehot"
+SCALE_BLOCK = "scale"
+
+
+class FeatureEncoder:
+    """
+    The fitted housing cleaner and preprocessor (ColumnTransformer of OneHotEncoder and
+    StandardScaler) as plain python and numpy objects: location -> bucket and category ->
+    column dicts, scaler mean and scale arrays. transform encodes a DataFrame in one pass
+    and encode_record encodes one raw record without building a DataFrame, into a buffer
+    allocated once per thread. The output is dense, entries the preprocessor leaves out of
+    its sparse output are NaN for models reading those as missing (XGBoost) and 0 otherwise.
+    """
+    def __init__(self, location_mapping: dict, other_location: str, blocks: List[dict],
+                 zero_as_missing: bool = False):
+        """
+        :param location_mapping: raw location -> location bucket learned by the housing cleaner
+        :param other_location: bucket of the unseen locations
+        :param blocks: output columns of the preprocessor in order, one hot blocks hold the column and its
+                       categories, scale blocks the columns with their mean and scale
+        :param zero_as_missing: the model reads entries missing from sparse input as NaN
+        """
+        self.location_mapping = location_mapping
+        self.other_location = other_location
+        self.blocks = blocks
+        self.zero_as_missing = zero_as_missing
+        self.n_features = 0
+        for block in blocks:
+            block["offset"] = self.n_features
+            if block["kind"] == ONEHOT_BLOCK:
+                block["index"] = {category: index for index, category in enumerate(block["categories"])}
+                self.n_features += len(block["categories"])
+            else:
+                self.n_features += len(block["columns"])
+        self._local = threading.local()
+
+    @classmethod
+    def from_hpp_model(cls, hpp_model) -> "FeatureEncoder":
+        """
+        Exports the fitted cleaner and preprocessor of an HPPModel, the preprocessor must be a
+        ColumnTransformer of OneHotEncoder and StandardScaler with the remaining columns dropped
+        """
+        try:
+            cleaning_object = getattr(hpp_model, "cleaning_object", None)
+            if cleaning_object is None:
+                raise Exception("The model has no fitted housing cleaner")
+            blocks = []
+            for name, transformer, columns in hpp_model.preprocessing_object.transformers_:
+                if name == "remainder":
+                    if transformer != "drop":
+                        raise Exception("Only dropped remainder columns are supported")
+                    continue
+                kind = type(transformer).__name__
+                if kind == "OneHotEncoder":
+                    if transformer.drop is not None:
+                        raise Exception("OneHotEncoder with drop is not supported")
+                    for column, categories in zip(columns, transformer.categories_):
+                        blocks.append({"kind": ONEHOT_BLOCK, "column": column,
+                                       "categories": [str(category) for category in categories]})
+                elif kind == "StandardScaler":
+                    mean = transformer.mean_ if transformer.mean_ is not None and transformer.with_mean else np.zeros(len(columns))
+                    scale = transformer.scale_ if transformer.scale_ is not None else np.ones(len(columns))
+                    blocks.append({"kind": SCALE_BLOCK, "columns": list(columns),
+                                   "mean": np.asarray(mean, dtype=np.float64),
+                                   "scale": np.asarray(scale, dtype=np.float64)})
+                else:
+                    raise Exception(f"Preprocessing step {kind} is not supported")
+            return cls(location_mapping=dict(cleaning_object.location_mapping_),
+                       other_location=cleaning_object.other_location, blocks=blocks,
+                       zero_as_missing=type(hpp_model.trained_model_object).__module__.startswith("xgboost"))
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def transform(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Encodes raw inputs as dense float32 features
+        """
+        dataframe = prepare_model_inputs(dataframe, self.location_mapping, self.other_location)
+        features = np.zeros((len(dataframe), self.n_features), dtype=np.float32)
+        for block in self.blocks:
+            offset = block["offset"]
+            if block["kind"] == ONEHOT_BLOCK:
+                index = block["index"]
+                codes = np.fromiter((index.get(value, -1) for value in dataframe[block["column"]].astype(str)),
+                                    dtype=np.int64, count=len(dataframe))
+                known = codes >= 0
+                features[np.flatnonzero(known), offset + codes[known]] = 1
+            else:
+                values = dataframe[block["columns"]].to_numpy(dtype=np.float64)
+                features[:, offset:offset + len(block["columns"])] = (values - block["mean"]) / block["scale"]
+        if self.zero_as_missing:
+            features[features == 0] = np.nan
+        return features
+
+    def encode_record(self, record: dict) -> np.ndarray:
+        """
+        Encodes one raw record as a (1, n_features) float32 array. The array is a buffer reused
+        by the next call on the same thread, it must be consumed before encoding again.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.zeros((1, self.n_features), dtype=np.float32)
+        row = buffer[0]
+        row.fill(0)
+        record = prepare_model_record(record, self.location_mapping, self.other_location)
+        for block in self.blocks:
+            offset = block["offset"]
+            if block["kind"] == ONEHOT_BLOCK:
+                code = block["index"].get(str(record.get(block["column"])))
+                if code is not None:
+                    row[offset + code] = 1
+            else:
+                for i, column in enumerate(block["columns"]):
+                    row[offset + i] = (to_float(record.get(column)) - block["mean"][i]) / block["scale"][i]
+        if self.zero_as_missing:
+            row[row == 0] = np.nan
+        return buffer
+
+    def make_probe_dataframe(self, n_rows: int = 1000, random_state: int = 42) -> DataFrame:
+        """
+        Raw inputs covering every location bucket and an unseen location, with random sizes,
+        areas and bathrooms, to check the encoder against the sklearn preprocessor
+        """
+        random = np.random.RandomState(random_state)
+        locations = np.array(sorted(self.location_mapping) + ["unseen location"], dtype=object)
+        return DataFrame({"location": random.choice(locations, size=n_rows),
+                          "size": [f"{bhk} BHK" for bhk in random.randint(1, 7, size=n_rows)],
+                          "total_sqft": random.uniform(300, 5000, size=n_rows).round(0).astype(str),
+                          "bath": random.randint(1, 6, size=n_rows).astype(float)})
+
+    def check_parity(self, hpp_model, n_rows: int = 1000) -> float:
+        """
+        Largest absolute difference between the features of transform, encode_record and the
+        sklearn cleaner and preprocessor of hpp_model on probe inputs, NaN entries must match too
+        """
+        try:
+            probe = self.make_probe_dataframe(n_rows=n_rows)
+            expected = hpp_model.preprocessing_object.transform(hpp_model.cleaning_object.transform(probe))
+            expected = expected.toarray() if hasattr(expected, "toarray") else np.asarray(expected)
+            expected = expected.astype(np.float32)
+            if self.zero_as_missing:
+                expected[expected == 0] = np.nan
+            by_record = np.vstack([self.encode_record(record).copy() for record in probe.to_dict("records")])
+            max_error = 0.0
+            for features in (self.transform(probe), by_record):
+                if not np.array_equal(np.isnan(features), np.isnan(expected)):
+                    return np.inf
+                max_error = max(max_error, float(np.nanmax(np.abs(features - expected))))
+            return max_error
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_arrays(self, prefix: str = "") -> dict:
+        """
+        Arrays and metadata of the encoder, as stored in npz files
+        """
+        arrays = {}
+        blocks = []
+        for i, block in enumerate(self.blocks):
+            if block["kind"] == ONEHOT_BLOCK:
+                arrays[f"{prefix}categories_{i}"] = np.array(block["categories"], dtype=str)
+                blocks.append({"kind": ONEHOT_BLOCK, "column": block["column"]})
+            else:
+                arrays[f"{prefix}mean_{i}"] = block["mean"]
+                arrays[f"{prefix}scale_{i}"] = block["scale"]
+                blocks.append({"kind": SCALE_BLOCK, "columns": block["columns"]})
+        arrays[f"{prefix}location_keys"] = np.array(list(self.location_mapping), dtype=str)
+        arrays[f"{prefix}location_values"] = np.array(list(self.location_mapping.values()), dtype=str)
+        arrays[f"{prefix}meta"] = np.array(json.dumps({"other_location": self.other_location, "blocks": blocks,
+                                                       "zero_as_missing": self.zero_as_missing}))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str = "") -> "FeatureEncoder":
+        meta = json.loads(str(arrays[f"{prefix}meta"]))
+        blocks = []
+        for i, block in enumerate(meta["blocks"]):
+            if block["kind"] == ONEHOT_BLOCK:
+                block["categories"] = arrays[f"{prefix}categories_{i}"].tolist()
+            else:
+                block["mean"] = arrays[f"{prefix}mean_{i}"]
+                block["scale"] = arrays[f"{prefix}scale_{i}"]
+            blocks.append(block)
+        location_mapping = dict(zip(arrays[f"{prefix}location_keys"].tolist(),
+                                    arrays[f"{prefix}location_values"].tolist()))
+        return cls(location_mapping=location_mapping, other_location=meta["other_location"], blocks=blocks,
+                   zero_as_missing=meta["zero_as_missing"])
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("_local")
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
@@ -0,0 +1,92 @@
+import sys
+from typing import List, Optional
+
+import pandas as pd
+from pandas import DataFrame
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from HPP.constants import TARGET_COLUMN
+from HPP.exception import CustomException
+from HPP.logger import logging
+from HPP.pipeline.stage_profiler import get_stage_profiler
+from HPP.utils.main_utils import (drop_columns, parse_no_of_bhk, parse_total_sqft, prepare_model_inputs,
+                                  remove_bhk_outliers, remove_pps_outliers)
+
+
+class HousingCleaner(BaseEstimator, TransformerMixin):
+    """
+    Cleaning stage shared by training, evaluation and serving.
+    fit learns the location vocabulary and maps the rare locations to a single bucket,
+    clean runs the full cleaning chain on a labelled dataset and transform applies the
+    learned mapping and the column parsing to raw inputs at prediction time.
+    """
+    def __init__(self, drop_cols: Optional[List[str]] = None, min_location_count: int = 10,
+                 other_location: str = "other", min_sqft_per_bhk: float = 300):
+        """
+        :param drop_cols: raw columns which are not used by the model
+        :param min_location_count: locations seen this many times or less are bucketed
+        :param other_location: name of the bucket for rare and unseen locations
+        :param min_sqft_per_bhk: rows with less total_sqft per bedroom are removed while cleaning
+        """
+        self.drop_cols = drop_cols
+        self.min_location_count = min_location_count
+        self.other_location = other_location
+        self.min_sqft_per_bhk = min_sqft_per_bhk
+
+    def _drop_unused(self, dataframe: DataFrame) -> DataFrame:
+        cols = [col for col in (self.drop_cols or []) if col in dataframe.columns]
+        return drop_columns(df=dataframe, cols=cols).dropna()
+
+    def fit(self, X: DataFrame, y=None):
+        """
+        Learns the location -> bucket mapping from the raw dataset
+        """
+        try:
+            location_count = self._drop_unused(X)['location'].value_counts()
+            self.location_mapping_ = {location: (location if count > self.min_location_count else self.other_location)
+                                      for location, count in location_count.items()}
+            self.location_mapping_.setdefault(self.other_location, self.other_location)
+            logging.info(f"Fitted housing cleaner on {len(location_count)} locations, "
+                         f"{sum(count <= self.min_location_count for count in location_count)} mapped to {self.other_location}")
+            return self
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def map_location(self, location: pd.Series) -> pd.Series:
+        """
+        Maps locations to their learned bucket, unseen locations go to other_location
+        """
+        return location.map(self.location_mapping_).fillna(self.other_location)
+
+    def transform(self, X: DataFrame) -> DataFrame:
+        """
+        Prepares raw model inputs: parses size and total_sqft, coerces the numerical
+        columns and applies the learned location mapping. Rows are never dropped.
+        """
+        try:
+            return prepare_model_inputs(X, self.location_mapping_, self.other_location)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def clean(self, dataframe: DataFrame) -> DataFrame:
+        """
+        Runs the full cleaning chain on a labelled dataset: drops unused columns and
+        missing values, parses the columns, buckets the locations and removes outliers
+        """
+        try:
+            df1 = self._drop_unused(dataframe)
+            df1["no_of_BHK"] = parse_no_of_bhk(df1["size"])
+            df1["total_sqft"] = parse_total_sqft(df1["total_sqft"])
+            df1["price_per_sqft"] = df1[TARGET_COLUMN] * 100000 / df1["total_sqft"]
+            df1["location"] = self.map_location(df1["location"])
+            df2 = df1[~(df1["total_sqft"] / df1["no_of_BHK"] < self.min_sqft_per_bhk)]
+            with get_stage_profiler().step("outlier_removal", rows=len(df2)):
+                df3 = remove_pps_outliers(df2)
+                df4 = remove_bhk_outliers(df3)
+                get_stage_profiler().record(rows_removed=len(df2) - len(df4))
+            df5 = df4[df4.bath < df4.no_of_BHK + 2]
+            df6 = drop_columns(df=df5, cols=["size", "price_per_sqft"])
+            logging.info(f"Cleaned dataset from {len(dataframe)} to {len(df6)} rows")
+            return df6
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,345 @@
+import inspect
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from neuro_mf import GridSearchedBestModel, InitializedModelDetail, ModelFactory
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid, check_cv
+from threadpoolctl import threadpool_limits
+
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+SEARCH_ENGINE_KEY = "search_engine"
+SEARCH_BACKEND_KEY = "backend"
+SEARCH_BACKEND_PROCESS_POOL = "process_pool"
+N_JOBS_KEY = "n_jobs"
+THREADS_PER_WORKER_KEY = "threads_per_worker"
+CV_KEY = "cv"
+SEARCH_KEY = "search"
+SEARCH_GRID = "grid"
+SEARCH_HALVING = "halving"
+
+# constructor arguments through which the boosting libraries size their own thread pools
+ESTIMATOR_THREAD_PARAMS = ("thread_count", "n_jobs")
+
+_worker_state: dict = {}
+
+
+def get_estimator_thread_params(estimator, threads: Optional[int] = None) -> dict:
+    """
+    Thread count arguments of the estimator (CatBoost thread_count, XGBoost / sklearn n_jobs),
+    set to threads or, when threads is None, to the values currently configured
+    """
+    accepted = inspect.signature(type(estimator).__init__).parameters
+    names = [name for name in ESTIMATOR_THREAD_PARAMS if name in accepted]
+    if threads is not None:
+        return {name: threads for name in names}
+    params = estimator.get_params()
+    return {name: params.get(name, accepted[name].default) for name in names}
+
+
+def fit_with_early_stopping(estimator, x_train, y_train, x_valid, y_valid, early_stopping_rounds: int):
+    """
+    Fits the estimator and stops boosting once the validation score did not improve for
+    early_stopping_rounds rounds. Estimators without early stopping are fit normally.
+    """
+    module = type(estimator).__module__
+    if module.startswith("catboost"):
+        return estimator.fit(x_train, y_train, eval_set=(x_valid, y_valid),
+                             early_stopping_rounds=early_stopping_rounds, verbose=False)
+    if module.startswith("xgboost"):
+        estimator.set_params(early_stopping_rounds=early_stopping_rounds)
+        return estimator.fit(x_train, y_train, eval_set=[(x_valid, y_valid)], verbose=False)
+    return estimator.fit(x_train, y_train)
+
+
+def split_early_stopping_rows(train_index: np.ndarray, early_stopping_samples: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Splits the training rows of a fold into the rows to fit on and the rows boosting is stopped
+    on: the last early_stopping_samples rows (at most a fifth of them). The held out part of the
+    fold is only used for scoring, stopping on it would tune every candidate on its own test rows.
+    """
+    n_valid = max(1, len(train_index) // 5)
+    if early_stopping_samples:
+        n_valid = min(n_valid, early_stopping_samples)
+    return train_index[:-n_valid], train_index[-n_valid:]
+
+
+def _init_search_worker(x, y, estimators: dict, candidates: dict, folds: list, threads: int) -> None:
+    """
+    Runs once per worker process: the training data and the search space are sent here once
+    instead of with every task, and native thread pools are capped to threads
+    """
+    threadpool_limits(limits=threads)
+    _worker_state.update(x=x, y=y, estimators=estimators, candidates=candidates, folds=folds, threads=threads)
+
+
+def _fit_candidate(model_serial_number: str, candidate_index: int, fold_index: Optional[int],
+                   n_samples: Optional[int] = None, early_stopping_rounds: Optional[int] = None,
+                   early_stopping_samples: Optional[int] = None):
+    """
+    Fits one candidate of a model on one fold and scores it with r2 on the held out part,
+    with fold_index None the candidate is refit on the whole training data and returned.
+    n_samples limits the fit to the first rows of the (shuffled) fold, early_stopping_rounds
+    stops boosting on at most early_stopping_samples rows taken from the end of the training
+    part, boosting libraries evaluate that set after every round so it is kept small.
+    """
+    start = time.perf_counter()
+    x, y = _worker_state["x"], _worker_state["y"]
+    estimator = clone(_worker_state["estimators"][model_serial_number])
+    estimator.set_params(**_worker_state["candidates"][model_serial_number][candidate_index])
+    configured_thread_params = get_estimator_thread_params(estimator)
+    estimator.set_params(**get_estimator_thread_params(estimator, _worker_state["threads"]))
+    if fold_index is None:
+        estimator.fit(x, y)
+        # the refit model is served later, give it back the thread settings of model.yaml.
+        # CatBoost refuses changes after fit, its predict picks its own thread count anyway
+        try:
+            estimator.set_params(**configured_thread_params)
+        except Exception:
+            pass
+        return estimator, time.perf_counter() - start
+    train_index, test_index = _worker_state["folds"][fold_index]
+    if early_stopping_rounds:
+        train_index, valid_index = split_early_stopping_rows(train_index, early_stopping_samples)
+    if n_samples is not None:
+        train_index = train_index[:n_samples]
+    try:
+        if early_stopping_rounds:
+            fit_with_early_stopping(estimator, x[train_index], y[train_index], x[valid_index], y[valid_index],
+                                    early_stopping_rounds)
+        else:
+            estimator.fit(x[train_index], y[train_index])
+        score = r2_score(y[test_index], estimator.predict(x[test_index]))
+        error = None
+    except Exception as e:
+        score, error = np.nan, str(e)
+    return score, time.perf_counter() - start, error
+
+
+class ParallelModelFactory(ModelFactory):
+    """
+    Drop in replacement of neuro_mf ModelFactory which runs the parameter search of all models as
+    independent (model, parameters, fold) tasks on a process pool instead of one GridSearchCV
+    after the other. The search_engine section of model.yaml sets n_jobs (worker processes,
+    -1 for all cpus) and threads_per_worker, the thread budget of every fit so that the
+    workers and the CatBoost / XGBoost internal threads do not oversubscribe the cpus.
+
+    search: grid follows GridSearchCV: mean r2 over the cv folds for every candidate, first
+    candidate wins ties. search: halving runs successive halving: all candidates are first
+    fit on a small subsample of every fold with early stopping on the held out part, only
+    the best 1/factor are kept for the next round which gets factor times more rows, the last
+    round uses the full folds. Either way the best candidate is refit on the whole training data
+    and a report of the search (optionally next to an exhaustive grid) is kept in search_report.
+    """
+    def __init__(self, model_config_path: str = None):
+        """
+        :param model_config_path: location of model.yaml
+        """
+        try:
+            super().__init__(model_config_path)
+            search_engine_config = dict(self.config.get(SEARCH_ENGINE_KEY) or {})
+            cpu_count = os.cpu_count() or 1
+            n_jobs = int(search_engine_config.get(N_JOBS_KEY, -1))
+            self.n_jobs = cpu_count if n_jobs <= 0 else n_jobs
+            self.threads_per_worker = int(search_engine_config.get(THREADS_PER_WORKER_KEY)
+                                          or max(1, cpu_count // self.n_jobs))
+            self.cv = self.grid_search_property_data.get(CV_KEY, 5)
+            self.search = search_engine_config.get(SEARCH_KEY, SEARCH_GRID)
+            if self.search not in (SEARCH_GRID, SEARCH_HALVING):
+                raise Exception(f"Unknown search {self.search}, expected {SEARCH_GRID} or {SEARCH_HALVING}")
+            halving_config = dict(search_engine_config.get(SEARCH_HALVING) or {})
+            self.factor = float(halving_config.get("factor", 3))
+            self.min_samples = int(halving_config.get("min_samples", 200))
+            self.early_stopping_rounds = halving_config.get("early_stopping_rounds", 20)
+            self.early_stopping_samples = halving_config.get("early_stopping_samples", 500)
+            self.random_state = halving_config.get("random_state", 42)
+            self.compare_with_grid = bool(halving_config.get("compare_with_grid", False))
+            self.search_report: dict = {}
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def is_enabled(model_config: dict) -> bool:
+        search_engine_config = model_config.get(SEARCH_ENGINE_KEY) or {}
+        return search_engine_config.get(SEARCH_BACKEND_KEY) == SEARCH_BACKEND_PROCESS_POOL
+
+    def _run_round(self, executor, tasks: List[tuple], estimators: dict, candidates: dict, fold_count: int,
+                   n_samples: Optional[dict] = None, early_stopping_rounds: Optional[int] = None,
+                   early_stopping_samples: Optional[int] = None) -> dict:
+        """
+        Runs (model, candidate) pairs on every fold and returns their mean score per model.
+        n_samples maps a model to the rows each fold is fit on, all rows when missing.
+        """
+        n_samples = n_samples or {}
+        fold_tasks = [(serial_number, candidate_index, fold_index)
+                      for serial_number, candidate_index in tasks for fold_index in range(fold_count)]
+        results = executor.map(_fit_candidate, *zip(*fold_tasks),
+                               [n_samples.get(serial_number) for serial_number, _, _ in fold_tasks],
+                               [early_stopping_rounds] * len(fold_tasks),
+                               [early_stopping_samples] * len(fold_tasks))
+        fold_results = dict(zip(fold_tasks, results))
+        scores = {}
+        for serial_number, candidate_index in tasks:
+            results_of_candidate = [fold_results[(serial_number, candidate_index, fold_index)]
+                                    for fold_index in range(fold_count)]
+            mean_score = float(np.mean([score for score, _, _ in results_of_candidate]))
+            fit_seconds = sum(seconds for _, seconds, _ in results_of_candidate)
+            errors = [error for _, _, error in results_of_candidate if error is not None]
+            self._fits += len(results_of_candidate)
+            self._fit_seconds += fit_seconds
+            scores.setdefault(serial_number, {})[candidate_index] = mean_score
+            logging.info(f"{serial_number} {type(estimators[serial_number]).__name__} "
+                         f"{candidates[serial_number][candidate_index]}"
+                         + (f" on {n_samples[serial_number]} rows" if serial_number in n_samples else "")
+                         + f": mean r2 {mean_score:.4f}, fit wall time {fit_seconds:.2f}s"
+                         + (f", failed folds: {errors}" if errors else ""))
+        return scores
+
+    @staticmethod
+    def _pick_best(scores: Dict[int, float]) -> Optional[Tuple[int, float]]:
+        """
+        best candidate index and score, the first candidate wins ties as in GridSearchCV
+        """
+        valid = [(score, -candidate_index) for candidate_index, score in scores.items() if not np.isnan(score)]
+        if not valid:
+            return None
+        score, negative_index = max(valid)
+        return -negative_index, score
+
+    def _grid_search(self, executor, estimators: dict, candidates: dict, fold_count: int) -> dict:
+        tasks = [(serial_number, candidate_index)
+                 for serial_number, params in candidates.items() for candidate_index in range(len(params))]
+        scores = self._run_round(executor, tasks, estimators, candidates, fold_count)
+        return {serial_number: self._pick_best(scores[serial_number]) for serial_number in candidates}
+
+    def _halving_search(self, executor, estimators: dict, candidates: dict, fold_count: int,
+                        max_samples: int) -> dict:
+        rounds = {serial_number: int(np.floor(np.log(len(params)) / np.log(self.factor) + 1e-9)) + 1
+                  for serial_number, params in candidates.items()}
+        remaining = {serial_number: list(range(len(params))) for serial_number, params in candidates.items()}
+        best = {}
+        self.search_report["rounds"] = []
+        for round_index in range(max(rounds.values())):
+            active = [serial_number for serial_number in candidates
+                      if round_index < rounds[serial_number] and remaining[serial_number]]
+            n_samples = {serial_number: max(self.min_samples,
+                                            int(max_samples / self.factor ** (rounds[serial_number] - 1 - round_index)))
+                         for serial_number in active}
+            n_samples = {serial_number: rows for serial_number, rows in n_samples.items() if rows < max_samples}
+            tasks = [(serial_number, candidate_index)
+                     for serial_number in active for candidate_index in remaining[serial_number]]
+            scores = self._run_round(executor, tasks, estimators, candidates, fold_count,
+                                     n_samples=n_samples, early_stopping_rounds=self.early_stopping_rounds,
+                                     early_stopping_samples=self.early_stopping_samples)
+            for serial_number in active:
+                ranked = sorted((candidate_index for candidate_index in remaining[serial_number]
+                                 if not np.isnan(scores[serial_number][candidate_index])),
+                                key=lambda candidate_index: (-scores[serial_number][candidate_index], candidate_index))
+                self.search_report["rounds"].append({"model": serial_number,
+                                                     "round": round_index,
+                                                     "candidates": len(remaining[serial_number]),
+                                                     "rows_per_fold": n_samples.get(serial_number, max_samples),
+                                                     "best_score": scores[serial_number][ranked[0]] if ranked else None})
+                if round_index == rounds[serial_number] - 1:
+                    best[serial_number] = (ranked[0], scores[serial_number][ranked[0]]) if ranked else None
+                else:
+                    keep = max(1, int(np.ceil(len(remaining[serial_number]) / self.factor)))
+                    remaining[serial_number] = sorted(ranked[:keep])
+        return best
+
+    def _report_section(self, best: dict, candidates: dict, started: float) -> dict:
+        section = {"fits": self._fits,
+                   "fit_seconds": round(self._fit_seconds, 3),
+                   "wall_seconds": round(time.perf_counter() - started, 3),
+                   "models": {serial_number: ({"best_parameters": candidates[serial_number][result[0]],
+                                               "best_score": result[1]} if result is not None else None)
+                              for serial_number, result in best.items()}}
+        self._fits, self._fit_seconds = 0, 0.0
+        return section
+
+    def initiate_best_parameter_search_for_initialized_models(self,
+                                                              initialized_model_list: List[InitializedModelDetail],
+                                                              input_feature,
+                                                              output_feature) -> List[GridSearchedBestModel]:
+        try:
+            y = np.asarray(output_feature)
+            folds = list(check_cv(self.cv, y, classifier=False).split(input_feature, y))
+            if self.search == SEARCH_HALVING:
+                # subsamples of a fold are its first rows, shuffle once so that they are random
+                random_state = np.random.RandomState(self.random_state)
+                folds = [(random_state.permutation(train_index), test_index) for train_index, test_index in folds]
+            estimators = {model.model_serial_number: model.model for model in initialized_model_list}
+            candidates = {model.model_serial_number: list(ParameterGrid(model.param_grid_search))
+                          for model in initialized_model_list}
+            n_tasks = sum(len(params) for params in candidates.values()) * len(folds)
+            workers = max(1, min(self.n_jobs, n_tasks))
+            logging.info(f"Parallel {self.search} search over {n_tasks // len(folds)} candidates ({len(folds)} folds) "
+                         f"on {workers} workers with {self.threads_per_worker} threads each")
+            self._fits, self._fit_seconds = 0, 0.0
+            self.search_report = {"search": self.search, "n_jobs": workers, "threads_per_worker": self.threads_per_worker}
+            search_start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_search_worker,
+                                     initargs=(input_feature, y, estimators, candidates, folds,
+                                               self.threads_per_worker)) as executor:
+                if self.search == SEARCH_HALVING:
+                    best = self._halving_search(executor, estimators, candidates, len(folds),
+                                                max_samples=min(len(train_index) for train_index, _ in folds))
+                    self.search_report[SEARCH_HALVING] = self._report_section(best, candidates, search_start)
+                    if self.compare_with_grid:
+                        grid_start = time.perf_counter()
+                        grid_best = self._grid_search(executor, estimators, candidates, len(folds))
+                        self.search_report[SEARCH_GRID] = self._report_section(grid_best, candidates, grid_start)
+                        self.search_report["comparison"] = self._compare(self.search_report[SEARCH_HALVING],
+                                                                         self.search_report[SEARCH_GRID])
+                else:
+                    best = self._grid_search(executor, estimators, candidates, len(folds))
+                    self.search_report[SEARCH_GRID] = self._report_section(best, candidates, search_start)
+                best = {serial_number: result for serial_number, result in best.items() if result is not None}
+                for serial_number in candidates:
+                    if serial_number not in best:
+                        logging.info(f"All candidates of {serial_number} failed, skipping it")
+                refits = {serial_number: executor.submit(_fit_candidate, serial_number, best_index, None)
+                          for serial_number, (best_index, _) in best.items()}
+                self.grid_searched_best_model_list = []
+                for model in initialized_model_list:
+                    if model.model_serial_number not in refits:
+                        continue
+                    best_index, best_score = best[model.model_serial_number]
+                    best_model, refit_time = refits[model.model_serial_number].result()
+                    logging.info(f"Refit {model.model_serial_number} on full training data in {refit_time:.2f}s")
+                    self.grid_searched_best_model_list.append(
+                        GridSearchedBestModel(model_serial_number=model.model_serial_number,
+                                              model=model.model,
+                                              best_model=best_model,
+                                              best_parameters=candidates[model.model_serial_number][best_index],
+                                              best_score=best_score))
+            logging.info(f"Parallel {self.search} search finished in {time.perf_counter() - search_start:.2f}s")
+            logging.info(f"Search report: {self.search_report}")
+            return self.grid_searched_best_model_list
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def _compare(halving: dict, grid: dict) -> dict:
+        """
+        best r2 and fit time of the halving search relative to the exhaustive grid
+        """
+        def best_score(section: dict) -> Optional[float]:
+            scores = [model["best_score"] for model in section["models"].values() if model is not None]
+            return max(scores) if scores else None
+
+        halving_score, grid_score = best_score(halving), best_score(grid)
+        return {"halving_best_score": halving_score,
+                "grid_best_score": grid_score,
+                "score_difference": None if None in (halving_score, grid_score) else halving_score - grid_score,
+                "fit_seconds_ratio": halving["fit_seconds"] / grid["fit_seconds"] if grid["fit_seconds"] else None,
+                "fits_ratio": halving["fits"] / grid["fits"] if grid["fits"] else None}
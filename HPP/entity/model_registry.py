@@ -0,0 +1,192 @@
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Tuple, TYPE_CHECKING, Union
+
+from HPP.constants import SERVING_MODEL_FORMAT_AUTO, SERVING_MODEL_FORMAT_NPZ, SERVING_MODEL_FORMAT_PICKLE
+from HPP.entity.config_entity import HPPredictorConfig
+from HPP.entity.s3_estimator import HPPEstimator
+from HPP.entity.serving_model import ServingModel
+from HPP.exception import CustomException
+from HPP.logger import logging
+from HPP.pipeline.prediction_cache import get_prediction_cache
+
+if TYPE_CHECKING:
+    # only for annotations, importing HPPModel loads sklearn which the npz serving model avoids
+    from HPP.entity.estimator import HPPModel
+
+
+class ModelRegistry:
+    """
+    This class keeps one loaded HPPModel for the whole process so that every request
+    shares it instead of downloading the model from s3 again. A background thread
+    polls the model version (ETag) and swaps in the new model once it is fully loaded,
+    in-flight requests keep using the model they already got.
+    With the default model format (auto) the numpy serving model (npz) is served when it is
+    published, with the pickled HPPModel loaded only for the batches it is too slow for. The
+    npz format always serves the numpy serving model and the pickle format the pickled HPPModel.
+    """
+    def __init__(self, prediction_pipeline_config: HPPredictorConfig = HPPredictorConfig()):
+        """
+        :param prediction_pipeline_config: Configuration with the model bucket, key and refresh interval
+        """
+        self.prediction_pipeline_config = prediction_pipeline_config
+        self.estimator = HPPEstimator(bucket_name=prediction_pipeline_config.model_bucket_name,
+                                      model_path=prediction_pipeline_config.model_file_path)
+        self.serving_estimator = HPPEstimator(bucket_name=prediction_pipeline_config.model_bucket_name,
+                                              model_path=prediction_pipeline_config.serving_model_file_path)
+        self._current: Tuple[Optional[Union["HPPModel", ServingModel]], Optional[str]] = (None, None)
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._loads_total = 0
+        self._refresh_errors_total = 0
+        self._last_load_seconds: Optional[float] = None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._current[1]
+
+    def add_reload_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        Registers a function called with the new version every time a new model is swapped in
+        """
+        self._reload_listeners.append(listener)
+
+    def get_model_and_version(self) -> Tuple[Union["HPPModel", ServingModel], Optional[str]]:
+        """
+        Returns the current model with its version, read together so that they always match
+        """
+        self.get_model()
+        return self._current
+
+    def get_model(self) -> Union["HPPModel", ServingModel]:
+        """
+        Returns the current model, loading it on first use
+        """
+        try:
+            model, _ = self._current
+            if model is None:
+                self.refresh()
+                model, _ = self._current
+            if model is None:
+                raise Exception(f"No model available at {self.estimator.model_path} in {self.estimator.bucket_name} bucket")
+            return model
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_published_model(self) -> Tuple[HPPEstimator, Optional[str]]:
+        """
+        Returns the estimator of the model to serve and its version, None when nothing is published
+        """
+        model_format = self.prediction_pipeline_config.model_format
+        if model_format != SERVING_MODEL_FORMAT_PICKLE:
+            version = self.serving_estimator.get_model_version()
+            if version is not None or model_format == SERVING_MODEL_FORMAT_NPZ:
+                return self.serving_estimator, version
+        return self.estimator, self.estimator.get_model_version()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Loads the published model if its version differs from the loaded one
+        :param force: reload even when the version did not change
+        :return: True when a new model was swapped in
+        """
+        try:
+            with self._load_lock:
+                estimator, version = self.get_published_model()
+                _, current_version = self._current
+                if version is None:
+                    logging.info("No published model found in model registry bucket")
+                    return False
+                if not force and version == current_version and self._current[0] is not None:
+                    return False
+                logging.info(f"Loading model {estimator.model_path} version {version} into model registry")
+                started = time.perf_counter()
+                model = estimator.load_model(version=version)
+                if estimator is self.serving_estimator \
+                        and self.prediction_pipeline_config.model_format == SERVING_MODEL_FORMAT_AUTO:
+                    model.batch_model_loader = self.estimator.load_model
+                model.warmup()
+                self._current = (model, version)
+                self._last_load_seconds = time.perf_counter() - started
+                self._loads_total += 1
+                logging.info(f"Model registry now serving version {version}, loaded in {self._last_load_seconds:.2f}s")
+            for listener in self._reload_listeners:
+                try:
+                    listener(version)
+                except Exception as e:
+                    logging.error(f"Model registry reload listener failed: {e}")
+            return True
+        except Exception as e:
+            self._refresh_errors_total += 1
+            raise CustomException(e, sys)
+
+    def metrics(self) -> dict:
+        """
+        Returns the version of the model served, how long it took to load and the load and refresh error counters
+        """
+        model, version = self._current
+        return {
+            "model_loaded": model is not None,
+            "model_version": version,
+            "model_type": type(model).__name__ if model is not None else None,
+            "last_load_seconds": self._last_load_seconds,
+            "loads_total": self._loads_total,
+            "refresh_errors_total": self._refresh_errors_total,
+        }
+
+    def refresh_in_background(self) -> threading.Thread:
+        """
+        Triggers a single refresh without blocking the caller
+        """
+        thread = threading.Thread(target=self._safe_refresh, name="model-registry-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def start(self) -> None:
+        """
+        Loads the model and starts the background thread which polls for new versions
+        """
+        self._safe_refresh()
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(target=self._poll, name="model-registry-poll", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
+
+    def _poll(self) -> None:
+        while not self._stop_event.wait(self.prediction_pipeline_config.model_refresh_interval):
+            self._safe_refresh()
+
+    def _safe_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Model registry refresh failed: {e}")
+
+
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Returns the process wide model registry, creating it on first use with the process wide
+    prediction cache cleared on every reload
+    """
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                model_registry = ModelRegistry()
+                model_registry.add_reload_listener(lambda version: get_prediction_cache().clear(version))
+                _model_registry = model_registry
+    return _model_registry
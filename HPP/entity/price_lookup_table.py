@@ -0,0 +1,173 @@
+import json
+import sys
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from HPP.entity.feature_encoder import ONEHOT_BLOCK, SCALE_BLOCK, FeatureEncoder
+from HPP.entity.tree_ensemble import TreeEnsemble
+from HPP.exception import CustomException
+from HPP.utils.main_utils import prepare_model_record
+
+
+class PriceLookupTable:
+    """
+    Precomputed predictions of a tree model over the discrete input grid of the form:
+    every location bucket x BHK x bath cell holds the price as a piecewise constant function
+    of total_sqft. The pieces change only at the total_sqft split thresholds of the trees,
+    kept once on the scaled (float32) total_sqft the trees compare, so a lookup picks the same
+    piece the trees would. Neighbouring pieces with the same price are merged and each cell
+    keeps the indices of the thresholds where its price changes. Cells are laid out like a
+    CSR matrix: offsets[cell]:offsets[cell + 1] are the breakpoints of the cell and its prices
+    start at offsets[cell] + cell.
+    """
+    def __init__(self, feature_encoder: FeatureEncoder, bhk_range: Tuple[int, int], bath_range: Tuple[int, int],
+                 sqft_range: Tuple[float, float], thresholds: np.ndarray, offsets: np.ndarray,
+                 breakpoints: np.ndarray, prices: np.ndarray, less_equal: bool):
+        """
+        :param feature_encoder: encoder of the model, for the location buckets and the total_sqft scaling
+        :param bhk_range: smallest and largest no_of_BHK of the grid
+        :param bath_range: smallest and largest bath of the grid
+        :param sqft_range: smallest and largest total_sqft answered from the table
+        :param thresholds: sorted scaled total_sqft split thresholds of the trees
+        :param offsets: start of the breakpoints of every cell, n_cells + 1 values
+        :param breakpoints: threshold indices where the price of a cell changes, of all cells
+        :param prices: prices of all pieces of all cells
+        :param less_equal: a value equal to a breakpoint belongs to the lower piece (CatBoost) instead of the upper one
+        """
+        self.feature_encoder = feature_encoder
+        self.bhk_range = tuple(int(value) for value in bhk_range)
+        self.bath_range = tuple(int(value) for value in bath_range)
+        self.sqft_range = tuple(float(value) for value in sqft_range)
+        self.thresholds = np.ascontiguousarray(thresholds, dtype=np.float32)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        # at most 65535 thresholds on one feature, which the boosting libraries never reach
+        index_dtype = np.uint8 if len(self.thresholds) < 2 ** 8 else np.uint16
+        self.breakpoints = np.ascontiguousarray(breakpoints, dtype=index_dtype)
+        # float32 prices halve the table, their rounding is far below the compile tolerance
+        self.prices = np.ascontiguousarray(prices, dtype=np.float32)
+        self.less_equal = bool(less_equal)
+        self._location_block, self._scale_block = self._get_blocks(feature_encoder)
+        self._sqft_position = self._scale_block["columns"].index("total_sqft")
+        self.n_bhk = self.bhk_range[1] - self.bhk_range[0] + 1
+        self.n_bath = self.bath_range[1] - self.bath_range[0] + 1
+
+    @staticmethod
+    def _get_blocks(feature_encoder: FeatureEncoder) -> Tuple[dict, dict]:
+        onehot = [block for block in feature_encoder.blocks if block["kind"] == ONEHOT_BLOCK]
+        scale = [block for block in feature_encoder.blocks if block["kind"] == SCALE_BLOCK]
+        if len(onehot) != 1 or onehot[0]["column"] != "location" or len(scale) != 1 \
+                or not {"total_sqft", "bath", "no_of_BHK"} <= set(scale[0]["columns"]):
+            raise Exception("Lookup table needs a location one hot block and scaled total_sqft, bath and no_of_BHK")
+        return onehot[0], scale[0]
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.offsets) - 1
+
+    def _scale(self, column: str, values):
+        position = self._scale_block["columns"].index(column)
+        return (np.asarray(values, dtype=np.float64) - self._scale_block["mean"][position]) / self._scale_block["scale"][position]
+
+    @classmethod
+    def build(cls, feature_encoder: FeatureEncoder, tree_ensemble: TreeEnsemble, predict_fn: Callable,
+              bhk_range: Tuple[int, int], bath_range: Tuple[int, int], sqft_range: Tuple[float, float]) -> "PriceLookupTable":
+        """
+        Predicts one representative total_sqft per piece for every cell with predict_fn, which
+        takes dense features laid out like FeatureEncoder.transform output
+        """
+        try:
+            scale_block = cls._get_blocks(feature_encoder)[1]
+            sqft_column = scale_block["offset"] + scale_block["columns"].index("total_sqft")
+            thresholds = np.unique(tree_ensemble.threshold[tree_ensemble.feature == sqft_column]).astype(np.float32)
+            table = cls(feature_encoder, bhk_range, bath_range, sqft_range, thresholds=thresholds, offsets=np.zeros(1),
+                        breakpoints=np.zeros(0), prices=np.zeros(0), less_equal=tree_ensemble.less_equal)
+            # one value inside every piece, a value equal to a threshold goes right in XGBoost and left in CatBoost
+            if len(thresholds) == 0:
+                representatives = np.array([np.float32(1)])
+            elif tree_ensemble.less_equal:
+                representatives = np.append(thresholds, np.nextafter(thresholds[-1], np.float32(np.inf)))
+            else:
+                representatives = np.insert(thresholds, 0, np.nextafter(thresholds[0], np.float32(-np.inf)))
+            if feature_encoder.zero_as_missing:
+                # an exact 0 would be read as missing, any other value of the same piece will do
+                representatives[representatives == 0] = np.float32(np.finfo(np.float32).tiny)
+            n_pieces = len(representatives)
+
+            bhk_values = np.arange(bhk_range[0], bhk_range[1] + 1)
+            bath_values = np.arange(bath_range[0], bath_range[1] + 1)
+            cell_bhk, cell_bath = [values.ravel() for values in np.meshgrid(bhk_values, bath_values, indexing="ij")]
+            rows_per_location = len(cell_bhk) * n_pieces
+            template = np.zeros((rows_per_location, feature_encoder.n_features), dtype=np.float32)
+            for column, values in (("no_of_BHK", cell_bhk), ("bath", cell_bath)):
+                position = scale_block["offset"] + scale_block["columns"].index(column)
+                template[:, position] = np.repeat(table._scale(column, values), n_pieces)
+            template[:, sqft_column] = np.tile(representatives, len(cell_bhk))
+
+            offsets = [0]
+            breakpoints = []
+            prices = []
+            location_offset = table._location_block["offset"]
+            for location_index in range(len(table._location_block["categories"])):
+                features = template.copy()
+                features[:, location_offset + location_index] = 1
+                if feature_encoder.zero_as_missing:
+                    features[features == 0] = np.nan
+                cell_prices = np.asarray(predict_fn(features), dtype=np.float64).reshape(len(cell_bhk), n_pieces)
+                for piece_prices in cell_prices:
+                    # a breakpoint is kept only where the price changes
+                    changes = np.flatnonzero(piece_prices[1:] != piece_prices[:-1])
+                    breakpoints.append(changes)
+                    prices.append(piece_prices[np.concatenate([[0], changes + 1])])
+                    offsets.append(offsets[-1] + len(changes))
+            return cls(feature_encoder, bhk_range, bath_range, sqft_range, thresholds=thresholds,
+                       offsets=np.asarray(offsets, dtype=np.int64), breakpoints=np.concatenate(breakpoints),
+                       prices=np.concatenate(prices), less_equal=tree_ensemble.less_equal)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def lookup(self, record: dict) -> Optional[float]:
+        """
+        Price of a raw record from the table, None when the record is outside the grid
+        """
+        record = prepare_model_record(record, self.feature_encoder.location_mapping, self.feature_encoder.other_location)
+        bhk, bath, sqft = record["no_of_BHK"], record["bath"], record["total_sqft"]
+        if not (self.bhk_range[0] <= bhk <= self.bhk_range[1] and bhk == int(bhk)
+                and self.bath_range[0] <= bath <= self.bath_range[1] and bath == int(bath)
+                and self.sqft_range[0] <= sqft <= self.sqft_range[1]):
+            return None
+        location_index = self._location_block["index"].get(str(record["location"]))
+        if location_index is None:
+            return None
+        scaled_sqft = np.float32(self._scale("total_sqft", sqft))
+        if scaled_sqft == 0 and self.feature_encoder.zero_as_missing:
+            return None
+        cell = (location_index * self.n_bhk + int(bhk) - self.bhk_range[0]) * self.n_bath + int(bath) - self.bath_range[0]
+        # interval between the thresholds, then the merged piece of the cell holding it
+        interval = np.searchsorted(self.thresholds, scaled_sqft, side="left" if self.less_equal else "right")
+        start, end = self.offsets[cell], self.offsets[cell + 1]
+        piece = np.searchsorted(self.breakpoints[start:end], interval)
+        return float(self.prices[start + cell + piece])
+
+    @property
+    def nbytes(self) -> int:
+        return self.thresholds.nbytes + self.offsets.nbytes + self.breakpoints.nbytes + self.prices.nbytes
+
+    def get_arrays(self, prefix: str = "") -> dict:
+        """
+        Arrays and metadata of the table, as stored in npz files
+        """
+        arrays = {f"{prefix}{name}": value for name, value in self.feature_encoder.get_arrays().items()}
+        arrays[f"{prefix}thresholds"] = self.thresholds
+        arrays[f"{prefix}offsets"] = self.offsets
+        arrays[f"{prefix}breakpoints"] = self.breakpoints
+        arrays[f"{prefix}prices"] = self.prices
+        arrays[f"{prefix}table_meta"] = np.array(json.dumps({"bhk_range": self.bhk_range, "bath_range": self.bath_range,
+                                                             "sqft_range": self.sqft_range, "less_equal": self.less_equal}))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str = "") -> "PriceLookupTable":
+        return cls(feature_encoder=FeatureEncoder.from_arrays(arrays, prefix=prefix),
+                   thresholds=arrays[f"{prefix}thresholds"], offsets=arrays[f"{prefix}offsets"], breakpoints=arrays[f"{prefix}breakpoints"],
+                   prices=arrays[f"{prefix}prices"], **json.loads(str(arrays[f"{prefix}table_meta"])))
@@ -1,9 +1,15 @@
 from HPP.cloud_storage.aws_storage import SimpleStorageService
+from HPP.entity.serving_model import ServingModel
 from HPP.exception import CustomException
-from HPP.entity.estimator import HPPModel
+from io import BytesIO
 import sys
+from typing import Optional, TYPE_CHECKING
 from pandas import DataFrame
 
+if TYPE_CHECKING:
+    # imported for annotations only, HPPModel pulls in sklearn which the npz serving model does not need
+    from HPP.entity.estimator import HPPModel
+
 class HPPEstimator:
     """
     This class is used to save and retrieve us_visas model in s3 bucket and to do prediction
@@ -16,7 +22,7 @@ class HPPEstimator:
         self.bucket_name = bucket_name
         self.s3 = SimpleStorageService()
         self.model_path = model_path
-        self.loaded_model:HPPModel=None
+        self.loaded_model:"HPPModel"=None
     
     def is_model_present(self,model_path):
         try:
@@ -24,13 +30,29 @@ class HPPEstimator:
         except Exception as e:
             CustomException(e,sys)
         
-    def load_model(self,)->HPPModel:
+    def load_model(self,version:Optional[str]=None)->"HPPModel":
         """
-        Load the model from the model_path
+        Load the model from the model_path, an npz path is loaded as ServingModel without unpickling
+        :param version: ETag of the model when already known, a cached copy of it is used without any request
         :return:
         """
-        return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
-    
+        if self.model_path.endswith(".npz"):
+            if self.s3.model_cache.enabled:
+                return ServingModel.load(self.s3.download_model_file(self.model_path, self.bucket_name, etag=version))
+            file_object = self.s3.get_file_object(self.model_path, self.bucket_name)
+            return ServingModel.load(BytesIO(self.s3.read_object(file_object, decode=False)))
+        return self.s3.load_model(self.model_path,bucket_name=self.bucket_name,etag=version)
+
+    def get_model_version(self)->Optional[str]:
+        """
+        Get the version (ETag) of the model currently stored at model_path
+        :return: ETag string or None when no model is published
+        """
+        try:
+            return self.s3.get_object_etag(self.model_path,bucket_name=self.bucket_name)
+        except Exception as e:
+            raise CustomException(e, sys)
+
     def save_model(self,from_file,remove:bool=False):
         """
         Save the model to the model_path
@@ -47,6 +69,15 @@ class HPPEstimator:
         except Exception as e:
             raise CustomException(e, sys)
         
+    def remove_model(self):
+        """
+        Remove the model at model_path from the bucket
+        """
+        try:
+            self.s3.delete_object(self.model_path, bucket_name=self.bucket_name)
+        except Exception as e:
+            raise CustomException(e, sys)
+
     def predict(self,dataframe:DataFrame):
         """
         :param dataframe:
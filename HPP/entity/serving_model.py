@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+
+from typing import Callable, Optional
+import numpy as np
+from pandas import DataFrame
+
+from HPP.entity.feature_encoder import FeatureEncoder
+from HPP.entity.price_lookup_table import PriceLookupTable
+from HPP.entity.tree_ensemble import NUMBA_AVAILABLE, TreeEnsemble
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+
+class ServingModel:
+    """
+    Numpy only counterpart of HPPModel for serving. The fitted cleaner and preprocessor are
+    stored as a FeatureEncoder (location buckets, one hot categories, scaler mean and scale)
+    and the trained trees as a TreeEnsemble, all in one npz file which is read without
+    pickle, so loading it imports neither sklearn nor the boosting libraries.
+    With a batch model loader, batches above the max_batch_rows of the tree ensemble go to the
+    pickled HPPModel instead, loaded on the first such batch, as the boosting library is faster there.
+    """
+    def __init__(self, feature_encoder: FeatureEncoder, tree_ensemble: TreeEnsemble,
+                 lookup_table: PriceLookupTable = None, batch_model_loader: Callable = None):
+        """
+        :param feature_encoder: fitted cleaner and preprocessor
+        :param tree_ensemble: compiled trained model
+        :param lookup_table: precomputed prices of the form input grid, used for single records inside the grid
+        :param batch_model_loader: function returning the pickled HPPModel, for batches above max_batch_rows
+        """
+        self.feature_encoder = feature_encoder
+        self.tree_ensemble = tree_ensemble
+        self.lookup_table = lookup_table
+        self.batch_model_loader = batch_model_loader
+        self._batch_model = None
+        self._batch_model_lock = threading.Lock()
+
+    @classmethod
+    def from_hpp_model(cls, hpp_model, tree_ensemble: TreeEnsemble) -> "ServingModel":
+        """
+        Exports the fitted cleaner and preprocessor of an HPPModel next to its compiled trees
+        and its lookup table
+        """
+        try:
+            feature_encoder = FeatureEncoder.from_hpp_model(hpp_model)
+            feature_encoder.zero_as_missing = tree_ensemble.sparse_missing_as_nan
+            if feature_encoder.n_features != tree_ensemble.n_features:
+                raise Exception(f"Preprocessor gives {feature_encoder.n_features} features, "
+                                f"the model expects {tree_ensemble.n_features}")
+            return cls(feature_encoder=feature_encoder, tree_ensemble=tree_ensemble,
+                       lookup_table=getattr(hpp_model, "lookup_table", None))
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Function accepts raw inputs, encodes them and predicts with the tree ensemble
+        """
+        try:
+            return self.predict_transformed(self.transform(dataframe))
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def transform(self, dataframe: DataFrame):
+        batch_model = self.get_batch_model(len(dataframe))
+        if batch_model is not None:
+            return batch_model.transform(dataframe)
+        return self.feature_encoder.transform(dataframe)
+
+    def predict_transformed(self, transformed_feature) -> np.ndarray:
+        batch_model = self.get_batch_model(transformed_feature.shape[0])
+        if batch_model is not None:
+            return batch_model.predict_transformed(transformed_feature)
+        return self.tree_ensemble.predict(transformed_feature)
+
+    def get_batch_model(self, n_rows: int):
+        """
+        Returns the pickled HPPModel for batches of more than max_batch_rows rows, None when the
+        tree ensemble predicts the batch or there is no batch model. A model which fails to load
+        is not tried again, the tree ensemble then predicts every batch.
+        """
+        if self.batch_model_loader is None or n_rows <= self.tree_ensemble.max_batch_rows:
+            return None
+        if self._batch_model is None:
+            with self._batch_model_lock:
+                if self._batch_model is None and self.batch_model_loader is not None:
+                    try:
+                        logging.info(f"Loading the batch model for batches above {self.tree_ensemble.max_batch_rows} rows")
+                        self._batch_model = self.batch_model_loader()
+                    except Exception as e:
+                        logging.error(f"Batch model could not be loaded, the serving model predicts every batch: {e}")
+                        self.batch_model_loader = None
+        return self._batch_model
+
+    def predict_record(self, record: dict) -> float:
+        """
+        Predicts a single raw record without building a DataFrame, from the lookup table when
+        the record is inside its grid
+        """
+        try:
+            price = self.lookup_record(record)
+            if price is not None:
+                return price
+            return float(self.predict_transformed(self.transform_record(record))[0])
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def lookup_record(self, record: dict) -> Optional[float]:
+        return self.lookup_table.lookup(record) if self.lookup_table is not None else None
+
+    def transform_record(self, record: dict):
+        return self.feature_encoder.encode_record(record)
+
+    def warmup(self) -> None:
+        """
+        Compiles the native evaluator when numba is installed, without it every batch goes through
+        the numpy evaluator which is much slower than the boosting library on large batches
+        """
+        if not NUMBA_AVAILABLE:
+            logging.warning("numba is not installed, the serving model evaluates the trees with numpy")
+        self.tree_ensemble.warmup()
+
+    def make_probe_dataframe(self, n_rows: int = 1000, random_state: int = 42) -> DataFrame:
+        return self.feature_encoder.make_probe_dataframe(n_rows=n_rows, random_state=random_state)
+
+    def save(self, file_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            lookup_arrays = self.lookup_table.get_arrays(prefix="lookup_") if self.lookup_table is not None else {}
+            np.savez_compressed(file_path, **self.feature_encoder.get_arrays(),
+                                **self.tree_ensemble.get_arrays(prefix="tree_"), **lookup_arrays)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def load(cls, file) -> "ServingModel":
+        """
+        :param file: path or file object of an npz written by save
+        """
+        try:
+            with np.load(file, allow_pickle=False) as data:
+                feature_encoder = FeatureEncoder.from_arrays(data)
+                tree_ensemble = TreeEnsemble.from_arrays(data, prefix="tree_")
+                lookup_table = PriceLookupTable.from_arrays(data, prefix="lookup_") if "lookup_offsets" in data else None
+            logging.info(f"Loaded serving model with {tree_ensemble.n_trees} trees, "
+                         f"{len(feature_encoder.location_mapping)} locations and "
+                         f"{'a' if lookup_table is not None else 'no'} lookup table")
+            return cls(feature_encoder=feature_encoder, tree_ensemble=tree_ensemble, lookup_table=lookup_table)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def __repr__(self):
+        return f"ServingModel({self.tree_ensemble.source})"
+
+    def __str__(self):
+        return f"ServingModel({self.tree_ensemble.source})"
@@ -0,0 +1,388 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+# numba is optional and only imported when the native evaluator is first used, it takes a
+# noticeable part of a second to import
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+# objectives whose prediction is the raw sum of the trees
+XGBOOST_IDENTITY_OBJECTIVES = ("reg:squarederror", "reg:squaredlogerror", "reg:pseudohubererror",
+                               "reg:absoluteerror", "reg:quantileerror")
+
+
+def _predict_numpy(dense: np.ndarray, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                   right: np.ndarray, default_left: np.ndarray, value: np.ndarray, roots: np.ndarray,
+                   max_depth: int, less_equal: bool) -> np.ndarray:
+    """
+    Walks all trees for all rows at once, one tree level per iteration
+    """
+    rows = np.arange(dense.shape[0])[:, None]
+    nodes = np.broadcast_to(roots, (dense.shape[0], roots.shape[0])).copy()
+    for _ in range(max_depth):
+        node_feature = feature[nodes]
+        is_leaf = node_feature < 0
+        if is_leaf.all():
+            break
+        x = dense[rows, np.where(is_leaf, 0, node_feature)]
+        node_threshold = threshold[nodes]
+        go_left = (x <= node_threshold) if less_equal else (x < node_threshold)
+        go_left = np.where(np.isnan(x), default_left[nodes], go_left)
+        nodes = np.where(is_leaf, nodes, np.where(go_left, left[nodes], right[nodes]))
+    return value[nodes].sum(axis=1)
+
+
+def _predict_loop(dense, feature, threshold, left, right, default_left, value, roots, max_depth, less_equal):
+    n_rows = dense.shape[0]
+    out = np.zeros(n_rows, dtype=np.float64)
+    # trees in the outer loop keep the nodes of one tree in cache for the whole batch
+    for tree in range(roots.shape[0]):
+        for row in range(n_rows):
+            node = roots[tree]
+            while feature[node] >= 0:
+                x = dense[row, feature[node]]
+                if np.isnan(x):
+                    go_left = default_left[node]
+                elif less_equal:
+                    go_left = x <= threshold[node]
+                else:
+                    go_left = x < threshold[node]
+                node = left[node] if go_left else right[node]
+            out[row] += value[node]
+    return out
+
+
+_predict_native = None
+
+
+def get_native_evaluator():
+    """
+    numba compiled _predict_loop, compiled (or loaded from the numba cache) on first use,
+    None when numba is not installed
+    """
+    global _predict_native
+    if _predict_native is None and NUMBA_AVAILABLE:
+        import numba
+        _predict_native = numba.njit(nogil=True, cache=True)(_predict_loop)
+    return _predict_native
+
+class TreeEnsemble:
+    """
+    This class holds a trained XGBoost or CatBoost regressor as flat arrays (node feature,
+    threshold, children, default direction for missing values and leaf value, one root per
+    tree) and evaluates it without the library: vectorized with NumPy or, when numba is
+    installed, with a natively compiled loop. Inputs are the sparse matrices of the
+    preprocessor, entries not stored in them are missing (NaN) for XGBoost and 0 for CatBoost,
+    the same way both libraries read scipy sparse input.
+    """
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "roots")
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 default_left: np.ndarray, value: np.ndarray, roots: np.ndarray, n_features: int,
+                 base_score: float = 0.0, scale: float = 1.0, less_equal: bool = False,
+                 sparse_missing_as_nan: bool = True, source: str = "", max_batch_rows: int = 0):
+        """
+        :param feature: split feature of every node, -1 for leaves
+        :param threshold: split threshold of every node
+        :param left: left child of every node
+        :param right: right child of every node
+        :param default_left: direction of missing values at every node
+        :param value: leaf value of every node
+        :param roots: root node of every tree
+        :param n_features: number of input columns
+        :param base_score: added to the scaled sum of the trees
+        :param scale: multiplies the sum of the trees
+        :param less_equal: go left when x <= threshold (CatBoost) instead of x < threshold (XGBoost)
+        :param sparse_missing_as_nan: entries missing from sparse input are NaN instead of 0
+        :param source: class of the library model which was compiled
+        :param max_batch_rows: largest batch the model should predict instead of the library
+        """
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=np.bool_)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.n_features = int(n_features)
+        self.base_score = float(base_score)
+        self.scale = float(scale)
+        self.less_equal = bool(less_equal)
+        self.sparse_missing_as_nan = bool(sparse_missing_as_nan)
+        self.source = source
+        self.max_batch_rows = int(max_batch_rows)
+        self.max_depth = self._max_depth()
+        self.use_native = NUMBA_AVAILABLE
+
+    def _max_depth(self) -> int:
+        max_depth = 0
+        level = self.roots
+        while True:
+            level = level[self.feature[level] >= 0]
+            if len(level) == 0:
+                return max_depth
+            max_depth += 1
+            level = np.concatenate([self.left[level], self.right[level]])
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def to_dense(self, features) -> np.ndarray:
+        """
+        float32 dense copy of the features with the missing value convention of the library
+        """
+        if hasattr(features, "tocsr"):
+            # scipy sparse input, checked by duck typing so that serving does not need to import scipy
+            features = features.tocsr()
+            fill = np.nan if self.sparse_missing_as_nan else 0.0
+            dense = np.full(features.shape, fill, dtype=np.float32)
+            rows = np.repeat(np.arange(features.shape[0]), np.diff(features.indptr))
+            dense[rows, features.indices] = features.data
+            return dense
+        return np.ascontiguousarray(features, dtype=np.float32)
+
+    def predict(self, features, native: Optional[bool] = None) -> np.ndarray:
+        """
+        Predicts a sparse or dense feature matrix
+        :param native: use the numba evaluator, defaults to it when numba is installed
+        """
+        try:
+            dense = self.to_dense(features)
+            if dense.shape[1] != self.n_features:
+                raise Exception(f"Expected {self.n_features} features, got {dense.shape[1]}")
+            native = self.use_native if native is None else native
+            evaluator = (get_native_evaluator() if native else None) or _predict_numpy
+            raw = evaluator(dense, self.feature, self.threshold, self.left, self.right, self.default_left,
+                            self.value, self.roots, self.max_depth, self.less_equal)
+            return raw * self.scale + self.base_score
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def warmup(self) -> None:
+        """
+        Compiles the native evaluator so that the first request does not pay for it
+        """
+        self.predict(np.zeros((1, self.n_features), dtype=np.float32))
+
+    def get_arrays(self, prefix: str = "") -> dict:
+        """
+        Arrays and metadata of the ensemble, as stored in npz files
+        """
+        meta = {"n_features": self.n_features, "base_score": self.base_score, "scale": self.scale,
+                "less_equal": self.less_equal, "sparse_missing_as_nan": self.sparse_missing_as_nan,
+                "source": self.source, "max_batch_rows": self.max_batch_rows}
+        arrays = {prefix + name: getattr(self, name) for name in self.ARRAYS}
+        arrays[prefix + "meta"] = np.array(json.dumps(meta))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str = "") -> "TreeEnsemble":
+        return cls(**{name: arrays[prefix + name] for name in cls.ARRAYS},
+                   **json.loads(str(arrays[prefix + "meta"])))
+
+    def save(self, file_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            np.savez_compressed(file_path, **self.get_arrays())
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def load(cls, file_path: str) -> "TreeEnsemble":
+        try:
+            with np.load(file_path, allow_pickle=False) as data:
+                return cls.from_arrays(data)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # the pickle may come from a machine with or without numba
+        self.use_native = NUMBA_AVAILABLE
+
+    def make_probe_matrix(self, n_rows: int = 2000, density: float = 0.3, random_state: int = 42):
+        """
+        Random sparse inputs exercising the splits: values are exactly on, just below and just
+        above the thresholds used for every feature, with missing entries in between
+        """
+        from scipy import sparse
+
+        random = np.random.RandomState(random_state)
+        split_nodes = self.feature >= 0
+        thresholds = {}
+        for feature, threshold in zip(self.feature[split_nodes], self.threshold[split_nodes]):
+            thresholds.setdefault(int(feature), []).append(threshold)
+        values = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        for feature in range(self.n_features):
+            if feature in thresholds:
+                candidates = np.asarray(thresholds[feature], dtype=np.float32)
+                candidates = np.concatenate([candidates,
+                                             np.nextafter(candidates, np.float32(np.inf)),
+                                             np.nextafter(candidates, np.float32(-np.inf))])
+                values[:, feature] = random.choice(candidates, size=n_rows)
+            else:
+                values[:, feature] = random.randn(n_rows)
+        values[random.rand(n_rows, self.n_features) > density] = 0
+        return sparse.csr_matrix(values)
+
+
+def _from_xgboost(model) -> TreeEnsemble:
+    booster = model.get_booster()
+    dump = json.loads(booster.save_raw("json"))
+    learner = dump["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in XGBOOST_IDENTITY_OBJECTIVES:
+        raise Exception(f"XGBoost objective {objective} is not supported")
+    gradient_booster = learner["gradient_booster"]
+    if gradient_booster["name"] != "gbtree":
+        raise Exception(f"XGBoost booster {gradient_booster['name']} is not supported")
+    trees = gradient_booster["model"]["trees"]
+    best_iteration = getattr(model, "best_iteration", None)
+    if best_iteration is not None:
+        # predict only uses the trees up to the best iteration of early stopping
+        trees = trees[:gradient_booster["model"]["iteration_indptr"][best_iteration + 1]]
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        children_left = np.asarray(tree["left_children"])
+        is_leaf = children_left == -1
+        roots.append(offset)
+        feature.append(np.where(is_leaf, -1, tree["split_indices"]))
+        threshold.append(np.where(is_leaf, 0, tree["split_conditions"]))
+        left.append(np.where(is_leaf, -1, children_left + offset))
+        right.append(np.where(is_leaf, -1, np.asarray(tree["right_children"]) + offset))
+        default_left.append(tree["default_left"])
+        value.append(np.where(is_leaf, tree["split_conditions"], 0))
+        offset += len(children_left)
+    base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+    return TreeEnsemble(feature=np.concatenate(feature), threshold=np.concatenate(threshold),
+                        left=np.concatenate(left), right=np.concatenate(right),
+                        default_left=np.concatenate(default_left), value=np.concatenate(value),
+                        roots=np.asarray(roots), n_features=int(learner["learner_model_param"]["num_feature"]),
+                        base_score=base_score, less_equal=False, sparse_missing_as_nan=True,
+                        source=type(model).__name__)
+
+
+def _from_catboost(model) -> TreeEnsemble:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "model.json")
+        model.save_model(file_path, format="json")
+        with open(file_path) as file_obj:
+            dump = json.load(file_obj)
+    float_features = dump["features_info"].get("float_features", [])
+    if set(dump["features_info"]) - {"float_features"}:
+        raise Exception("Only CatBoost models on float features are supported")
+    nan_left = {item["feature_index"]: item.get("nan_value_treatment", "AsIs") != "Max" for item in float_features}
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in dump["oblivious_trees"]:
+        splits = tree["splits"]
+        depth = len(splits)
+        roots.append(offset)
+        # an oblivious tree is unrolled into a full binary tree, level j splits on splits[j]
+        # and a right turn sets bit j of the leaf index
+        level_nodes = [(offset, 0)]
+        next_node = offset + 1
+        nodes = {}
+        for level in range(depth):
+            children = []
+            for node, path in level_nodes:
+                nodes[node] = (level, path, next_node, next_node + 1)
+                children += [(next_node, path), (next_node + 1, path | (1 << level))]
+                next_node += 2
+            level_nodes = children
+        for node, path in level_nodes:
+            nodes[node] = (None, path, -1, -1)
+        for node in range(offset, next_node):
+            level, path, left_child, right_child = nodes[node]
+            if level is None:
+                feature.append(-1)
+                threshold.append(0.0)
+                default_left.append(True)
+                value.append(tree["leaf_values"][path])
+            else:
+                split = splits[level]
+                if split["split_type"] != "FloatFeature":
+                    raise Exception(f"CatBoost split type {split['split_type']} is not supported")
+                feature.append(split["float_feature_index"])
+                threshold.append(split["border"])
+                default_left.append(nan_left.get(split["float_feature_index"], True))
+                value.append(0.0)
+            left.append(left_child)
+            right.append(right_child)
+        offset = next_node
+    scale, bias = dump.get("scale_and_bias", [1, [0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+    return TreeEnsemble(feature=np.asarray(feature), threshold=np.asarray(threshold), left=np.asarray(left),
+                        right=np.asarray(right), default_left=np.asarray(default_left), value=np.asarray(value),
+                        roots=np.asarray(roots), n_features=len(float_features), base_score=bias, scale=scale,
+                        less_equal=True, sparse_missing_as_nan=False, source=type(model).__name__)
+
+
+def compile_tree_ensemble(model) -> TreeEnsemble:
+    """
+    Exports a trained XGBRegressor or CatBoostRegressor to a TreeEnsemble
+    """
+    try:
+        module = type(model).__module__
+        if module.startswith("xgboost"):
+            return _from_xgboost(model)
+        if module.startswith("catboost"):
+            return _from_catboost(model)
+        raise Exception(f"Cannot compile {type(model).__name__}, only XGBoost and CatBoost regressors are supported")
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def benchmark_tree_ensemble(model, tree_ensemble: TreeEnsemble, features, batch_sizes=(1, 64, 4096),
+                            min_seconds: float = 0.2) -> dict:
+    """
+    Median latency in milliseconds of the library model and the numpy and native evaluators
+    for every batch size, the rows are taken (repeated if needed) from features
+    """
+    from scipy import sparse
+
+    features = sparse.csr_matrix(features)
+    evaluators = {"library": model.predict,
+                  "numpy": lambda batch: tree_ensemble.predict(batch, native=False)}
+    if NUMBA_AVAILABLE:
+        evaluators["native"] = lambda batch: tree_ensemble.predict(batch, native=True)
+    report = {}
+    for batch_size in batch_sizes:
+        batch = features[np.arange(batch_size) % features.shape[0]]
+        report[batch_size] = {}
+        for name, evaluator in evaluators.items():
+            evaluator(batch)
+            timings = []
+            started = time.perf_counter()
+            while time.perf_counter() - started < min_seconds or len(timings) < 3:
+                start = time.perf_counter()
+                evaluator(batch)
+                timings.append(time.perf_counter() - start)
+            report[batch_size][name] = round(float(np.median(timings)) * 1000, 4)
+    logging.info(f"Tree ensemble latency in ms per batch: {report}")
+    return report
+
+
+def get_max_faster_batch_rows(latency_report: dict) -> int:
+    """
+    Largest batch size up to which the compiled evaluators beat the library in a
+    benchmark_tree_ensemble report, 0 when the library is faster from the first batch size
+    """
+    max_batch_rows = 0
+    for batch_size in sorted(latency_report):
+        latency = latency_report[batch_size]
+        if min(value for name, value in latency.items() if name != "library") >= latency["library"]:
+            break
+        max_batch_rows = batch_size
+    return max_batch_rows
@@ -1,15 +1,17 @@
 import os
 from datetime import datetime
 import logging
+from HPP.logger.queue_logging import LogPipeline
 log_file=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 logs_path=os.path.join(os.getcwd(), 'logs',log_file)
 os.makedirs(logs_path,exist_ok=True)
 log_file_path=os.path.join(logs_path,log_file)
 
-logging.basicConfig(
-    filename=log_file_path,
-    format="[%(asctime)s ] %(lineno)d - %(levelname)s - %(message)s",
-    level=logging.DEBUG)
+# the calling thread only queues records, a background listener writes them to the file
+log_pipeline=LogPipeline(log_file_path)
+log_pipeline.start()
+if hasattr(os,"register_at_fork"):
+    os.register_at_fork(after_in_child=log_pipeline.restart_after_fork)
 
 if __name__=="__main__":
-    logging.info("logging started")
\ No newline at end of file
+    logging.info("logging started")
@@ -0,0 +1,212 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from HPP.entity.config_entity import LoggingConfig
+
+TEXT_FORMAT = "[%(asctime)s ] %(lineno)d - %(levelname)s - %(message)s"
+# directory holding the HPP package and app.py, module names are taken relative to it
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@lru_cache(maxsize=None)
+def module_name_of(pathname: str) -> str:
+    """
+    Dotted module name of a source file, e.g. HPP.entity.estimator. The HPP modules all log
+    through the root logger, so the logger name does not tell them apart.
+    """
+    relative_path = os.path.relpath(pathname, ROOT_DIR)
+    if relative_path.startswith(".."):
+        return os.path.splitext(os.path.basename(pathname))[0]
+    name = os.path.splitext(relative_path)[0].replace(os.sep, ".")
+    return name[:-len(".__init__")] if name.endswith(".__init__") else name
+
+
+def get_record_module(record: logging.LogRecord) -> str:
+    return module_name_of(record.pathname) if record.name == "root" else record.name
+
+
+def parse_levels(levels: str) -> Dict[str, int]:
+    """
+    Parses "HPP.entity=WARNING,botocore=ERROR" into module prefix -> level
+    """
+    parsed = {}
+    for item in filter(None, (item.strip() for item in levels.split(","))):
+        module, level = item.split("=", 1)
+        parsed[module.strip()] = logging.getLevelName(level.strip().upper())
+    return parsed
+
+
+class CallSiteFilter(logging.Filter):
+    """
+    Applies the level configured for the module of a record, the longest configured prefix of
+    the module name wins, and keeps one in sample_rate records (starting with the first one)
+    of every call site of the sampled modules, warnings and errors are never sampled.
+    The decision for a call site is computed once. It is attached to the queue handler, so it
+    sees the records of the root logger (the HPP modules) and of the named loggers of libraries
+    before they are queued.
+    """
+    def __init__(self, levels: Dict[str, int], sampled_modules: Tuple[str, ...], sample_rate: int):
+        super().__init__()
+        self.levels = levels
+        self.sampled_modules = sampled_modules
+        self.sample_rate = max(sample_rate, 1)
+        self._call_sites: Dict[Tuple[str, int, str], Tuple[int, bool]] = {}
+        self._counts: Dict[Tuple[str, int, str], int] = {}
+
+    @staticmethod
+    def _matches(module: str, prefix: str) -> bool:
+        return module == prefix or module.startswith(prefix + ".")
+
+    def _get_call_site(self, pathname: str, name: str) -> Tuple[int, bool]:
+        module = module_name_of(pathname) if name == "root" else name
+        prefixes = [prefix for prefix in self.levels if self._matches(module, prefix)]
+        level = self.levels[max(prefixes, key=len)] if prefixes else logging.NOTSET
+        sampled = self.sample_rate > 1 and any(self._matches(module, prefix) for prefix in self.sampled_modules)
+        return level, sampled
+
+    def allow(self, pathname: str, lineno: int, name: str, levelno: int) -> bool:
+        key = (pathname, lineno, name)
+        call_site = self._call_sites.get(key)
+        if call_site is None:
+            call_site = self._call_sites[key] = self._get_call_site(pathname, name)
+        level, sampled = call_site
+        if levelno < level:
+            return False
+        if not sampled or levelno >= logging.WARNING:
+            return True
+        # a lost update between threads only shifts which record is kept
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.sample_rate == 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.allow(record.pathname, record.lineno, record.name, record.levelno)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the time, level, module, line, process, thread and message
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": get_record_module(record),
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler which never waits for the listener, records are dropped and counted once
+    max_size records are queued instead of blocking the request which logged them
+    """
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the message is merged with its arguments here, the traceback is kept apart for the formatters.
+        # The record is changed in place, this is the only handler of the root logger
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info) if self.formatter \
+                else logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class LogPipeline:
+    """
+    Logging backend of the HPP logger: the root logger only filters, samples and enqueues
+    records, a background listener thread formats them (text or JSON) and writes the log file.
+    A forked child starts its own listener and opens its own file handler, the parent's thread
+    does not survive the fork and its handler holds the parent's buffer and lock.
+    """
+    def __init__(self, log_file_path: str, logging_config: LoggingConfig = LoggingConfig()):
+        """
+        :param log_file_path: file the listener writes to
+        :param logging_config: Configuration with the levels, output format, sampling and queue size
+        """
+        self.logging_config = logging_config
+        self.log_file_path = log_file_path
+        self.formatter = JsonFormatter() if logging_config.log_format == "json" else logging.Formatter(TEXT_FORMAT)
+        self.file_handler = self._make_file_handler()
+        self.call_site_filter = CallSiteFilter(parse_levels(logging_config.module_levels),
+                                               logging_config.sampled_modules, logging_config.sample_rate)
+        self.queue_handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_size=logging_config.queue_size)
+        self.queue_handler.addFilter(self.call_site_filter)
+        self.listener: Optional[QueueListener] = None
+        self._listening = False
+        self._lock = threading.Lock()
+
+    def _make_file_handler(self) -> logging.FileHandler:
+        file_handler = logging.FileHandler(self.log_file_path)
+        file_handler.setFormatter(self.formatter)
+        return file_handler
+
+    def _start_listener(self) -> None:
+        self.listener = QueueListener(self.queue_handler.queue, self.file_handler, respect_handler_level=True)
+        self.listener.start()
+        self._listening = True
+
+    def start(self) -> None:
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.getLevelName(self.logging_config.level.upper()))
+        # saves a multiprocessing lookup on every record, the process id is still recorded
+        logging.logMultiprocessing = False
+        if self.queue_handler not in root_logger.handlers:
+            root_logger.addHandler(self.queue_handler)
+        with self._lock:
+            if not self._listening:
+                self._start_listener()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Writes the records still queued and stops the listener
+        """
+        with self._lock:
+            if self._listening:
+                self.listener.stop()
+                self._listening = False
+            self.listener = None
+
+    def restart_after_fork(self) -> None:
+        """
+        Replaces the queue, the file handler and the listener copied from the parent, when it was listening
+        """
+        self._lock = threading.Lock()
+        self.queue_handler.queue = queue.SimpleQueue()
+        if not self._listening:
+            return
+        # the parent's handler is left unclosed, closing it would flush the parent's buffer a second time
+        self.file_handler = self._make_file_handler()
+        self._start_listener()
+
+    def metrics(self) -> dict:
+        return {"queued": self.queue_handler.queue.qsize(), "dropped_total": self.queue_handler.dropped}
@@ -0,0 +1,109 @@
+import multiprocessing
+import sys
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from HPP.entity.config_entity import ServingConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+
+def run_training_job() -> None:
+    """
+    Entry point of the training job process. The pipeline is imported here so that the
+    fresh interpreter gets its own artifact timestamp for every job.
+    """
+    from HPP.pipeline.training_pipeline import TrainingPipeline
+
+    TrainingPipeline().run_pipeline()
+
+
+_inference_executor: Optional[ThreadPoolExecutor] = None
+_inference_executor_lock = threading.Lock()
+
+
+def get_inference_executor(serving_config: ServingConfig = ServingConfig()) -> ThreadPoolExecutor:
+    """
+    Returns the bounded thread pool used to run blocking inference off the event loop
+    """
+    global _inference_executor
+    if _inference_executor is None:
+        with _inference_executor_lock:
+            if _inference_executor is None:
+                _inference_executor = ThreadPoolExecutor(max_workers=serving_config.inference_threads,
+                                                         thread_name_prefix="hpp-inference")
+    return _inference_executor
+
+
+class TrainingJobManager:
+    """
+    This class runs the training pipeline in a separate process so that the web server keeps
+    serving while a model is trained. Each job gets a fresh spawned process and an id that
+    can be polled for its status. Only one training job runs at a time.
+    """
+    def __init__(self, job_fn: Callable[[], None] = run_training_job,
+                 on_success: Optional[Callable[[], None]] = None):
+        """
+        :param job_fn: picklable function running the training pipeline
+        :param on_success: called in the server process when a job succeeded
+        """
+        self.job_fn = job_fn
+        self.on_success = on_success
+        self._jobs: Dict[str, dict] = {}
+        self._running_job_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def submit(self) -> dict:
+        """
+        Starts a training job, or returns the job which is already running
+        """
+        try:
+            with self._lock:
+                if self._running_job_id is not None:
+                    logging.info(f"Training job {self._running_job_id} is already running")
+                    return dict(self._jobs[self._running_job_id])
+                job_id = uuid.uuid4().hex
+                self._jobs[job_id] = {"job_id": job_id,
+                                      "status": JOB_STATUS_RUNNING,
+                                      "submitted_at": datetime.now().isoformat(),
+                                      "finished_at": None,
+                                      "error": None}
+                self._running_job_id = job_id
+                executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+                future = executor.submit(self.job_fn)
+                future.add_done_callback(lambda done, job_id=job_id: self._finish(job_id, done))
+                executor.shutdown(wait=False)
+                logging.info(f"Submitted training job {job_id}")
+                return dict(self._jobs[job_id])
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        error = future.exception()
+        with self._lock:
+            job = self._jobs[job_id]
+            job["finished_at"] = datetime.now().isoformat()
+            if error is None:
+                job["status"] = JOB_STATUS_SUCCEEDED
+            else:
+                job["status"] = JOB_STATUS_FAILED
+                job["error"] = str(error)
+            self._running_job_id = None
+        logging.info(f"Training job {job_id} finished with status {job['status']}")
+        if error is None and self.on_success is not None:
+            try:
+                self.on_success()
+            except Exception as e:
+                logging.error(f"Training job success callback failed: {e}")
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from HPP.entity.config_entity import MicroBatcherConfig
+from HPP.logger import logging
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    This class coalesces concurrent prediction requests into one vectorized model call.
+    Requests are collected until max_wait_ms has passed since the first one arrived or
+    max_batch_size rows are waiting, then predicted together and every caller gets back
+    the rows of its own dataframe.
+    """
+    def __init__(self, predict_fn: Callable[[DataFrame], np.ndarray],
+                 micro_batcher_config: MicroBatcherConfig = MicroBatcherConfig(),
+                 executor: Optional[Executor] = None):
+        """
+        :param predict_fn: blocking function predicting a dataframe, called once per batch
+        :param micro_batcher_config: Configuration with the batching window and max batch size
+        :param executor: executor running predict_fn, defaults to the event loop's default executor
+        """
+        self.predict_fn = predict_fn
+        self.micro_batcher_config = micro_batcher_config
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending_rows = 0
+        self._batches_total = 0
+        self._rows_total = 0
+        self._requests_total = 0
+        self._errors_total = 0
+        self._max_batch_rows = 0
+        self._last_batch_rows = 0
+        self._batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batch_size_counts["+Inf"] = 0
+
+    def start(self) -> None:
+        """
+        Starts the batching worker on the running event loop
+        """
+        if self._worker is not None and not self._worker.done():
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+        logging.info(f"Started micro batcher with {self.micro_batcher_config}")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def predict(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Queues the dataframe for the next batch and waits for its predictions
+        """
+        if self._queue is None:
+            # CustomException reads the traceback of the exception being handled, there is none here
+            raise Exception("Micro batcher is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._pending_rows += len(dataframe)
+        self._requests_total += 1
+        await self._queue.put((dataframe, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[DataFrame, asyncio.Future]]:
+        first = await self._queue.get()
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.micro_batcher_config.max_wait_ms / 1000
+        while rows < self.micro_batcher_config.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            # wait_for can drop an item taken just as the timeout fires (python < 3.12), with
+            # wait the get is only cancelled while it has not taken an item, else its item is kept
+            get = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait((get,), timeout=timeout)
+            if get not in done and get.cancel():
+                break
+            item = get.result()
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            rows = sum(len(dataframe) for dataframe, _ in batch)
+            self._pending_rows -= rows
+            self._record_batch(rows)
+            try:
+                results = await loop.run_in_executor(self.executor, self._predict_batch, [dataframe for dataframe, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    self._errors_total += 1
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _predict_batch(self, dataframes: List[DataFrame]) -> list:
+        """
+        Predicts all dataframes with one model call and splits the result per request.
+        If the combined call fails each request is retried alone so that one bad
+        request does not fail the whole batch.
+        """
+        if len(dataframes) == 1:
+            return [self._predict_single(dataframes[0])]
+        try:
+            predictions = np.asarray(self.predict_fn(pd.concat(dataframes, ignore_index=True)))
+            offsets = np.cumsum([len(dataframe) for dataframe in dataframes])[:-1]
+            return np.split(predictions, offsets)
+        except Exception as e:
+            logging.info(f"Batched prediction failed, predicting requests one by one: {e}")
+            return [self._predict_single(dataframe) for dataframe in dataframes]
+
+    def _predict_single(self, dataframe: DataFrame):
+        try:
+            return np.asarray(self.predict_fn(dataframe))
+        except Exception as e:
+            return e
+
+    def _record_batch(self, rows: int) -> None:
+        self._batches_total += 1
+        self._rows_total += rows
+        self._last_batch_rows = rows
+        self._max_batch_rows = max(self._max_batch_rows, rows)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if rows <= bucket:
+                self._batch_size_counts[bucket] += 1
+                break
+        else:
+            self._batch_size_counts["+Inf"] += 1
+
+    def metrics(self) -> dict:
+        """
+        Returns queue depth and batch size statistics of the batcher
+        """
+        return {
+            "queue_depth_requests": self._queue.qsize() if self._queue is not None else 0,
+            "queue_depth_rows": self._pending_rows,
+            "requests_total": self._requests_total,
+            "batches_total": self._batches_total,
+            "rows_total": self._rows_total,
+            "errors_total": self._errors_total,
+            "mean_batch_rows": self._rows_total / self._batches_total if self._batches_total else 0.0,
+            "max_batch_rows": self._max_batch_rows,
+            "last_batch_rows": self._last_batch_rows,
+            "batch_size_counts": {str(bucket): count for bucket, count in self._batch_size_counts.items()},
+        }
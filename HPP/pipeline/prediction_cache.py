@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from HPP.entity.config_entity import PredictionCacheConfig
+from HPP.logger import logging
+from HPP.utils.main_utils import parse_bhk_value, parse_sqft_value, to_float
+
+
+def _normalize_number(value: float) -> Optional[float]:
+    # NaN never equals itself, it would make the key unmatchable
+    return None if np.isnan(value) else value
+
+
+def make_cache_key(record: dict, model_version: Optional[str]) -> Tuple[Hashable, ...]:
+    """
+    Key of a raw record: the parsed numerical inputs, so that "3", "3.0" and 3 share an entry,
+    the location as given (the model maps it to its bucket) and the model version
+    """
+    if "no_of_BHK" not in record and "size" in record:
+        bhk = parse_bhk_value(record["size"])
+    else:
+        bhk = to_float(record.get("no_of_BHK"))
+    location = record.get("location")
+    return (model_version,
+            location if isinstance(location, str) else None,
+            _normalize_number(bhk),
+            _normalize_number(parse_sqft_value(record.get("total_sqft"))),
+            _normalize_number(to_float(record.get("bath"))))
+
+
+class PredictionCache:
+    """
+    This class is an in-process LRU cache of predictions with a time to live. Keys carry the
+    model version and the whole cache is cleared when the model registry loads a new model.
+    Hits, misses, evictions, expirations and invalidations are counted for the metrics endpoint.
+    """
+    def __init__(self, prediction_cache_config: PredictionCacheConfig = PredictionCacheConfig()):
+        """
+        :param prediction_cache_config: Configuration with the maximum number of entries and the time to live
+        """
+        self.prediction_cache_config = prediction_cache_config
+        self._entries: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_total = 0
+        self._misses_total = 0
+        self._evictions_total = 0
+        self._expirations_total = 0
+        self._invalidations_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.prediction_cache_config.enabled and self.prediction_cache_config.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[float]:
+        """
+        Returns the cached prediction, None on a miss or when the entry expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses_total += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations_total += 1
+                self._misses_total += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits_total += 1
+            return value
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[float]]:
+        return [self.get(key) for key in keys]
+
+    def put(self, key: Hashable, value: float) -> None:
+        ttl = self.prediction_cache_config.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl > 0 else float("inf")
+        with self._lock:
+            self._entries[key] = (float(value), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.prediction_cache_config.max_size:
+                self._entries.popitem(last=False)
+                self._evictions_total += 1
+
+    def put_many(self, keys: List[Hashable], values) -> None:
+        for key, value in zip(keys, values):
+            self.put(key, value)
+
+    def clear(self, model_version: Optional[str] = None) -> None:
+        """
+        Drops every entry, registered with the model registry so that it runs when a new model is loaded
+        """
+        with self._lock:
+            size = len(self._entries)
+            self._entries.clear()
+            self._invalidations_total += 1
+        logging.info(f"Prediction cache cleared {size} entries for model version {model_version}")
+
+    def metrics(self) -> dict:
+        """
+        Returns the size and hit, miss, eviction, expiration and invalidation counters of the cache
+        """
+        lookups = self._hits_total + self._misses_total
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.prediction_cache_config.max_size,
+            "hits_total": self._hits_total,
+            "misses_total": self._misses_total,
+            "hit_ratio": self._hits_total / lookups if lookups else 0.0,
+            "evictions_total": self._evictions_total,
+            "expirations_total": self._expirations_total,
+            "invalidations_total": self._invalidations_total,
+        }
+
+
+_prediction_cache: Optional[PredictionCache] = None
+_prediction_cache_lock = threading.Lock()
+
+
+def get_prediction_cache() -> PredictionCache:
+    """
+    Returns the process wide prediction cache, creating it on first use. The process wide
+    model registry clears it whenever it loads a new model
+    """
+    global _prediction_cache
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache()
+    return _prediction_cache
@@ -3,12 +3,17 @@ import sys
 
 import numpy as np
 import pandas as pd
+from typing import List, Tuple
 
+from HPP.constants import PREDICTION_BATCH_MAX_RECORDS
 from HPP.entity.config_entity import HPPredictorConfig
-from HPP.entity.s3_estimator import HPPEstimator
+from HPP.entity.model_registry import ModelRegistry, get_model_registry
 from HPP.exception import CustomException
 from HPP.logger import logging
-from HPP.utils.main_utils import read_yaml
+from HPP.pipeline.prediction_cache import PredictionCache, get_prediction_cache, make_cache_key
+from HPP.pipeline.serving_metrics import (PHASE_ENCODE, PHASE_LOOKUP, PHASE_MODEL, ServingMetrics,
+                                          get_serving_metrics)
+from HPP.utils.main_utils import parse_total_sqft, read_yaml
 from pandas import DataFrame
 
 class HPPData:
@@ -65,30 +70,140 @@ class HPPData:
         except Exception as e:
             raise CustomException(e, sys) from e
 
+    def get_hpp_record(self) -> dict:
+        """
+        This function returns the input as a single record, for the fast path which skips DataFrames
+        """
+        return {"location": self.location,
+                "no_of_BHK": self.no_of_BHK,
+                "total_sqft": self.total_sqft,
+                "bath": self.bath}
+
+class HPPBatchData:
+    input_columns = ["location", "no_of_BHK", "total_sqft", "bath"]
+    numerical_columns = ["no_of_BHK", "bath"]
+
+    def __init__(self, records: List[dict]):
+        """
+        HPP batch data constructor
+        Input: list of records, each holding all features of the trained model for prediction
+        """
+        try:
+            if not isinstance(records, list):
+                raise ValueError("records must be a list of objects")
+            if len(records) > PREDICTION_BATCH_MAX_RECORDS:
+                raise ValueError(f"At most {PREDICTION_BATCH_MAX_RECORDS} records are accepted per batch, got {len(records)}")
+            self.records = records
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_hpp_input_data_frame(self) -> Tuple[DataFrame, List[dict]]:
+        """
+        This function validates all records in one pass and returns a single columnar DataFrame
+        of the valid records (indexed by their position in the batch) and the list of errors
+        """
+        try:
+            columns = {column: [record.get(column) if isinstance(record, dict) else None
+                                for record in self.records]
+                       for column in self.input_columns}
+            dataframe = DataFrame(columns)
+            invalid_columns = {}
+            for column in self.numerical_columns:
+                dataframe[column] = pd.to_numeric(dataframe[column], errors="coerce")
+                invalid_columns[column] = dataframe[column].isna().to_numpy()
+            # ranges and unit suffixes are valid areas, the raw value is kept for the model's cleaner
+            invalid_columns["total_sqft"] = parse_total_sqft(dataframe["total_sqft"]).isna().to_numpy()
+            location = dataframe["location"]
+            invalid_columns["location"] = ~location.map(lambda x: isinstance(x, str) and len(x.strip()) > 0).to_numpy(dtype=bool)
+            invalid = np.zeros(len(dataframe), dtype=bool)
+            for column_mask in invalid_columns.values():
+                invalid |= column_mask
+
+            errors = []
+            for row in np.flatnonzero(invalid):
+                bad_columns = [column for column, column_mask in invalid_columns.items() if column_mask[row]]
+                errors.append({"index": int(row), "error": f"Invalid or missing values for {bad_columns}"})
+            logging.info(f"Validated batch of {len(dataframe)} records, {len(errors)} invalid")
+            return dataframe[~invalid], errors
+
+        except Exception as e:
+            raise CustomException(e, sys) from e
+
+
 class HppClassifier:
-    def __init__(self,prediction_pipeline_config: HPPredictorConfig = HPPredictorConfig(),) -> None:
+    def __init__(self,prediction_pipeline_config: HPPredictorConfig = HPPredictorConfig(),
+                 model_registry: ModelRegistry = None, prediction_cache: PredictionCache = None,
+                 serving_metrics: ServingMetrics = None) -> None:
         """
         :param prediction_pipeline_config: Configuration for prediction the value
+        :param model_registry: Registry holding the loaded model, defaults to the process wide registry
+        :param prediction_cache: Cache of predictions, defaults to the process wide cache
+        :param serving_metrics: Metrics timing the encoding and model phases, defaults to the process wide metrics
         """
         try:
             # self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.model_registry = model_registry if model_registry is not None else get_model_registry()
+            self.prediction_cache = prediction_cache if prediction_cache is not None else get_prediction_cache()
+            self.serving_metrics = serving_metrics if serving_metrics is not None else get_serving_metrics()
         except Exception as e:
             raise CustomException(e, sys)
     def predict(self,dataframe)->str:
         """
         This is the method of USvisaClassifier
         Returns: Prediction in string format
+        Rows found in the prediction cache are not predicted again
         """
         try:
             logging.info("Entered predict method of HPP class")
-            model = HPPEstimator(
-                bucket_name=self.prediction_pipeline_config.model_bucket_name,
-                model_path=self.prediction_pipeline_config.model_file_path,
-            )
-            result =  model.predict(dataframe)
+            model, model_version = self.model_registry.get_model_and_version()
+            if not self.prediction_cache.enabled:
+                return self._predict_dataframe(model, dataframe)
+            keys = [make_cache_key(record, model_version) for record in dataframe.to_dict("records")]
+            cached = self.prediction_cache.get_many(keys)
+            missing = [row for row, value in enumerate(cached) if value is None]
+            result = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+            if missing:
+                predictions = self._predict_dataframe(model, dataframe.iloc[missing])
+                result[missing] = predictions
+                self.prediction_cache.put_many([keys[row] for row in missing], predictions)
             
             return result
         
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+    def predict_record(self, record: dict) -> float:
+        """
+        Predicts a single record without building a DataFrame, using the prediction cache
+        """
+        try:
+            model, model_version = self.model_registry.get_model_and_version()
+            if not self.prediction_cache.enabled:
+                return self._predict_record(model, record)
+            key = make_cache_key(record, model_version)
+            value = self.prediction_cache.get(key)
+            if value is None:
+                value = self._predict_record(model, record)
+                self.prediction_cache.put(key, value)
+            return value
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _predict_dataframe(self, model, dataframe: DataFrame):
+        # same as model.predict, split so that encoding and model evaluation are timed apart
+        with self.serving_metrics.inference_phase(PHASE_ENCODE):
+            transformed_feature = model.transform(dataframe)
+        with self.serving_metrics.inference_phase(PHASE_MODEL):
+            return model.predict_transformed(transformed_feature)
+
+    def _predict_record(self, model, record: dict) -> float:
+        # same as model.predict_record
+        with self.serving_metrics.inference_phase(PHASE_LOOKUP):
+            price = model.lookup_record(record)
+        if price is not None:
+            return price
+        with self.serving_metrics.inference_phase(PHASE_ENCODE):
+            transformed_feature = model.transform_record(record)
+        with self.serving_metrics.inference_phase(PHASE_MODEL):
+            return float(model.predict_transformed(transformed_feature)[0])
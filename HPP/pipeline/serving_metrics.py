@@ -0,0 +1,285 @@
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from HPP.entity.config_entity import ServingMetricsConfig
+from HPP.logger import logging
+
+# starlette adds the charset to text media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+# phases of a prediction request, measured by the route handlers
+PHASE_PARSE = "parse"
+PHASE_PREPROCESS = "preprocess"
+PHASE_PREDICT = "predict"
+PHASE_RENDER = "render"
+# phases of an inference call, measured inside the prediction pipeline on the inference threads
+PHASE_LOOKUP = "lookup"
+PHASE_ENCODE = "encode"
+PHASE_MODEL = "model"
+UNMATCHED_ROUTE = "unmatched"
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names: Tuple[str, ...], label_values: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(int(value))
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic counter per label values
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram with fixed upper bounds per label values, rendered with cumulative buckets as
+    prometheus expects, an observation is one bisect and one increment under the lock
+    """
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...], label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = label_names
+        # label values -> [count of every bucket..., count above the last bucket, sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_values: tuple = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {label_values: list(entry) for label_values, entry in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, entry in sorted(values.items()):
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                bucket_labels = format_labels(self.label_names, label_values, f'le="{format_value(upper_bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class PhaseTimer:
+    """
+    Context manager observing the duration of its block, exceptions raised in the block are
+    counted in errors (when given) with the exception type and propagated
+    """
+    __slots__ = ("histogram", "label_values", "errors", "started")
+
+    def __init__(self, histogram: Optional[Histogram], label_values: tuple, errors: Optional[Counter] = None):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.errors = errors
+
+    def __enter__(self) -> "PhaseTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if self.histogram is not None:
+            self.histogram.observe(time.perf_counter() - self.started, self.label_values)
+            if exc_type is not None and self.errors is not None:
+                self.errors.inc(self.label_values + (exc_type.__name__,))
+        return False
+
+
+class ServingMetrics:
+    """
+    This class holds the telemetry of the serving app in the prometheus text format: request
+    count, latency and in-flight requests per route, the latency of the phases of the
+    prediction routes (parse, preprocess, predict, render), the split of inference calls
+    into lookup table, feature encoding and model evaluation, and errors per route and phase.
+    The metrics() dicts of the other serving components (prediction cache, micro batcher,
+    model registry, log pipeline) are registered as sources and rendered on every scrape.
+    """
+    def __init__(self, serving_metrics_config: ServingMetricsConfig = ServingMetricsConfig()):
+        """
+        :param serving_metrics_config: Configuration with the metric namespace and latency buckets
+        """
+        self.serving_metrics_config = serving_metrics_config
+        namespace = serving_metrics_config.namespace
+        buckets = serving_metrics_config.latency_buckets
+        self.requests_total = Counter(f"{namespace}_requests_total", "HTTP requests by route, method and status",
+                                      ("route", "method", "status"))
+        self.request_duration = Histogram(f"{namespace}_request_duration_seconds",
+                                          "Latency of HTTP requests until the response is sent", buckets,
+                                          ("route", "method"))
+        self.request_phase_duration = Histogram(f"{namespace}_request_phase_seconds",
+                                                "Latency of the phases of prediction requests", buckets,
+                                                ("route", "phase"))
+        self.inference_phase_duration = Histogram(f"{namespace}_inference_phase_seconds",
+                                                  "Latency of inference calls split into lookup table, feature "
+                                                  "encoding and model evaluation", buckets, ("phase",))
+        self.request_errors_total = Counter(f"{namespace}_request_errors_total",
+                                            "Prediction requests failed by route, phase and exception",
+                                            ("route", "phase", "exception"))
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.serving_metrics_config.enabled
+
+    def add_source(self, name: str, metrics_fn: Callable[[], dict]) -> None:
+        """
+        Registers the metrics() of a component, rendered as <namespace>_<name>_<key> on every scrape
+        """
+        self._sources[name] = metrics_fn
+
+    def request_started(self) -> None:
+        with self._in_flight_lock:
+            self._in_flight += 1
+
+    def request_finished(self, route: str, method: str, status: int, seconds: float) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        if self.enabled:
+            self.requests_total.inc((route, method, str(status)))
+            self.request_duration.observe(seconds, (route, method))
+
+    def request_phase(self, route: str, phase: str) -> PhaseTimer:
+        """
+        Times a phase of a request handler, e.g. with serving_metrics.request_phase("/", PHASE_PARSE):
+        """
+        if not self.enabled:
+            return PhaseTimer(None, ())
+        return PhaseTimer(self.request_phase_duration, (route, phase), self.request_errors_total)
+
+    def inference_phase(self, phase: str) -> PhaseTimer:
+        if not self.enabled:
+            return PhaseTimer(None, ())
+        return PhaseTimer(self.inference_phase_duration, (phase,))
+
+    def _render_source(self, name: str, metrics: dict) -> List[str]:
+        """
+        Numbers become gauges (counters when the key ends with _total), booleans 0 or 1, strings an
+        info metric with the string as label and dicts one gauge labelled with their keys
+        """
+        prefix = f"{self.serving_metrics_config.namespace}_{name}"
+        lines = []
+        for key, value in metrics.items():
+            metric_name = f"{prefix}_{key}"
+            if value is None:
+                continue
+            if isinstance(value, str):
+                lines += [f"# TYPE {metric_name}_info gauge", f'{metric_name}_info{{{key}="{escape_label_value(value)}"}} 1']
+            elif isinstance(value, dict):
+                lines.append(f"# TYPE {metric_name} gauge")
+                lines += [f'{metric_name}{{key="{escape_label_value(item)}"}} {format_value(item_value)}'
+                          for item, item_value in value.items()]
+            else:
+                metric_type = "counter" if key.endswith("_total") else "gauge"
+                lines += [f"# TYPE {metric_name} {metric_type}", f"{metric_name} {format_value(value)}"]
+        return lines
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the prometheus text exposition format
+        """
+        namespace = self.serving_metrics_config.namespace
+        lines = [f"# HELP {namespace}_requests_in_flight HTTP requests being handled",
+                 f"# TYPE {namespace}_requests_in_flight gauge",
+                 f"{namespace}_requests_in_flight {self._in_flight}"]
+        for metric in (self.requests_total, self.request_duration, self.request_phase_duration,
+                       self.inference_phase_duration, self.request_errors_total):
+            lines += metric.render()
+        for name, metrics_fn in self._sources.items():
+            try:
+                lines += self._render_source(name, metrics_fn())
+            except Exception as e:
+                # one failing source must not hide the other metrics
+                logging.error(f"Could not collect {name} metrics: {e}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware counting the requests of every route with their status and latency and the
+    requests in flight. The route is the path template of the matched route (e.g.
+    /train/status/{job_id}), so ids in paths do not create new series.
+    """
+    def __init__(self, app, serving_metrics: Optional[ServingMetrics] = None):
+        self.app = app
+        self.serving_metrics = serving_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        serving_metrics = self.serving_metrics or get_serving_metrics()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        serving_metrics.request_started()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            serving_metrics.request_finished(route, scope["method"], status[0], time.perf_counter() - started)
+
+
+_serving_metrics: Optional[ServingMetrics] = None
+_serving_metrics_lock = threading.Lock()
+
+
+def get_serving_metrics() -> ServingMetrics:
+    """
+    Returns the process wide serving metrics, creating them on first use
+    """
+    global _serving_metrics
+    if _serving_metrics is None:
+        with _serving_metrics_lock:
+            if _serving_metrics is None:
+                _serving_metrics = ServingMetrics()
+    return _serving_metrics
@@ -0,0 +1,238 @@
+import dataclasses
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import typing
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Type
+
+from HPP.entity.config_entity import StageCacheConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+from HPP.utils.main_utils import read_yaml, write_yaml
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_DISABLED = "disabled"
+
+
+def artifact_from_dict(artifact_cls: Type, data: dict):
+    """
+    Rebuilds a (possibly nested) artifact dataclass from the dict stored in the cache index
+    """
+    field_types = typing.get_type_hints(artifact_cls)
+    values = {}
+    for field in dataclasses.fields(artifact_cls):
+        value = data[field.name]
+        field_type = field_types.get(field.name)
+        if dataclasses.is_dataclass(field_type) and isinstance(value, dict):
+            value = artifact_from_dict(field_type, value)
+        values[field.name] = value
+    return artifact_cls(**values)
+
+
+class StageCache:
+    """
+    This class lets the training pipeline skip stages whose inputs did not change.
+    Every stage is keyed by a hash of its input files, its parameters and the source of its
+    component and of the modules holding the rest of its logic. The index maps keys to the artifact of the run which built them, a later run
+    with the same key reuses that artifact (and its files in the older run directory)
+    instead of rebuilding it. Old run directories are evicted once the artifact directory
+    grows past max_size_mb and the hit or miss of every stage is written to a report.
+    """
+    def __init__(self, stage_cache_config: StageCacheConfig = StageCacheConfig()):
+        """
+        :param stage_cache_config: Configuration with the index location, size limit and current run directory
+        """
+        try:
+            self.stage_cache_config = stage_cache_config
+            self._index: Dict[str, dict] = {}
+            if os.path.exists(stage_cache_config.index_file_path):
+                self._index = read_yaml(filepath=stage_cache_config.index_file_path) or {}
+            self._file_hashes: Dict[tuple, str] = {}
+            self.report: Dict[str, dict] = {}
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def hash_file(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as file_obj:
+                for block in iter(lambda: file_obj.read(1 << 20), b""):
+                    digest.update(block)
+            self._file_hashes[memo_key] = digest.hexdigest()
+        return self._file_hashes[memo_key]
+
+    def fingerprint(self, stage: str, files: List[str], params: dict, component: Optional[type] = None,
+                    dependencies: Sequence = ()) -> str:
+        """
+        Hash of a stage: content of its input files, its parameters and the source files of its
+        component and dependencies (modules, classes or functions)
+        """
+        try:
+            payload = {"stage": stage,
+                       "files": [self.hash_file(file_path) for file_path in files],
+                       "params": params}
+            source_files = {inspect.getsourcefile(code) for code in [component, *dependencies] if code is not None}
+            if source_files:
+                payload["code"] = sorted(self.hash_file(source_file) for source_file in source_files)
+            return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def config_params(self, config) -> dict:
+        """
+        Fields of a config dataclass as stage parameters. Paths inside the current run directory
+        are made relative to it, so the same configuration gives the same key in every run
+        """
+        run_dir = os.path.normpath(self.stage_cache_config.current_artifact_dir) + os.sep
+        params = {}
+        for field in dataclasses.fields(config):
+            value = getattr(config, field.name)
+            if isinstance(value, str) and os.path.normpath(value).startswith(run_dir):
+                value = os.path.relpath(value, run_dir)
+            params[field.name] = value
+        return params
+
+    def _artifact_files(self, data) -> List[str]:
+        root = os.path.normpath(self.stage_cache_config.artifact_root_dir) + os.sep
+        if isinstance(data, dict):
+            return [path for value in data.values() for path in self._artifact_files(value)]
+        if isinstance(data, str) and os.path.normpath(data).startswith(root):
+            return [data]
+        return []
+
+    def _run_dir_of(self, file_path: str) -> str:
+        relative = os.path.relpath(file_path, self.stage_cache_config.artifact_root_dir)
+        return os.path.join(self.stage_cache_config.artifact_root_dir, relative.split(os.sep)[0])
+
+    def get(self, stage: str, key: str, artifact_cls: Type):
+        """
+        Returns the cached artifact of the stage, None when the key is unknown or its files were removed
+        """
+        try:
+            entry = self._index.get(key)
+            if entry is None or entry["stage"] != stage:
+                return None
+            if not all(os.path.exists(file_path) for file_path in self._artifact_files(entry["artifact"])):
+                logging.info(f"Cached {stage} artifact {key[:12]} has missing files, dropping it")
+                self._index.pop(key)
+                return None
+            entry["last_used_at"] = datetime.now().isoformat()
+            return artifact_from_dict(artifact_cls, entry["artifact"])
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def put(self, stage: str, key: str, artifact) -> None:
+        try:
+            # round trip through json so numpy scalars (e.g. metrics) are stored as plain yaml values
+            artifact_dict = json.loads(json.dumps(dataclasses.asdict(artifact),
+                                                  default=lambda value: value.item() if hasattr(value, "item") else str(value)))
+            now = datetime.now().isoformat()
+            self._index[key] = {"stage": stage,
+                                "artifact": artifact_dict,
+                                "run_dirs": sorted({self._run_dir_of(path) for path in self._artifact_files(artifact_dict)}),
+                                "created_at": now,
+                                "last_used_at": now}
+            self._save_index()
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def run_stage(self, stage: str, files: List[str], params: dict, artifact_cls: Type,
+                  build_fn: Callable[[], object], component: Optional[type] = None, dependencies: Sequence = ()):
+        """
+        Returns the cached artifact of the stage or builds and caches it with build_fn
+        :param dependencies: modules holding logic of the stage outside its component, a change in their source is a miss
+        """
+        try:
+            if not self.stage_cache_config.enabled:
+                self.report[stage] = {"status": CACHE_DISABLED}
+                return build_fn()
+            key = self.fingerprint(stage, files, params, component, dependencies)
+            artifact = self.get(stage, key, artifact_cls)
+            if artifact is not None:
+                logging.info(f"Stage cache hit for {stage} ({key[:12]}), reusing {artifact}")
+                self.report[stage] = {"status": CACHE_HIT, "key": key, "run_dirs": self._index[key]["run_dirs"]}
+                self._save_index()
+                return artifact
+            logging.info(f"Stage cache miss for {stage} ({key[:12]})")
+            artifact = build_fn()
+            self.put(stage, key, artifact)
+            self.report[stage] = {"status": CACHE_MISS, "key": key, "run_dirs": self._index[key]["run_dirs"]}
+            return artifact
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _save_index(self) -> None:
+        tmp_file_path = self.stage_cache_config.index_file_path + ".tmp"
+        write_yaml(filepath=tmp_file_path, content=self._index, replace=True)
+        os.replace(tmp_file_path, self.stage_cache_config.index_file_path)
+
+    @staticmethod
+    def _dir_size(dir_path: str) -> int:
+        size = 0
+        for root, _, files in os.walk(dir_path):
+            for file_name in files:
+                size += os.path.getsize(os.path.join(root, file_name))
+        return size
+
+    def evict(self) -> List[str]:
+        """
+        Removes the least recently used run directories until the artifact directory fits in max_size_mb.
+        The current run directory, run directories reused by the current run and directories
+        outside the timestamped runs are kept.
+        :return: removed run directories
+        """
+        try:
+            config = self.stage_cache_config
+            if not os.path.isdir(config.artifact_root_dir):
+                return []
+            used_dirs = [path for entry in self.report.values() for path in entry.get("run_dirs", [])]
+            keep = {os.path.normpath(path) for path in [config.current_artifact_dir, *config.keep_dirs, *used_dirs]}
+            all_dirs = [os.path.join(config.artifact_root_dir, name) for name in os.listdir(config.artifact_root_dir)]
+            sizes = {path: self._dir_size(path) for path in all_dirs if os.path.isdir(path)}
+            # the kept directories count towards the limit, they are just never removed
+            total = sum(sizes.values())
+            run_dirs = [path for path in sizes if os.path.normpath(path) not in keep]
+            limit = config.max_size_mb * 1024 * 1024
+
+            def last_used(path: str) -> str:
+                used = [entry["last_used_at"] for entry in self._index.values()
+                        if os.path.normpath(path) in map(os.path.normpath, entry["run_dirs"])]
+                return max(used) if used else datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+            removed = []
+            for path in sorted(run_dirs, key=last_used):
+                if total <= limit:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= sizes[path]
+                removed.append(path)
+            if removed:
+                removed_dirs = set(map(os.path.normpath, removed))
+                self._index = {key: entry for key, entry in self._index.items()
+                               if not removed_dirs & set(map(os.path.normpath, entry["run_dirs"]))}
+                self._save_index()
+                logging.info(f"Stage cache evicted {len(removed)} run directories: {removed}")
+            return removed
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def write_report(self) -> dict:
+        """
+        Writes which stages were cache hits in the current run directory
+        """
+        try:
+            report = {"stages": self.report,
+                      "hits": sum(entry["status"] == CACHE_HIT for entry in self.report.values()),
+                      "misses": sum(entry["status"] == CACHE_MISS for entry in self.report.values())}
+            write_yaml(filepath=self.stage_cache_config.report_file_path, content=report, replace=True)
+            logging.info(f"Stage cache report: {report}")
+            return report
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,263 @@
+import cProfile
+import io
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from HPP.entity.config_entity import StageProfilerConfig
+from HPP.exception import CustomException
+from HPP.logger import logging
+from HPP.utils.main_utils import write_yaml
+
+MB = 1024 * 1024
+PROC_STATUS_FILE = "/proc/self/status"
+PROC_CLEAR_REFS_FILE = "/proc/self/clear_refs"
+# peak rss scope of a step: its own peak when the kernel lets the peak be reset, else the process peak so far
+PEAK_RSS_STEP = "step"
+PEAK_RSS_PROCESS = "process"
+
+
+def files_size(file_paths: Iterable[str]) -> int:
+    """
+    Total size in bytes of the files which exist
+    """
+    return sum(os.path.getsize(file_path) for file_path in file_paths if file_path and os.path.isfile(file_path))
+
+
+def read_rss() -> dict:
+    """
+    Current and peak resident set size in bytes of the process
+    """
+    values = {}
+    try:
+        with open(PROC_STATUS_FILE) as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    name, value = line.split(":", 1)
+                    values[name] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"rss": values.get("VmRSS"), "peak": values.get("VmHWM", peak)}
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak rss of the process (linux 4.0+), returns False when the peak can not be reset
+    """
+    try:
+        with open(PROC_CLEAR_REFS_FILE, "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _Step:
+    def __init__(self, name: str, parent: Optional["_Step"], profile: Optional[cProfile.Profile]):
+        self.name = name
+        self.parent = parent
+        self.profile = profile
+        self.fields = {}
+        self.peak = 0
+        self.wall_start = time.perf_counter()
+        self.cpu_start = self._cpu_seconds()
+        self.rss_start = read_rss()
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        # children are the worker processes of the parallel search, counted once they exited
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+
+class StageProfiler:
+    """
+    This class measures the steps of a training run: wall time, cpu time (including worker
+    processes), peak rss and the rows and bytes every step processed. Steps nest, a step
+    opened inside another one is named after its parent, e.g. data_transformation/cleaning.
+    The steps are written to a yaml report in the run directory, the steps listed in the
+    configuration additionally run under cProfile and their profile is written next to it
+    (a .prof file for pstats, snakeviz or flameprof and the top functions as text).
+    Components open their steps through get_stage_profiler(), outside a run a step only
+    runs its block.
+    """
+    def __init__(self, stage_profiler_config: StageProfilerConfig = StageProfilerConfig()):
+        """
+        :param stage_profiler_config: Configuration with the report location and the steps to profile
+        """
+        self.stage_profiler_config = stage_profiler_config
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiling = False
+        self.steps: List[dict] = []
+        self.started_at: Optional[str] = None
+        self._run_step: Optional[_Step] = None
+        self._peak_resettable = False
+
+    @property
+    def active(self) -> bool:
+        return self._run_step is not None
+
+    def _stack(self) -> List[_Step]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def start_run(self) -> None:
+        """
+        Starts measuring a run, the steps of a previous run are dropped
+        """
+        if not self.stage_profiler_config.enabled:
+            return
+        with self._lock:
+            self.steps = []
+            self.started_at = datetime.now().isoformat()
+            self._peak_resettable = reset_peak_rss()
+            self._run_step = _Step("run", None, None)
+
+    def _should_profile(self, name: str) -> bool:
+        profile_steps = self.stage_profiler_config.profile_steps
+        return name in profile_steps or name.rsplit("/", 1)[-1] in profile_steps
+
+    @contextmanager
+    def step(self, name: str, **fields) -> Iterator[None]:
+        """
+        Measures the block as a step of the run
+        :param name: name of the step, prefixed with the name of the enclosing step
+        :param fields: counts known upfront, e.g. rows=..., more can be added with record
+        """
+        if not self.active:
+            yield
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else self._run_step
+        if parent is not self._run_step:
+            name = f"{parent.name}/{name}"
+        entry = {"name": name, "status": "running"}
+        with self._lock:
+            self.steps.append(entry)
+            profile = None
+            # only one cProfile can be active at a time, a step inside a profiled step is not profiled again
+            if not self._profiling and self._should_profile(name):
+                self._profiling = True
+                profile = cProfile.Profile()
+        # the peak of the parent up to now is kept before the peak is reset for this step
+        parent.peak = max(parent.peak, read_rss()["peak"] or 0)
+        if self._peak_resettable:
+            reset_peak_rss()
+        current = _Step(name, parent, profile)
+        current.fields.update(fields)
+        stack.append(current)
+        status = "completed"
+        try:
+            if profile is not None:
+                profile.enable()
+            yield
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            if profile is not None:
+                profile.disable()
+            stack.pop()
+            self._finish_step(current, entry, status)
+
+    def record(self, **fields) -> None:
+        """
+        Adds counts to the innermost step of the calling thread, numbers are summed, e.g. record(rows=len(dataframe))
+        """
+        if not self.active:
+            return
+        stack = self._stack()
+        current = stack[-1] if stack else self._run_step
+        for key, value in fields.items():
+            if isinstance(value, (int, float)) and isinstance(current.fields.get(key), (int, float)):
+                current.fields[key] += value
+            else:
+                current.fields[key] = value
+
+    def _finish_step(self, current: _Step, entry: dict, status: str) -> None:
+        rss_end = read_rss()
+        peak = max(current.peak, rss_end["peak"] or 0)
+        current.parent.peak = max(current.parent.peak, peak)
+        entry.update({"status": status,
+                      "wall_seconds": round(time.perf_counter() - current.wall_start, 4),
+                      "cpu_seconds": round(current._cpu_seconds() - current.cpu_start, 4),
+                      "peak_rss_mb": round(peak / MB, 1),
+                      "peak_rss_scope": PEAK_RSS_STEP if self._peak_resettable else PEAK_RSS_PROCESS})
+        if current.rss_start["rss"] is not None and rss_end["rss"] is not None:
+            entry["rss_change_mb"] = round((rss_end["rss"] - current.rss_start["rss"]) / MB, 1)
+        entry.update(current.fields)
+        if current.profile is not None:
+            entry["profile"] = self._write_profile(current.name, current.profile)
+            with self._lock:
+                self._profiling = False
+        logging.info(f"Step {entry['name']} {status} in {entry['wall_seconds']}s wall, {entry['cpu_seconds']}s cpu, "
+                     f"peak rss {entry['peak_rss_mb']} MB")
+
+    def _write_profile(self, name: str, profile: cProfile.Profile) -> dict:
+        try:
+            profile_dir = self.stage_profiler_config.profile_dir
+            os.makedirs(profile_dir, exist_ok=True)
+            base_path = os.path.join(profile_dir, name.replace("/", "."))
+            profile.dump_stats(base_path + ".prof")
+            summary = io.StringIO()
+            pstats.Stats(profile, stream=summary).sort_stats(pstats.SortKey.CUMULATIVE) \
+                .print_stats(self.stage_profiler_config.profile_top_functions)
+            with open(base_path + ".txt", "w") as summary_file:
+                summary_file.write(summary.getvalue())
+            return {"stats_file_path": base_path + ".prof", "summary_file_path": base_path + ".txt"}
+        except Exception as e:
+            # a profile which can not be written must not fail the training run
+            logging.error(f"Writing the profile of {name} failed: {e}")
+            return {"error": str(e)}
+
+    def write_report(self, stage_cache_report: Optional[dict] = None) -> Optional[dict]:
+        """
+        Ends the run and writes the report of its steps to the run directory
+        :param stage_cache_report: cache status of the stages, added to the stages of the same name
+        """
+        try:
+            if not self.active:
+                return None
+            run_step, self._run_step = self._run_step, None
+            rss_end = read_rss()
+            steps = [dict(entry) for entry in self.steps]
+            for entry in steps:
+                cache = (stage_cache_report or {}).get(entry["name"])
+                if cache is not None:
+                    entry["stage_cache"] = cache["status"]
+            report = {"started_at": self.started_at,
+                      "wall_seconds": round(time.perf_counter() - run_step.wall_start, 4),
+                      "cpu_seconds": round(run_step._cpu_seconds() - run_step.cpu_start, 4),
+                      "peak_rss_mb": round(max(run_step.peak, rss_end["peak"] or 0) / MB, 1),
+                      "steps": steps}
+            write_yaml(filepath=self.stage_profiler_config.report_file_path, content=report, replace=True)
+            logging.info(f"Stage profile report written to {self.stage_profiler_config.report_file_path}")
+            return report
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+_stage_profiler: Optional[StageProfiler] = None
+_stage_profiler_lock = threading.Lock()
+
+
+def get_stage_profiler() -> StageProfiler:
+    """
+    Returns the process wide stage profiler, creating it on first use
+    """
+    global _stage_profiler
+    if _stage_profiler is None:
+        with _stage_profiler_lock:
+            if _stage_profiler is None:
+                _stage_profiler = StageProfiler()
+    return _stage_profiler
@@ -11,9 +11,25 @@ from HPP.entity.config_entity import (DataIngestionConfig,DataValidationConfig,
 from HPP.entity.artifact_entity import (DataIngestionArtifact, DataValidationArtifact,
                                         DataTransformationArtifact,ModelTrainerArtifact,
                                         ModelEvaluationArtifact,ModelPusherArtifact)
+from HPP.entity.s3_estimator import HPPEstimator
+from HPP.data_access import HP_data_access
+from HPP.entity import estimator, housing_cleaner, model_factory, tree_ensemble
+from HPP.utils import main_utils
+from HPP.pipeline.stage_cache import StageCache
+from HPP.pipeline.stage_profiler import files_size, get_stage_profiler
+from HPP.constants import SCHEMA_FILE_PATH
 from HPP.logger import logging
 from HPP.exception import CustomException
 
+# modules holding the logic of a stage besides its component, a change in their source invalidates the cached stage
+STAGE_DEPENDENCIES={
+    "data_ingestion":(HP_data_access,main_utils),
+    "data_validation":(main_utils,),
+    "data_transformation":(housing_cleaner,main_utils),
+    "model_trainer":(model_factory,tree_ensemble,estimator,housing_cleaner,main_utils),
+    "model_evaluation":(estimator,housing_cleaner,main_utils),
+}
+
 class TrainingPipeline:
     def __init__(self):
         self.data_ingestion_config=DataIngestionConfig()
@@ -22,6 +38,8 @@ class TrainingPipeline:
         self.model_trainer_config=ModelTrainerConfig()
         self.model_evaluation_config=ModelEvaluationConfig()
         self.model_pusher_config=ModelPusherConfig()
+        self.stage_cache=StageCache()
+        self.stage_profiler=get_stage_profiler()
 
     def start_data_ingestion(self)->DataIngestionArtifact:
         """
@@ -32,7 +50,18 @@ class TrainingPipeline:
             logging.info("Entered the start_data_ingestion method of TrainPipeline class")
             logging.info("Getting the data from mongodb")
             data_ingestion=DataIngestion(data_ingestion_config=self.data_ingestion_config)
-            data_ingestion_artifact=data_ingestion.initiate_data_ingestion()
+            with self.stage_profiler.step("export_feature_store"):
+                dataframe=data_ingestion.export_data_into_featurestore()
+                self.stage_profiler.record(rows=len(dataframe),
+                                           bytes=files_size([self.data_ingestion_config.feature_store_path]))
+            data_ingestion_artifact=self.stage_cache.run_stage(
+                "data_ingestion",
+                files=[self.data_ingestion_config.feature_store_path],
+                params={"train_test_split_ratio":self.data_ingestion_config.train_test_split_ratio},
+                artifact_cls=DataIngestionArtifact,
+                build_fn=lambda:data_ingestion.initiate_data_ingestion(dataframe=dataframe),
+                component=DataIngestion,
+                dependencies=STAGE_DEPENDENCIES["data_ingestion"])
             logging.info("Got the train_set and test_set from mongodb")
             logging.info("Exited the start_data_ingestion method of TrainPipeline class")
             return data_ingestion_artifact
@@ -44,8 +73,17 @@ class TrainingPipeline:
     def start_data_validation(self,data_ingestion_artifact:DataIngestionArtifact)->DataValidationArtifact:
         try:
             logging.info("Starting data validation method of TrainingPipeline class")
-            data_validation=DataValidation(self.data_ingestion_config,self.data_validation_config)
-            data_validation_artifact=data_validation.initiate_data_validation()
+            data_validation=DataValidation(data_ingestion_artifact,self.data_validation_config)
+            self.stage_profiler.record(bytes=files_size([data_ingestion_artifact.train_file_path,
+                                                         data_ingestion_artifact.test_file_path]))
+            data_validation_artifact=self.stage_cache.run_stage(
+                "data_validation",
+                files=[data_ingestion_artifact.train_file_path,data_ingestion_artifact.test_file_path,SCHEMA_FILE_PATH],
+                params={},
+                artifact_cls=DataValidationArtifact,
+                build_fn=data_validation.initiate_data_validation,
+                component=DataValidation,
+                dependencies=STAGE_DEPENDENCIES["data_validation"])
             logging.info(f"Performed the data validation operation")
             logging.info(f"Exited start_data_validation method of TrainPipeline class")
             return data_validation_artifact
@@ -61,7 +99,17 @@ class TrainingPipeline:
             data_transformation=DataTransformation(data_ingestion_artifact=data_ingestion_artifact
                                                 ,data_validation_artifact=data_validation_artifact,
                                                 data_transformation_config=data_transformation_config)
-            data_transformation_artifact=data_transformation.initiate_data_transformation()
+            self.stage_profiler.record(bytes=files_size([data_ingestion_artifact.feature_store_path]))
+            data_transformation_artifact=self.stage_cache.run_stage(
+                "data_transformation",
+                files=[data_ingestion_artifact.feature_store_path,SCHEMA_FILE_PATH],
+                params={"validation_status":data_validation_artifact.validation_status,
+                        "train_test_split_ratio":self.data_ingestion_config.train_test_split_ratio,
+                        "config":self.stage_cache.config_params(data_transformation_config)},
+                artifact_cls=DataTransformationArtifact,
+                build_fn=data_transformation.initiate_data_transformation,
+                component=DataTransformation,
+                dependencies=STAGE_DEPENDENCIES["data_transformation"])
             return data_transformation_artifact
         except Exception as e:
             logging.info(e)
@@ -75,7 +123,22 @@ class TrainingPipeline:
             logging.info("Entered the train_pipeline method of TrainPipeline class")
             model_trainer=ModelTrainer(data_transformation_artifact=data_transformation_artifact,
                                        model_trainer_config=self.model_trainer_config)
-            model_trainer_artifact=model_trainer.initiate_model_training()
+            input_files=[data_transformation_artifact.transformed_object_file_path,
+                         data_transformation_artifact.cleaner_object_file_path,
+                         data_transformation_artifact.transformed_train_file_path,
+                         data_transformation_artifact.transformed_test_file_path,
+                         data_transformation_artifact.transformed_train_target_file_path,
+                         data_transformation_artifact.transformed_test_target_file_path,
+                         self.model_trainer_config.model_config_file_path]
+            self.stage_profiler.record(bytes=files_size(input_files))
+            model_trainer_artifact=self.stage_cache.run_stage(
+                "model_trainer",
+                files=input_files,
+                params={"config":self.stage_cache.config_params(self.model_trainer_config)},
+                artifact_cls=ModelTrainerArtifact,
+                build_fn=model_trainer.initiate_model_training,
+                component=ModelTrainer,
+                dependencies=STAGE_DEPENDENCIES["model_trainer"])
             logging.info("Exited the train_pipeline method of TrainPipeline class")
             return model_trainer_artifact
         except Exception as e:
@@ -94,7 +157,23 @@ class TrainingPipeline:
                                                data_ingestion_artifact=data_ingestion_artifact,
                                                model_trainer_artifact=model_trainer_artifact,
                                                data_transformation_artifact=data_transformation_artifact)
-            model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
+            self.stage_profiler.record(bytes=files_size([data_ingestion_artifact.test_file_path,
+                                                         model_trainer_artifact.trained_model_file_path]))
+            production_model_version = HPPEstimator(bucket_name=self.model_evaluation_config.bucket_name,
+                                                    model_path=self.model_evaluation_config.s3_model_key_path).get_model_version()
+            model_evaluation_artifact = self.stage_cache.run_stage(
+                "model_evaluation",
+                files=[data_ingestion_artifact.test_file_path,
+                       data_transformation_artifact.cleaner_object_file_path,
+                       model_trainer_artifact.trained_model_file_path],
+                params={"changed_threshold_score": self.model_evaluation_config.changed_threshold_score,
+                        "bucket_name": self.model_evaluation_config.bucket_name,
+                        "s3_model_key_path": self.model_evaluation_config.s3_model_key_path,
+                        "production_model_version": production_model_version},
+                artifact_cls=ModelEvaluationArtifact,
+                build_fn=model_evaluation.initiate_model_evaluation,
+                component=ModelEvaluation,
+                dependencies=STAGE_DEPENDENCIES["model_evaluation"])
             return model_evaluation_artifact
         except Exception as e:
             raise CustomException(e, sys)
@@ -117,18 +196,45 @@ class TrainingPipeline:
         """
         try:
             logging.info("Entered the run_pipeline method of TrainPipeline class")
-            data_ingestion_artifact=self.start_data_ingestion()
-            data_validation_artifact=self.start_data_validation(data_ingestion_artifact)
-            data_transformation_artifact=self.start_data_transformation(data_ingestion_artifact,data_validation_artifact)
-            model_trainer_artifact=self.model_trainer(data_transformation_artifact)
-            model_evaluation_artifact=self.start_model_evaluation(data_ingestion_artifact,model_trainer_artifact,data_transformation_artifact)
+            self.stage_profiler.start_run()
+            with self.stage_profiler.step("data_ingestion"):
+                data_ingestion_artifact=self.start_data_ingestion()
+            with self.stage_profiler.step("data_validation"):
+                data_validation_artifact=self.start_data_validation(data_ingestion_artifact)
+            with self.stage_profiler.step("data_transformation"):
+                data_transformation_artifact=self.start_data_transformation(data_ingestion_artifact,data_validation_artifact)
+            with self.stage_profiler.step("model_trainer"):
+                model_trainer_artifact=self.model_trainer(data_transformation_artifact)
+            with self.stage_profiler.step("model_evaluation"):
+                model_evaluation_artifact=self.start_model_evaluation(data_ingestion_artifact,model_trainer_artifact,data_transformation_artifact)
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model is not accepted")
                 raise CustomException(e,sys)
-            model_pusher_artifact=self.start_model_pusher(model_evaluation_artifact)
+            with self.stage_profiler.step("model_pusher"):
+                model_pusher_artifact=self.start_model_pusher(model_evaluation_artifact)
             logging.info("Exited the run_pipeline method of TrainPipeline class")
         except Exception as e:
             logging.info(e)
             raise CustomException(e,sys)
-    
-6
\ No newline at end of file
+        finally:
+            self.finish_stage_cache()
+            self.finish_stage_profiler()
+
+    def finish_stage_cache(self)->None:
+        """
+        This method of TrainPipeline class writes the stage cache report and evicts old run directories
+        """
+        try:
+            self.stage_cache.write_report()
+            self.stage_cache.evict()
+        except Exception as e:
+            logging.error(f"Stage cache cleanup failed: {e}")
+
+    def finish_stage_profiler(self)->None:
+        """
+        This method of TrainPipeline class writes the timing and memory report of the run's stages
+        """
+        try:
+            self.stage_profiler.write_report(stage_cache_report=self.stage_cache.report)
+        except Exception as e:
+            logging.error(f"Writing the stage profile report failed: {e}")
@@ -1,9 +1,14 @@
 import os 
+import re
 import sys
+from collections.abc import Hashable
 
 import numpy as np 
 import dill 
 import yaml
+from scipy import sparse
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import pandas as pd
 from HPP.exception import CustomException
@@ -71,6 +76,78 @@ def load_numpy_array_data(file_path: str) -> np.array:
     except Exception as e:
         raise CustomException(e, sys) from e
 
+def save_sparse_matrix_data(file_path: str, matrix: sparse.spmatrix):
+    """
+    Save sparse matrix data to file in compressed npz format
+    file_path: str location of file to save
+    matrix: scipy sparse matrix to save, stored as CSR
+    """
+    try:
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        sparse.save_npz(file_path, sparse.csr_matrix(matrix), compressed=True)
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+
+def load_sparse_matrix_data(file_path: str) -> sparse.csr_matrix:
+    """
+    load sparse matrix data from file
+    file_path: str location of file to load
+    return: CSR matrix loaded
+    """
+    try:
+        return sparse.load_npz(file_path).tocsr()
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def save_dataframe(file_path: str, dataframe: pd.DataFrame, compression: str = "zstd"):
+    """
+    Save dataframe to a typed, compressed parquet file
+    file_path: str location of file to save
+    dataframe: pd.DataFrame data to save, the index is not stored
+    compression: parquet compression codec
+    object columns mixing strings and numbers are stored as strings, as a csv round trip would
+    """
+    try:
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        dataframe = dataframe.copy(deep=False)
+        for column in dataframe.columns[dataframe.dtypes == object]:
+            if pd.api.types.infer_dtype(dataframe[column], skipna=True) not in ("string", "empty"):
+                values = dataframe[column]
+                dataframe[column] = values.where(values.isna(), values.astype(str))
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        pq.write_table(table, file_path, compression=compression)
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+
+def load_dataframe(file_path: str, columns: list = None) -> pd.DataFrame:
+    """
+    load dataframe from a parquet file, csv files written by older runs are still read
+    file_path: str location of file to load
+    columns: only these columns are read, all columns when None
+    return: pd.DataFrame data loaded
+    """
+    try:
+        if file_path.endswith(".csv"):
+            return pd.read_csv(file_path, usecols=columns)
+        table = pq.read_table(file_path, columns=columns, memory_map=True)
+        return table.to_pandas()
+    except Exception as e:
+        raise CustomException(e, sys) from e
+
+def get_required_columns(schema_config: dict) -> list:
+    """
+    columns of the schema which are used after cleaning, i.e. all columns except drop_columns
+    schema_config: dict loaded from schema.yaml
+    return: list of column names in schema order
+    """
+    drop_cols = set(schema_config["drop_columns"])
+    columns = [column for entry in schema_config["columns"] for column in entry]
+    return [column for column in columns if column not in drop_cols]
+
 def save_object(filepath:str,obj:object)->None:
     logging.info("Entered the save obeject method in utils file")
 
@@ -102,37 +179,153 @@ def drop_columns(df: pd.DataFrame, cols: list)-> pd.DataFrame:
         raise CustomException(e, sys) from e
     
 
-def convert_sqft_to_num(x)->float:
-    token=x.split('-')
-    if len(token)==2:
-        return (float(token[0])+float(token[1]))/2
+SQFT_UNIT_CONVERSION={
+    "sqmeter":10.7639,
+    "sqyards":9.0,
+    "acres":43560.0,
+    "cents":435.6,
+    "guntha":1089.0,
+    "grounds":2400.0,
+    "perch":272.25,
+}
+
+SQFT_PATTERN=r'^\s*([\d.]+)\s*(?:-\s*([\d.]+))?\s*([A-Za-z. ]*)$'
+BHK_PATTERN=r'^\s*(\d+)'
+
+def _parse_sqft_values(values:pd.Series)->pd.Series:
+    sqft=pd.to_numeric(values,errors='coerce').astype(float)
+    pending=sqft.isna() & values.notna()
+    if pending.any():
+        parts=values[pending].astype(str).str.extract(SQFT_PATTERN)
+        low=pd.to_numeric(parts[0],errors='coerce')
+        high=pd.to_numeric(parts[1],errors='coerce')
+        value=low.where(high.isna(),(low+high)/2)
+        unit=parts[2].fillna('').str.lower().str.replace(r'[^a-z]','',regex=True)
+        factor=unit.map(SQFT_UNIT_CONVERSION).where(unit!='',1.0)
+        sqft[pending]=value*factor
+    return sqft
+
+def parse_total_sqft(total_sqft:pd.Series)->pd.Series:
+    """
+    convert the total_sqft column to square feet
+    total_sqft: pandas Series holding plain numbers, ranges like "1000 - 1200" (mean is taken)
+                or numbers with a unit suffix like "34.46Sq. Meter", "5.31Acres", "4125Perch"
+    return: float Series, NaN where the value or unit is not understood
+
+    The column has few distinct values, so only the uniques are parsed and mapped back.
+    """
+    codes,uniques=pd.factorize(total_sqft)
+    parsed=_parse_sqft_values(pd.Series(uniques,dtype=object)).to_numpy()
+    sqft=np.where(codes>=0,parsed[codes],np.nan) if len(parsed) else np.full(len(codes),np.nan)
+    return pd.Series(sqft,index=total_sqft.index,name=total_sqft.name)
+
+def parse_no_of_bhk(size:pd.Series)->pd.Series:
+    """
+    get the number of bedrooms from the size column, e.g. "2 BHK", "4 Bedroom", "1 RK"
+    size: pandas Series of size strings
+    return: integer Series, float with NaN if some values could not be parsed
+    """
+    codes,uniques=pd.factorize(size)
+    parsed=pd.to_numeric(pd.Series(uniques,dtype=object).astype(str).str.extract(BHK_PATTERN,expand=False),errors='coerce').to_numpy()
+    bhk=np.where(codes>=0,parsed[codes],np.nan) if len(parsed) else np.full(len(codes),np.nan)
+    bhk=pd.Series(bhk,index=size.index,name='no_of_BHK')
+    if bhk.notna().all():
+        return bhk.astype('int64')
+    return bhk
+
+
+def to_float(value)->float:
+    """
+    scalar counterpart of pd.to_numeric(errors="coerce"), NaN when the value is not a number
+    """
+    if isinstance(value,str) and "_" in value:
+        return np.nan
     try:
-        return float(x)
-    except:
-        return None
+        return float(value)
+    except (TypeError,ValueError):
+        return np.nan
+
+def parse_sqft_value(value)->float:
+    """
+    scalar counterpart of parse_total_sqft
+    """
+    sqft=to_float(value)
+    if not np.isnan(sqft) or value is None:
+        return sqft
+    match=re.match(SQFT_PATTERN,str(value))
+    if match is None:
+        return np.nan
+    low,high,unit=match.groups()
+    low,high=to_float(low),to_float(high)
+    sqft=low if np.isnan(high) else (low+high)/2
+    unit=re.sub(r'[^a-z]','',(unit or '').lower())
+    return sqft*(SQFT_UNIT_CONVERSION.get(unit,np.nan) if unit else 1.0)
+
+def parse_bhk_value(size)->float:
+    """
+    scalar counterpart of parse_no_of_bhk
+    """
+    match=re.match(BHK_PATTERN,str(size)) if size is not None else None
+    return float(match.group(1)) if match else np.nan
+
+def prepare_model_record(record:dict,location_mapping:dict,other_location:str)->dict:
+    """
+    single record counterpart of prepare_model_inputs, without building a DataFrame
+    record: raw input with location, size or no_of_BHK, total_sqft and bath keys
+    return: new dict with parsed float values and the location bucket
+    """
+    prepared=dict(record)
+    if "no_of_BHK" not in record and "size" in record:
+        prepared["no_of_BHK"]=parse_bhk_value(record["size"])
+    else:
+        prepared["no_of_BHK"]=to_float(record.get("no_of_BHK"))
+    prepared["total_sqft"]=parse_sqft_value(record.get("total_sqft"))
+    prepared["bath"]=to_float(record.get("bath"))
+    location=record.get("location")
+    prepared["location"]=location_mapping.get(location,other_location) if isinstance(location,Hashable) else other_location
+    return prepared
+
+def prepare_model_inputs(dataframe:pd.DataFrame,location_mapping:dict,other_location:str)->pd.DataFrame:
+    """
+    prepare raw model inputs: parse size and total_sqft, coerce the numerical columns
+    and map the locations to their learned bucket, unseen locations go to other_location
+    dataframe: raw inputs with location, size or no_of_BHK, total_sqft and bath columns
+    return: copy of the DataFrame, rows are never dropped
+    """
+    dataframe=dataframe.copy()
+    if "no_of_BHK" not in dataframe.columns and "size" in dataframe.columns:
+        dataframe["no_of_BHK"]=parse_no_of_bhk(dataframe["size"])
+    else:
+        dataframe["no_of_BHK"]=pd.to_numeric(dataframe["no_of_BHK"],errors="coerce")
+    dataframe["total_sqft"]=parse_total_sqft(dataframe["total_sqft"])
+    dataframe["bath"]=pd.to_numeric(dataframe["bath"],errors="coerce")
+    dataframe["location"]=dataframe["location"].map(location_mapping).fillna(other_location)
+    return dataframe
 
 
 def remove_pps_outliers(df4)->pd.DataFrame:
-    df_out=pd.DataFrame()
-    for key,subdf in df4.groupby('location'):
-        m=np.mean(subdf.price_per_sqft)
-        st=np.std(subdf.price_per_sqft)
-        reduced_df=subdf[(subdf['price_per_sqft']>(m-st)) & (subdf['price_per_sqft'] <=(m+st))]
-        df_out=pd.concat([df_out,reduced_df],ignore_index=True)
-    return df_out
+    """
+    keep the rows whose price_per_sqft lies within one standard deviation of their location mean
+    df4: pandas DataFrame with location and price_per_sqft columns
+    return: filtered DataFrame grouped by location, with a fresh index
+    """
+    codes,_=pd.factorize(df4['location'],sort=True)
+    grouped=df4['price_per_sqft'].groupby(codes)
+    m=grouped.transform('mean')
+    st=grouped.transform('std',ddof=0)
+    mask=((df4['price_per_sqft']>(m-st)) & (df4['price_per_sqft']<=(m+st))).to_numpy() & (codes>=0)
+    rows=np.flatnonzero(mask)
+    rows=rows[np.argsort(codes[rows],kind='stable')]
+    return df4.take(rows).reset_index(drop=True)
 
 def remove_bhk_outliers(df)->pd.DataFrame:
-    exclude_indices = np.array([])
-    for location, location_df in df.groupby('location'):
-        bhk_stats = {}
-        for bhk, bhk_df in location_df.groupby('no_of_BHK'):
-            bhk_stats[bhk] = {
-                'mean': np.mean(bhk_df.price_per_sqft),
-                'std': np.std(bhk_df.price_per_sqft),
-                'count': bhk_df.shape[0]
-            }
-        for bhk,bhk_df in location_df.groupby("no_of_BHK"):
-            stats = bhk_stats.get(bhk-1)
-            if stats and stats['count']>5:
-                exclude_indices = np.append(exclude_indices, bhk_df[bhk_df.price_per_sqft < stats['mean']].index.values)
-    return df.drop(exclude_indices,axis='index')
\ No newline at end of file
+    """
+    drop the rows of a location whose price_per_sqft is below the mean price_per_sqft of
+    the (BHK-1) apartments of the same location, when there are more than 5 of those
+    df: pandas DataFrame with location, no_of_BHK and price_per_sqft columns
+    """
+    bhk_stats=df.groupby(['location','no_of_BHK'])['price_per_sqft'].agg(['mean','size'])
+    previous_bhk=pd.MultiIndex.from_arrays([df['location'],df['no_of_BHK']-1])
+    previous_stats=bhk_stats.reindex(previous_bhk)
+    exclude=(previous_stats['size'].to_numpy()>5) & (df['price_per_sqft'].to_numpy()<previous_stats['mean'].to_numpy())
+    return df[~exclude]
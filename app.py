@@ -1,7 +1,9 @@
 
+import asyncio
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
@@ -10,8 +12,15 @@ from uvicorn import run as app_run
 from typing import Optional
 
 from HPP.constants import APP_HOST, APP_PORT
-from HPP.pipeline.prediction_pipeline import HPPData, HppClassifier
-from HPP.pipeline.training_pipeline import TrainingPipeline
+from HPP.entity.config_entity import MicroBatcherConfig
+from HPP.entity.model_registry import get_model_registry
+from HPP.logger import logging, log_pipeline
+from HPP.pipeline.job_manager import TrainingJobManager, get_inference_executor
+from HPP.pipeline.micro_batcher import MicroBatcher
+from HPP.pipeline.prediction_cache import get_prediction_cache
+from HPP.pipeline.prediction_pipeline import HPPData, HPPBatchData, HppClassifier
+from HPP.pipeline.serving_metrics import (CONTENT_TYPE, PHASE_PARSE, PHASE_PREDICT, PHASE_PREPROCESS, PHASE_RENDER,
+                                          RequestMetricsMiddleware, get_serving_metrics)
 
 app = FastAPI()
 
@@ -29,6 +38,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+serving_metrics = get_serving_metrics()
+app.add_middleware(RequestMetricsMiddleware, serving_metrics=serving_metrics)
+
+inference_executor = get_inference_executor()
+
+micro_batcher_config = MicroBatcherConfig()
+micro_batcher = MicroBatcher(predict_fn=lambda dataframe: HppClassifier().predict(dataframe=dataframe),
+                             micro_batcher_config=micro_batcher_config,
+                             executor=inference_executor)
+
+training_job_manager = TrainingJobManager(on_success=lambda: get_model_registry().refresh_in_background())
+
+serving_metrics.add_source("model_registry", lambda: get_model_registry().metrics())
+serving_metrics.add_source("prediction_cache", lambda: get_prediction_cache().metrics())
+if micro_batcher_config.enabled:
+    serving_metrics.add_source("micro_batcher", micro_batcher.metrics)
+serving_metrics.add_source("log", log_pipeline.metrics)
+
+
+async def run_inference(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, func, *args)
+
+
+@app.on_event("startup")
+async def load_model_registry():
+    try:
+        await run_inference(get_model_registry().start)
+    except Exception as e:
+        logging.error(f"Could not start model registry: {e}")
+    if micro_batcher_config.enabled:
+        micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_model_registry():
+    if micro_batcher_config.enabled:
+        await micro_batcher.stop()
+    try:
+        get_model_registry().stop()
+    except Exception as e:
+        logging.error(f"Could not stop model registry: {e}")
+
+
 class DataForm:
     def __init__(self, request: Request):
         self.request: Request = request
@@ -56,50 +109,100 @@ async def index(request: Request):
 @app.get("/train")
 async def trainRouteClient():
     try:
-        train_pipeline = TrainingPipeline()
-
-        train_pipeline.run_pipeline()
+        job = training_job_manager.submit()
 
-        return Response("Training successful !!")
+        return job
 
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/train/status/{job_id}")
+async def trainStatusRouteClient(job_id: str):
+    job = training_job_manager.status(job_id)
+    if job is None:
+        return {"status": False, "error": f"Unknown training job {job_id}"}
+    return job
+
+
 @app.post("/")
 async def predictRouteClient(request: Request):
+    route = "/"
     try:
-        form = DataForm(request)
-        await form.get_usvisa_data()
+        with serving_metrics.request_phase(route, PHASE_PARSE):
+            form = DataForm(request)
+            await form.get_usvisa_data()
         
-        Hpp_data = HPPData(
-                                location = form.location,
-                                no_of_BHK = form.no_of_BHK,
-                                total_sqft= form.total_sqft,
-                                bath= form.bath
-                               )
+        with serving_metrics.request_phase(route, PHASE_PREPROCESS):
+            Hpp_data = HPPData(
+                                    location = form.location,
+                                    no_of_BHK = form.no_of_BHK,
+                                    total_sqft= form.total_sqft,
+                                    bath= form.bath
+                                   )
+            if micro_batcher_config.enabled:
+                hpp_df = Hpp_data.get_hpp_input_data_frame()
+            else:
+                hpp_record = Hpp_data.get_hpp_record()
         
-        hpp_df = Hpp_data.get_hpp_input_data_frame()
-
-        model_predictor = HppClassifier()
+        with serving_metrics.request_phase(route, PHASE_PREDICT):
+            if micro_batcher_config.enabled:
+                value = (await micro_batcher.predict(hpp_df))[0]
+            else:
+                model_predictor = HppClassifier()
+
+                value = await run_inference(model_predictor.predict_record, hpp_record)
+
+        with serving_metrics.request_phase(route, PHASE_RENDER):
+            value = round(float(value),2)
+            status = None
+            if value != 0:
+                status = f"House price for above features is {value}Lakhs INR"
+            else:
+                status = f"House price is not able to retrieve "
+
+            return templates.TemplateResponse(
+                "hpp.html",
+                {"request": request, "context": status},
+            )
+        
+    except Exception as e:
+        return {"status": False, "error": f"{e}"}
 
 
-        value = model_predictor.predict(dataframe=hpp_df)[0]
-        value = round(float(value),2)
-        status = None
-        if value != 0:
-            status = f"House price for above features is {value}Lakhs INR"
-        else:
-            status = f"House price is not able to retrieve "
+@app.post("/predict/batch")
+async def batchPredictRouteClient(request: Request):
+    route = "/predict/batch"
+    try:
+        with serving_metrics.request_phase(route, PHASE_PARSE):
+            payload = await request.json()
+            records = payload.get("records") if isinstance(payload, dict) else payload
+
+        with serving_metrics.request_phase(route, PHASE_PREPROCESS):
+            hpp_batch_data = HPPBatchData(records=records)
+            hpp_df, errors = hpp_batch_data.get_hpp_input_data_frame()
+
+        with serving_metrics.request_phase(route, PHASE_PREDICT):
+            values = []
+            if len(hpp_df) > 0:
+                model_predictor = HppClassifier()
+                values = await run_inference(model_predictor.predict, hpp_df)
+
+        with serving_metrics.request_phase(route, PHASE_RENDER):
+            predictions = [None] * len(records)
+            for index, value in zip(hpp_df.index, values):
+                predictions[index] = round(float(value), 2)
+            # serialized here so that the json encoding is part of the render phase
+            return JSONResponse(content={"status": True, "predictions": predictions, "errors": errors})
 
-        return templates.TemplateResponse(
-            "hpp.html",
-            {"request": request, "context": status},
-        )
-        
     except Exception as e:
         return {"status": False, "error": f"{e}"}
 
 
+@app.get("/metrics")
+async def metricsRouteClient():
+    return Response(content=serving_metrics.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
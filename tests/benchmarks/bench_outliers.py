@@ -0,0 +1,46 @@
+"""
+Times the outlier removal against the groupby implementation it replaced on the Bengaluru
+dataset replicated to the requested number of rows (price_per_sqft jittered by +-20%)
+
+    python -m tests.benchmarks.bench_outliers --rows 1000000 5000000
+"""
+import argparse
+import math
+import time
+
+import pandas as pd
+
+from HPP.utils.main_utils import remove_bhk_outliers, remove_pps_outliers
+from tests import baseline
+from tests.datasets import load_outlier_input, scale
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--skip-check", action="store_true", help="do not compare the outputs")
+    args = parser.parse_args()
+
+    dataframe = load_outlier_input()
+    print(f"{'rows':>10} {'step':>5} {'groupby s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for rows in args.rows:
+        scaled = scale(dataframe, max(1, math.ceil(rows / len(dataframe))), "price_per_sqft")
+        for step, new, old in (("pps", remove_pps_outliers, baseline.remove_pps_outliers),
+                               ("bhk", remove_bhk_outliers, baseline.remove_bhk_outliers)):
+            old_result, old_seconds = timed(old, scaled)
+            new_result, new_seconds = timed(new, scaled)
+            if not args.skip_check:
+                pd.testing.assert_frame_equal(new_result, old_result)
+            print(f"{len(scaled):>10} {step:>5} {old_seconds:>10.3f} {new_seconds:>13.3f} {old_seconds / new_seconds:>7.1f}x")
+            # the bhk step runs on the output of the pps step, as in HousingCleaner.clean
+            scaled = new_result
+
+
+if __name__ == "__main__":
+    main()
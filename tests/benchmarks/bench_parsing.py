@@ -0,0 +1,41 @@
+"""
+Times parse_total_sqft and parse_no_of_bhk against the per row apply they replaced on the
+total_sqft and size columns of the Bengaluru dataset replicated to the requested number of rows
+
+    python -m tests.benchmarks.bench_parsing --rows 1000000 5000000
+"""
+import argparse
+import math
+import time
+
+import pandas as pd
+
+from HPP.utils.main_utils import parse_no_of_bhk, parse_total_sqft
+from tests import baseline
+from tests.datasets import load_raw
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    args = parser.parse_args()
+
+    raw = load_raw().dropna(subset=["size", "total_sqft"])
+    print(f"{'rows':>10} {'column':>10} {'apply s':>8} {'vectorized s':>13} {'speedup':>8}")
+    for rows in args.rows:
+        scaled = pd.concat([raw] * max(1, math.ceil(rows / len(raw))), ignore_index=True)
+        for column, new, old in (("total_sqft", parse_total_sqft, lambda values: values.apply(baseline.convert_sqft_to_num)),
+                                 ("size", parse_no_of_bhk, baseline.parse_no_of_bhk)):
+            _, old_seconds = timed(old, scaled[column])
+            _, new_seconds = timed(new, scaled[column])
+            print(f"{len(scaled):>10} {column:>10} {old_seconds:>8.3f} {new_seconds:>13.3f} {old_seconds / new_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
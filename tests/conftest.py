@@ -0,0 +1,16 @@
+import mongomock
+import pytest
+
+from HPP.configuration import connection_manager
+from HPP.configuration.connection_manager import ConnectionManager
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    """
+    In memory mongo db behind the process wide connection manager
+    """
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(ConnectionManager, "_create_mongo_client", lambda self: client)
+    monkeypatch.setattr(connection_manager, "_connection_manager", None)
+    return client
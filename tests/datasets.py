@@ -0,0 +1,72 @@
+"""
+The Bengaluru dataset shipped with the notebooks, prepared the way the pipeline prepares it
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostRegressor
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from xgboost import XGBRegressor
+
+from HPP.entity.estimator import HPPModel
+from HPP.entity.housing_cleaner import HousingCleaner
+from HPP.utils.main_utils import parse_no_of_bhk, parse_total_sqft, read_yaml
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(ROOT_DIR, "HPP", "notebook", "bengaluru_house_prices.csv")
+SCHEMA_PATH = os.path.join(ROOT_DIR, "config", "schema.yaml")
+
+
+def load_raw() -> pd.DataFrame:
+    return pd.read_csv(DATASET_PATH)
+
+
+def get_cleaner(raw: pd.DataFrame) -> HousingCleaner:
+    return HousingCleaner(drop_cols=read_yaml(SCHEMA_PATH)["drop_columns"]).fit(raw)
+
+
+def fit_hpp_model(kind: str) -> HPPModel:
+    """
+    A small XGBoost or CatBoost HPPModel, fitted the way DataTransformation and ModelTrainer fit
+    the cleaner, the preprocessor and the model
+    """
+    raw = load_raw()
+    cleaner = get_cleaner(raw)
+    schema = read_yaml(SCHEMA_PATH)
+    preprocessor = ColumnTransformer([("OnehotEncoder", OneHotEncoder(handle_unknown="ignore"), schema["oh_columns"]),
+                                      ("StandardScaler", StandardScaler(), schema["num_features"])],
+                                     sparse_threshold=1.0)
+    cleaned = cleaner.clean(raw)
+    features = preprocessor.fit_transform(cleaned)
+    if kind == "xgboost":
+        model = XGBRegressor(n_estimators=50, max_depth=4, learning_rate=0.3, n_jobs=1)
+    else:
+        model = CatBoostRegressor(iterations=50, depth=4, learning_rate=0.3, thread_count=1, verbose=False,
+                                  allow_writing_files=False)
+    model.fit(features, cleaned["price"])
+    return HPPModel(preprocessing_obj=preprocessor, train_model_object=model, cleaning_obj=cleaner)
+
+
+def load_outlier_input() -> pd.DataFrame:
+    """
+    The input of the outlier removal in HousingCleaner.clean: parsed, bucketed and with price_per_sqft
+    """
+    raw = load_raw()
+    cleaner = get_cleaner(raw)
+    df1 = cleaner._drop_unused(raw)
+    df1["no_of_BHK"] = parse_no_of_bhk(df1["size"])
+    df1["total_sqft"] = parse_total_sqft(df1["total_sqft"])
+    df1["price_per_sqft"] = df1["price"] * 100000 / df1["total_sqft"]
+    df1["location"] = cleaner.map_location(df1["location"])
+    return df1[~(df1["total_sqft"] / df1["no_of_BHK"] < cleaner.min_sqft_per_bhk)]
+
+
+def scale(dataframe: pd.DataFrame, factor: int, column: str, seed: int = 0) -> pd.DataFrame:
+    """
+    Replicates the rows factor times and jitters column by +-20%, so the copies are not identical
+    """
+    scaled = pd.concat([dataframe] * factor, ignore_index=True)
+    scaled[column] = scaled[column] * np.random.default_rng(seed).uniform(0.8, 1.2, len(scaled))
+    return scaled
@@ -0,0 +1,44 @@
+import pytest
+
+from HPP.constants import PREDICTION_BATCH_MAX_RECORDS
+from HPP.exception import CustomException
+from HPP.pipeline.prediction_pipeline import HPPBatchData
+
+
+def record(**values) -> dict:
+    return {"location": "Whitefield", "no_of_BHK": 2, "total_sqft": "1200", "bath": 2, **values}
+
+
+def test_mixed_batch_keeps_valid_records_and_reports_the_others():
+    records = [
+        record(),
+        record(total_sqft="1000 - 1200"),
+        record(total_sqft="34.46Sq. Meter"),
+        record(total_sqft=1500.0),
+        record(total_sqft="about 1000"),
+        record(total_sqft=None, bath="two"),
+        record(location="  "),
+        "not a record",
+        record(no_of_BHK="3"),
+    ]
+    dataframe, errors = HPPBatchData(records).get_hpp_input_data_frame()
+
+    assert dataframe.index.tolist() == [0, 1, 2, 3, 8]
+    # the cleaner of the model parses the area, it is passed on as sent
+    assert dataframe["total_sqft"].tolist() == ["1200", "1000 - 1200", "34.46Sq. Meter", 1500.0, "1200"]
+    assert dataframe["no_of_BHK"].tolist() == [2, 2, 2, 2, 3]
+    assert [error["index"] for error in errors] == [4, 5, 6, 7]
+    assert "total_sqft" in errors[0]["error"]
+    assert "bath" in errors[1]["error"] and "total_sqft" in errors[1]["error"]
+    assert "location" in errors[2]["error"]
+    assert all(column in errors[3]["error"] for column in HPPBatchData.input_columns)
+
+
+def test_batch_size_is_capped():
+    dataframe, errors = HPPBatchData([record()] * PREDICTION_BATCH_MAX_RECORDS).get_hpp_input_data_frame()
+    assert len(dataframe) == PREDICTION_BATCH_MAX_RECORDS and errors == []
+
+    with pytest.raises(CustomException, match=f"At most {PREDICTION_BATCH_MAX_RECORDS} records"):
+        HPPBatchData([record()] * (PREDICTION_BATCH_MAX_RECORDS + 1))
+    with pytest.raises(CustomException, match="records must be a list"):
+        HPPBatchData({"records": []})
@@ -0,0 +1,101 @@
+import os
+
+import mongomock
+import pytest
+from moto import mock_aws
+
+from HPP.configuration import connection_manager
+from HPP.configuration.connection_manager import ConnectionManager, get_connection_manager
+from HPP.exception import CustomException
+
+
+class FakeMongoClient(mongomock.MongoClient):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(monkeypatch) -> ConnectionManager:
+    monkeypatch.setattr(ConnectionManager, "_create_mongo_client", lambda self: FakeMongoClient())
+    monkeypatch.setenv("AWS_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    with mock_aws():
+        yield ConnectionManager()
+
+
+def forked(monkeypatch) -> None:
+    # what a forked child sees: the manager of its parent and a new process id
+    monkeypatch.setattr(connection_manager.os, "getpid", lambda pid=os.getpid() + 1: pid)
+
+
+def test_clients_are_created_once_and_shared(manager):
+    assert manager.get_mongo_client() is manager.get_mongo_client()
+    s3_resource = manager.get_s3_resource("us-east-1")
+    assert manager.get_s3_resource("us-east-1") is s3_resource
+    assert manager.get_s3_client("us-east-1") is s3_resource.meta.client
+    assert manager.get_s3_resource("eu-west-1") is not s3_resource
+
+
+def test_forked_process_creates_its_own_clients(manager, monkeypatch):
+    parent_mongo_client = manager.get_mongo_client()
+    parent_s3_resource = manager.get_s3_resource("us-east-1")
+    parent_lock = manager._lock
+
+    forked(monkeypatch)
+    mongo_client = manager.get_mongo_client()
+    assert mongo_client is not parent_mongo_client
+    assert manager.get_s3_resource("us-east-1") is not parent_s3_resource
+    assert manager._lock is not parent_lock and manager._pid == os.getpid()
+    # the parent's sockets are dropped, not closed, the parent still uses them
+    assert not parent_mongo_client.closed
+    assert manager.get_mongo_client() is mongo_client
+
+
+def test_close_leaves_the_clients_of_the_parent_open(manager, monkeypatch):
+    parent_mongo_client = manager.get_mongo_client()
+    forked(monkeypatch)
+    manager.close()
+    assert not parent_mongo_client.closed and manager._mongo_client is None
+
+
+def test_close_in_the_owning_process(manager):
+    mongo_client = manager.get_mongo_client()
+    manager.get_s3_resource("us-east-1")
+    manager.close()
+    assert mongo_client.closed and manager._s3_resources == {}
+
+
+def test_after_fork_hook_resets_the_process_wide_manager(manager, monkeypatch):
+    monkeypatch.setattr(connection_manager, "_connection_manager", manager)
+    parent_mongo_client = get_connection_manager().get_mongo_client()
+    parent_module_lock = connection_manager._connection_manager_lock
+
+    forked(monkeypatch)
+    connection_manager._reset_after_fork()
+    assert connection_manager._connection_manager_lock is not parent_module_lock
+    assert manager._mongo_client is None and manager._s3_resources == {}
+    assert get_connection_manager().get_mongo_client() is not parent_mongo_client
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_real_fork_drops_the_parent_clients(manager, monkeypatch):
+    monkeypatch.setattr(connection_manager, "_connection_manager", manager)
+    parent_mongo_client = manager.get_mongo_client()
+    pid = os.fork()
+    if pid == 0:
+        # the at fork hook already ran in the child
+        reset = manager._mongo_client is None and manager._pid == os.getpid()
+        os._exit(0 if reset and manager.get_mongo_client() is not parent_mongo_client else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    assert manager.get_mongo_client() is parent_mongo_client
+
+
+def test_missing_credentials(monkeypatch):
+    monkeypatch.delenv("AWS_ACCESS_KEY", raising=False)
+    with pytest.raises(CustomException, match="AWS_ACCESS_KEY"):
+        ConnectionManager().get_s3_resource("us-east-1")
@@ -0,0 +1,102 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from HPP.components.data_ingestion import DataIngestion
+from HPP.constants import DATABASE_NAME
+from HPP.entity.config_entity import DataIngestionConfig
+from HPP.exception import CustomException
+from HPP.utils.main_utils import load_dataframe, read_yaml
+
+COLLECTION_NAME = "House"
+STARTED = datetime(2024, 1, 1)
+
+
+def house(location: str, price: float, minutes: int = 0) -> dict:
+    return {"location": location, "size": "2 BHK", "total_sqft": "1200", "bath": 2.0, "price": price,
+            "updated_at": STARTED + timedelta(minutes=minutes)}
+
+
+def make_ingestion(tmp_path, **overrides) -> DataIngestion:
+    state_dir = os.path.join(tmp_path, "ingestion_state")
+    config = DataIngestionConfig(feature_store_path=os.path.join(tmp_path, "feature_store", "HPP.parquet"),
+                                 train_file_path=os.path.join(tmp_path, "ingested", "train.parquet"),
+                                 test_file_path=os.path.join(tmp_path, "ingested", "test.parquet"),
+                                 collection_name=COLLECTION_NAME, export_batch_size=2, export_partitions=1,
+                                 ingestion_state_dir=state_dir,
+                                 master_feature_store_path=os.path.join(state_dir, "HPP_master.parquet"),
+                                 state_file_path=os.path.join(state_dir, "state.yaml"),
+                                 **{"watermark_field": "updated_at", "full_refresh": False, **overrides})
+    return DataIngestion(data_ingestion_config=config)
+
+
+@pytest.fixture
+def collection(mongo_client):
+    collection = mongo_client[DATABASE_NAME][COLLECTION_NAME]
+    collection.insert_many([house("Whitefield", 50.0), house("Hebbal", 80.0), house("Yelahanka", 60.0)])
+    return collection
+
+
+def prices(dataframe) -> dict:
+    return dict(zip(dataframe["location"], dataframe["price"]))
+
+
+def test_first_run_exports_the_whole_collection(tmp_path, collection):
+    dataframe = make_ingestion(tmp_path).export_data_into_featurestore()
+
+    assert prices(dataframe) == {"Whitefield": 50.0, "Hebbal": 80.0, "Yelahanka": 60.0}
+    assert "_id" not in dataframe
+    state = read_yaml(make_ingestion(tmp_path).data_ingestion_config.state_file_path)
+    assert state["watermark_field"] == "updated_at" and state["rows"] == 3
+
+
+def test_updated_and_added_documents_are_merged(tmp_path, collection):
+    make_ingestion(tmp_path).export_data_into_featurestore()
+    collection.update_one({"location": "Hebbal"}, {"$set": {"price": 85.0, "updated_at": STARTED + timedelta(minutes=5)}})
+    collection.insert_one(house("Kengeri", 40.0, minutes=6))
+
+    ingestion = make_ingestion(tmp_path)
+    assert ingestion.get_incremental_query(ingestion.read_ingestion_state()) == {"updated_at": {"$gte": STARTED}}
+    dataframe = ingestion.export_data_into_featurestore()
+
+    # the updated document replaces its older copy, matched on _id
+    assert prices(dataframe) == {"Whitefield": 50.0, "Hebbal": 85.0, "Yelahanka": 60.0, "Kengeri": 40.0}
+    master = load_dataframe(ingestion.data_ingestion_config.master_feature_store_path)
+    assert master["_id"].is_unique and len(master) == 4
+    assert read_yaml(ingestion.data_ingestion_config.state_file_path)["watermark"] == \
+        (STARTED + timedelta(minutes=6)).isoformat()
+
+
+def test_id_watermark_only_picks_up_inserts_and_warns(tmp_path, collection, caplog):
+    make_ingestion(tmp_path, watermark_field="_id").export_data_into_featurestore()
+    collection.update_one({"location": "Hebbal"}, {"$set": {"price": 85.0}})
+    collection.insert_one(house("Kengeri", 40.0))
+
+    with caplog.at_level(logging.WARNING):
+        dataframe = make_ingestion(tmp_path, watermark_field="_id").export_data_into_featurestore()
+
+    assert prices(dataframe) == {"Whitefield": 50.0, "Hebbal": 80.0, "Yelahanka": 60.0, "Kengeri": 40.0}
+    assert any("updated documents are missed" in record.getMessage() for record in caplog.records)
+
+
+def test_full_refresh_drops_deleted_documents(tmp_path, collection):
+    make_ingestion(tmp_path).export_data_into_featurestore()
+    collection.delete_one({"location": "Yelahanka"})
+
+    assert len(make_ingestion(tmp_path).export_data_into_featurestore()) == 3
+    dataframe = make_ingestion(tmp_path, full_refresh=True).export_data_into_featurestore()
+    assert prices(dataframe) == {"Whitefield": 50.0, "Hebbal": 80.0}
+
+
+def test_changed_watermark_field_forces_a_full_refresh(tmp_path, collection):
+    make_ingestion(tmp_path).export_data_into_featurestore()
+    assert make_ingestion(tmp_path).read_ingestion_state() is not None
+    assert make_ingestion(tmp_path, watermark_field="_id").read_ingestion_state() is None
+
+
+def test_documents_without_the_watermark_field_fail_fast(tmp_path, collection):
+    collection.insert_one({"location": "Kengeri", "size": "2 BHK", "total_sqft": "900", "bath": 1.0, "price": 30.0})
+    with pytest.raises(CustomException, match="without the watermark field updated_at"):
+        make_ingestion(tmp_path).export_data_into_featurestore()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from HPP.exception import CustomException
+from HPP.utils.main_utils import load_dataframe, save_dataframe
+from tests.datasets import load_raw
+
+
+@pytest.fixture(scope="module")
+def raw() -> pd.DataFrame:
+    return load_raw().sample(n=2000, random_state=0).reset_index(drop=True)
+
+
+def assert_same_frame(loaded: pd.DataFrame, expected: pd.DataFrame) -> None:
+    # missing strings come back as None instead of NaN
+    pd.testing.assert_frame_equal(loaded.isna(), expected.isna())
+    pd.testing.assert_frame_equal(loaded.fillna({column: "" for column in loaded.columns[loaded.dtypes == object]}),
+                                  expected.fillna({column: "" for column in expected.columns[expected.dtypes == object]}))
+
+
+def test_parquet_round_trip_keeps_values_and_types(raw, tmp_path):
+    file_path = str(tmp_path / "feature_store" / "HPP.parquet")
+    save_dataframe(file_path, raw)
+    loaded = load_dataframe(file_path)
+    assert_same_frame(loaded, raw)
+    assert loaded["balcony"].isna().any() and loaded["society"].isna().any()
+
+    metadata = pq.ParquetFile(file_path).metadata
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_columns_are_projected(raw, tmp_path):
+    file_path = str(tmp_path / "HPP.parquet")
+    save_dataframe(file_path, raw)
+    columns = ["total_sqft", "location", "price"]
+    loaded = load_dataframe(file_path, columns=columns)
+    assert list(loaded.columns) == columns
+    assert_same_frame(loaded, raw[columns])
+
+    with pytest.raises(CustomException):
+        load_dataframe(file_path, columns=["not a column"])
+
+
+def test_csv_written_by_older_runs_is_still_read(raw, tmp_path):
+    file_path = str(tmp_path / "train.csv")
+    raw.to_csv(file_path, index=False)
+    pd.testing.assert_frame_equal(load_dataframe(file_path), pd.read_csv(file_path))
+
+    loaded = load_dataframe(file_path, columns=["location", "price"])
+    assert sorted(loaded.columns) == ["location", "price"]
+    np.testing.assert_array_equal(loaded["price"], raw["price"])
+
+
+def test_mixed_object_columns_are_stored_as_strings(tmp_path):
+    file_path = str(tmp_path / "mixed.parquet")
+    dataframe = pd.DataFrame({"total_sqft": ["1200", 1500, None, 34.5], "location": ["a", "b", None, "d"]})
+    save_dataframe(file_path, dataframe)
+    loaded = load_dataframe(file_path)
+    assert loaded["total_sqft"].tolist() == ["1200", "1500", None, "34.5"]
+    assert loaded["location"].tolist() == ["a", "b", None, "d"]
+    # the caller's frame is left as it was
+    assert dataframe["total_sqft"].tolist() == ["1200", 1500, None, 34.5]
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(CustomException):
+        load_dataframe(str(tmp_path / "missing.parquet"))
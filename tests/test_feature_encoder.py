@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from HPP.entity.estimator import HPPModel
+from HPP.entity.feature_encoder import FeatureEncoder
+from HPP.utils.main_utils import read_yaml
+from tests.datasets import SCHEMA_PATH, get_cleaner, load_raw
+
+INPUT_COLUMNS = ["location", "size", "total_sqft", "bath"]
+
+EDGE_CASES = pd.DataFrame([
+    {"location": "a location never seen", "size": "3 BHK", "total_sqft": "1500", "bath": 2.0},
+    {"location": "Whitefield", "size": "2 BHK", "total_sqft": "1100 - 1300", "bath": 2.0},
+    {"location": "Whitefield", "size": "4 Bedroom", "total_sqft": "2100-2850", "bath": 4.0},
+    {"location": "Electronic City Phase II", "size": "1 RK", "total_sqft": "34.46Sq. Meter", "bath": 1.0},
+    {"location": "Sarjapur  Road", "size": "3 BHK", "total_sqft": "5.31Acres", "bath": 3.0},
+    {"location": "Yelahanka", "size": "2 BHK", "total_sqft": "151.11Sq. Yards", "bath": 2.0},
+    {"location": "Yelahanka", "size": "2 BHK", "total_sqft": "4125Perch", "bath": 2.0},
+    {"location": "Yelahanka", "size": "2 BHK", "total_sqft": "1000Sq. Furlong", "bath": 2.0},
+    {"location": "Hebbal", "size": "BHK", "total_sqft": "garbage", "bath": "two"},
+    {"location": np.nan, "size": np.nan, "total_sqft": np.nan, "bath": np.nan},
+    {"location": "Hebbal", "size": "3 BHK", "total_sqft": "1650", "bath": np.nan},
+])
+
+
+@pytest.fixture(scope="module")
+def fitted_model() -> HPPModel:
+    # fitted the way DataTransformation fits the cleaner and the preprocessor
+    raw = load_raw()
+    cleaner = get_cleaner(raw)
+    schema = read_yaml(SCHEMA_PATH)
+    preprocessor = ColumnTransformer([("OnehotEncoder", OneHotEncoder(handle_unknown="ignore"), schema["oh_columns"]),
+                                      ("StandardScaler", StandardScaler(), schema["num_features"])],
+                                     sparse_threshold=1.0)
+    preprocessor.fit(cleaner.clean(raw))
+    return HPPModel(preprocessing_obj=preprocessor, train_model_object=object(), cleaning_obj=cleaner)
+
+
+@pytest.fixture(scope="module")
+def inputs() -> pd.DataFrame:
+    raw = load_raw()[INPUT_COLUMNS]
+    sample = pd.concat([raw.sample(n=500, random_state=0), raw[raw.isna().any(axis=1)].head(50)])
+    return pd.concat([sample, EDGE_CASES], ignore_index=True)
+
+
+def sklearn_features(hpp_model: HPPModel, dataframe: pd.DataFrame, zero_as_missing: bool) -> np.ndarray:
+    expected = hpp_model.preprocessing_object.transform(hpp_model.cleaning_object.transform(dataframe))
+    expected = (expected.toarray() if hasattr(expected, "toarray") else np.asarray(expected)).astype(np.float32)
+    if zero_as_missing:
+        expected[expected == 0] = np.nan
+    return expected
+
+
+@pytest.mark.parametrize("zero_as_missing", [False, True])
+def test_encoder_matches_cleaner_and_preprocessor(fitted_model, inputs, zero_as_missing):
+    encoder = FeatureEncoder.from_hpp_model(fitted_model)
+    encoder.zero_as_missing = zero_as_missing
+    expected = sklearn_features(fitted_model, inputs, zero_as_missing)
+    assert np.isnan(expected).any()
+
+    by_record = np.vstack([encoder.encode_record(record).copy() for record in inputs.to_dict("records")])
+    for features in (encoder.transform(inputs), by_record):
+        assert features.shape == expected.shape
+        np.testing.assert_array_equal(np.isnan(features), np.isnan(expected))
+        np.testing.assert_allclose(features, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_encoder_survives_npz_round_trip(fitted_model, inputs, tmp_path):
+    encoder = FeatureEncoder.from_hpp_model(fitted_model)
+    np.savez(tmp_path / "encoder.npz", **encoder.get_arrays())
+    with np.load(tmp_path / "encoder.npz", allow_pickle=False) as arrays:
+        loaded = FeatureEncoder.from_arrays(arrays)
+    np.testing.assert_array_equal(loaded.transform(inputs), encoder.transform(inputs))
+    assert loaded.check_parity(fitted_model) < 1e-5
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from HPP.constants import DATABASE_NAME
+from HPP.data_access.HP_data_access import HPData
+
+COLLECTION_NAME = "House"
+N_DOCUMENTS = 2500
+
+
+def house(index: int) -> dict:
+    document = {"index": index, "location": f"location {index % 7}", "size": "2 BHK",
+                "bath": "na" if index % 10 == 0 else float(index % 4 + 1), "price": float(index)}
+    # a field the first documents do not have
+    if index >= 1200:
+        document["balcony"] = 1.0
+    return document
+
+
+@pytest.fixture
+def collection(mongo_client):
+    collection = mongo_client[DATABASE_NAME][COLLECTION_NAME]
+    collection.insert_many([house(index) for index in range(N_DOCUMENTS)])
+    return collection
+
+
+def test_collection_is_streamed_in_chunks(collection):
+    chunks = list(HPData().iter_collection_chunks(COLLECTION_NAME, chunk_size=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    dataframe = pd.concat(chunks, ignore_index=True)
+    assert "_id" not in dataframe.columns
+    assert dataframe["index"].tolist() == list(range(N_DOCUMENTS))
+    assert dataframe["bath"].isna().sum() == N_DOCUMENTS // 10
+    assert dataframe["balcony"].isna().sum() == 1200 and (dataframe["balcony"].iloc[1200:] == 1.0).all()
+
+
+def test_chunks_follow_the_query_and_include_id(collection):
+    chunks = list(HPData().iter_collection_chunks(COLLECTION_NAME, query={"location": "location 3"},
+                                                  chunk_size=100, include_id=True))
+    dataframe = pd.concat(chunks, ignore_index=True)
+    assert "_id" in dataframe.columns
+    assert set(dataframe["location"]) == {"location 3"}
+    assert len(dataframe) == len([index for index in range(N_DOCUMENTS) if index % 7 == 3])
+
+
+@pytest.mark.parametrize("n_partitions", [2, 3, 7])
+def test_partitioned_export_matches_single_cursor(collection, n_partitions):
+    hp_data = HPData()
+    expected = hp_data.export_collection_as_df(COLLECTION_NAME, chunk_size=300)
+    partitioned = hp_data.export_collection_as_df(COLLECTION_NAME, chunk_size=300, n_partitions=n_partitions)
+    pd.testing.assert_frame_equal(partitioned, expected)
+
+
+def test_partitions_cover_the_query_without_overlap(collection):
+    hp_data = HPData()
+    query = {"price": {"$gte": 100.0}}
+    partition_queries = hp_data.get_partition_queries(COLLECTION_NAME, 4, query=query)
+    assert len(partition_queries) == 4
+    ids = [document["_id"] for partition_query in partition_queries for document in collection.find(partition_query)]
+    assert len(ids) == len(set(ids)) == collection.count_documents(query)
+
+    dataframe = hp_data.export_collection_as_df(COLLECTION_NAME, query=query, n_partitions=4)
+    assert dataframe["index"].tolist() == list(range(100, N_DOCUMENTS))
+
+
+def test_more_partitions_than_documents(mongo_client):
+    collection = mongo_client[DATABASE_NAME][COLLECTION_NAME]
+    collection.insert_many([house(index) for index in range(3)])
+    dataframe = HPData().export_collection_as_df(COLLECTION_NAME, n_partitions=8)
+    assert dataframe["index"].tolist() == [0, 1, 2]
+
+
+def test_empty_collection(mongo_client):
+    hp_data = HPData()
+    assert list(hp_data.iter_collection_chunks(COLLECTION_NAME)) == []
+    for n_partitions in (1, 4):
+        assert hp_data.export_collection_as_df(COLLECTION_NAME, n_partitions=n_partitions).empty
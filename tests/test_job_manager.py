@@ -0,0 +1,88 @@
+import os
+import time
+
+import pytest
+
+from HPP.pipeline.job_manager import (JOB_STATUS_FAILED, JOB_STATUS_RUNNING, JOB_STATUS_SUCCEEDED,
+                                      TrainingJobManager)
+
+
+# jobs run in a spawned process, so they are module level functions
+def succeeding_job() -> None:
+    pass
+
+
+def failing_job() -> None:
+    raise ValueError("no training data")
+
+
+def job_waiting_for_file(file_path: str) -> None:
+    deadline = time.monotonic() + 30
+    while not os.path.exists(file_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class JobWaitingForFile:
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def __call__(self) -> None:
+        job_waiting_for_file(self.file_path)
+
+
+def wait_until_finished(training_job_manager: TrainingJobManager, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    job = training_job_manager.status(job_id)
+    while job["status"] == JOB_STATUS_RUNNING and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = training_job_manager.status(job_id)
+    return job
+
+
+def test_job_goes_from_running_to_succeeded_and_calls_on_success():
+    successes = []
+    training_job_manager = TrainingJobManager(job_fn=succeeding_job, on_success=lambda: successes.append(True))
+    job = training_job_manager.submit()
+    assert job["status"] == JOB_STATUS_RUNNING and job["finished_at"] is None
+
+    job = wait_until_finished(training_job_manager, job["job_id"])
+    assert job["status"] == JOB_STATUS_SUCCEEDED and job["finished_at"] is not None and job["error"] is None
+    # on_success runs right after the status is set, outside the lock
+    deadline = time.monotonic() + 5
+    while not successes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert successes == [True]
+
+
+def test_failed_job_records_the_error_and_skips_on_success():
+    successes = []
+    training_job_manager = TrainingJobManager(job_fn=failing_job, on_success=lambda: successes.append(True))
+    job = wait_until_finished(training_job_manager, training_job_manager.submit()["job_id"])
+    assert job["status"] == JOB_STATUS_FAILED and "no training data" in job["error"]
+    assert successes == []
+
+
+def test_only_one_job_runs_at_a_time(tmp_path):
+    release_file = str(tmp_path / "release")
+    training_job_manager = TrainingJobManager(job_fn=JobWaitingForFile(release_file))
+    first = training_job_manager.submit()
+    assert training_job_manager.submit()["job_id"] == first["job_id"]
+
+    open(release_file, "w").close()
+    assert wait_until_finished(training_job_manager, first["job_id"])["status"] == JOB_STATUS_SUCCEEDED
+    second = training_job_manager.submit()
+    assert second["job_id"] != first["job_id"]
+    wait_until_finished(training_job_manager, second["job_id"])
+
+
+def test_unknown_job_has_no_status():
+    assert TrainingJobManager(job_fn=succeeding_job).status("missing") is None
+
+
+def test_status_is_a_copy():
+    training_job_manager = TrainingJobManager(job_fn=succeeding_job)
+    job = training_job_manager.submit()
+    job["status"] = "tampered"
+    status = training_job_manager.status(job["job_id"])
+    assert status["status"] in (JOB_STATUS_RUNNING, JOB_STATUS_SUCCEEDED)
+    wait_until_finished(training_job_manager, job["job_id"])
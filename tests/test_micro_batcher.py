@@ -0,0 +1,104 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from HPP.entity.config_entity import MicroBatcherConfig
+from HPP.pipeline.micro_batcher import MicroBatcher
+
+
+def frame(*values) -> pd.DataFrame:
+    return pd.DataFrame({"total_sqft": list(values)})
+
+
+def double(dataframe: pd.DataFrame) -> np.ndarray:
+    if (dataframe["total_sqft"] < 0).any():
+        raise ValueError("negative area")
+    return dataframe["total_sqft"].to_numpy() * 2
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def test_requests_in_the_window_are_predicted_together():
+    calls = []
+
+    def predict(dataframe):
+        calls.append(len(dataframe))
+        return double(dataframe)
+
+    async def scenario():
+        batcher = MicroBatcher(predict, MicroBatcherConfig(enabled=True, max_batch_size=100, max_wait_ms=50))
+        batcher.start()
+        results = await asyncio.gather(batcher.predict(frame(1.0)), batcher.predict(frame(2.0, 3.0)),
+                                       batcher.predict(frame(4.0)))
+        # the window closed, a later request is flushed alone after max_wait_ms
+        late = await batcher.predict(frame(5.0))
+        await batcher.stop()
+        return results, late, batcher.metrics()
+
+    results, late, metrics = run(scenario())
+    assert [result.tolist() for result in results] == [[2.0], [4.0, 6.0], [8.0]]
+    assert late.tolist() == [10.0]
+    assert calls == [4, 1]
+    assert metrics["batches_total"] == 2 and metrics["max_batch_rows"] == 4 and metrics["queue_depth_rows"] == 0
+
+
+def test_full_batch_is_flushed_before_the_window_ends():
+    async def scenario():
+        batcher = MicroBatcher(double, MicroBatcherConfig(enabled=True, max_batch_size=2, max_wait_ms=60000))
+        batcher.start()
+        results = await asyncio.gather(*(batcher.predict(frame(float(value))) for value in range(4)))
+        await batcher.stop()
+        return results, batcher.metrics()
+
+    results, metrics = run(scenario())
+    assert [result.tolist() for result in results] == [[0.0], [2.0], [4.0], [6.0]]
+    assert metrics["batches_total"] == 2
+
+
+def test_requests_arriving_at_the_deadline_are_not_lost():
+    async def scenario():
+        batcher = MicroBatcher(double, MicroBatcherConfig(enabled=True, max_batch_size=1000, max_wait_ms=1))
+
+        async def late_request(value):
+            await asyncio.sleep((value % 7) / 2000)
+            return await batcher.predict(frame(float(value)))
+
+        batcher.start()
+        results = await asyncio.gather(*(late_request(value) for value in range(300)))
+        await batcher.stop()
+        return results, batcher.metrics()
+
+    results, metrics = run(scenario())
+    assert [float(result[0]) for result in results] == [value * 2.0 for value in range(300)]
+    assert metrics["rows_total"] == 300 and metrics["queue_depth_rows"] == 0
+
+
+def test_failed_batch_falls_back_to_single_requests():
+    calls = []
+
+    def predict(dataframe):
+        calls.append(len(dataframe))
+        return double(dataframe)
+
+    async def scenario():
+        batcher = MicroBatcher(predict, MicroBatcherConfig(enabled=True, max_batch_size=100, max_wait_ms=50))
+        batcher.start()
+        results = await asyncio.gather(batcher.predict(frame(1.0)), batcher.predict(frame(-1.0)),
+                                       batcher.predict(frame(3.0)), return_exceptions=True)
+        await batcher.stop()
+        return results, batcher.metrics()
+
+    results, metrics = run(scenario())
+    assert results[0].tolist() == [2.0] and results[2].tolist() == [6.0]
+    assert isinstance(results[1], ValueError)
+    assert calls == [3, 1, 1, 1]
+    assert metrics["errors_total"] == 1
+
+
+def test_predict_requires_a_started_batcher():
+    with pytest.raises(Exception, match="not started"):
+        run(MicroBatcher(double).predict(frame(1.0)))
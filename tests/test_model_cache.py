@@ -0,0 +1,134 @@
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from HPP.cloud_storage.model_cache import LATEST_FILE_NAME, PART_FILE_SUFFIX, ModelFileCache
+from HPP.cloud_storage.s3_transfer import S3TransferManager, normalize_etag
+from HPP.entity.config_entity import ModelCacheConfig, S3TransferConfig
+
+BUCKET_NAME = "hpp-test"
+KEY = "model/model.pkl"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    for name, value in {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                        "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
+
+
+class RecordingS3Client:
+    """
+    s3 client which records the get_object requests and their status
+    """
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+        self.requests = []
+
+    def __getattr__(self, name):
+        return getattr(self.s3_client, name)
+
+    def get_object(self, **request):
+        try:
+            response = self.s3_client.get_object(**request)
+        except ClientError as e:
+            self.requests.append((request, e.response["ResponseMetadata"]["HTTPStatusCode"]))
+            raise
+        self.requests.append((request, 200))
+        return response
+
+
+@pytest.fixture
+def recording_client(s3_client) -> RecordingS3Client:
+    return RecordingS3Client(s3_client)
+
+
+@pytest.fixture
+def transfer(recording_client) -> S3TransferManager:
+    return S3TransferManager(recording_client, S3TransferConfig(multipart_threshold_mb=8, multipart_chunk_size_mb=8,
+                                                                max_concurrency=1, verify_checksums=True))
+
+
+def make_cache(tmp_path, keep_versions: int = 2) -> ModelFileCache:
+    return ModelFileCache(ModelCacheConfig(enabled=True, cache_dir=str(tmp_path / "model_cache"),
+                                           keep_versions=keep_versions, chunk_size=1024))
+
+
+def publish(s3_client, content: bytes) -> str:
+    s3_client.put_object(Bucket=BUCKET_NAME, Key=KEY, Body=content)
+    return normalize_etag(s3_client.head_object(Bucket=BUCKET_NAME, Key=KEY)["ETag"])
+
+
+def read(file_path: str) -> bytes:
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+def test_unchanged_model_is_revalidated_with_304(tmp_path, s3_client, recording_client, transfer):
+    model_cache = make_cache(tmp_path)
+    etag = publish(s3_client, b"model v1")
+    file_path = model_cache.get_file(transfer, BUCKET_NAME, KEY)
+    assert read(file_path) == b"model v1" and file_path.endswith(etag + ".pkl")
+    assert recording_client.requests == [({"Bucket": BUCKET_NAME, "Key": KEY}, 200)]
+
+    assert model_cache.get_file(transfer, BUCKET_NAME, KEY) == file_path
+    assert recording_client.requests[-1] == ({"Bucket": BUCKET_NAME, "Key": KEY, "IfNoneMatch": f'"{etag}"'}, 304)
+
+    new_etag = publish(s3_client, b"model v2")
+    new_file_path = model_cache.get_file(transfer, BUCKET_NAME, KEY)
+    assert recording_client.requests[-1][1] == 200
+    assert read(new_file_path) == b"model v2" and new_file_path.endswith(new_etag + ".pkl")
+    assert read(os.path.join(model_cache.get_entry_dir(BUCKET_NAME, KEY), LATEST_FILE_NAME)).decode() == new_etag
+
+
+def test_known_etag_is_served_without_requests(tmp_path, s3_client, recording_client, transfer, monkeypatch):
+    model_cache = make_cache(tmp_path)
+    etag = publish(s3_client, b"model v1")
+    file_path = model_cache.get_file(transfer, BUCKET_NAME, KEY, etag=f'"{etag}"')
+    assert read(file_path) == b"model v1"
+    # downloaded through the transfer manager, not a plain GET
+    assert recording_client.requests == []
+
+    monkeypatch.setattr(transfer, "download_file", lambda *args: pytest.fail("cached model downloaded again"))
+    assert model_cache.get_file(transfer, BUCKET_NAME, KEY, etag=etag) == file_path
+    assert recording_client.requests == []
+
+
+def test_stale_etag_falls_back_to_the_current_object(tmp_path, s3_client, transfer):
+    model_cache = make_cache(tmp_path)
+    old_etag = publish(s3_client, b"model v1")
+    new_etag = publish(s3_client, b"model v2")
+    file_path = model_cache.get_file(transfer, BUCKET_NAME, KEY, etag=old_etag)
+    assert read(file_path) == b"model v2" and file_path.endswith(new_etag + ".pkl")
+    entry_dir = model_cache.get_entry_dir(BUCKET_NAME, KEY)
+    assert not [name for name in os.listdir(entry_dir) if name.endswith(PART_FILE_SUFFIX)]
+
+
+def test_old_versions_are_pruned(tmp_path, s3_client, transfer):
+    model_cache = make_cache(tmp_path, keep_versions=2)
+    file_paths = []
+    for index in range(4):
+        publish(s3_client, f"model v{index}".encode())
+        file_paths.append(model_cache.get_file(transfer, BUCKET_NAME, KEY))
+        # distinct modification times, the newest versions are kept
+        os.utime(file_paths[-1], (1000 + index, 1000 + index))
+    entry_dir = model_cache.get_entry_dir(BUCKET_NAME, KEY)
+    versions = sorted(name for name in os.listdir(entry_dir) if not name.startswith("."))
+    assert versions == sorted(os.path.basename(file_path) for file_path in file_paths[-2:])
+
+
+def test_partial_files_of_crashed_downloads_are_removed(tmp_path, s3_client, transfer):
+    model_cache = make_cache(tmp_path)
+    entry_dir = model_cache.get_entry_dir(BUCKET_NAME, KEY)
+    os.makedirs(entry_dir)
+    open(os.path.join(entry_dir, "crashed" + PART_FILE_SUFFIX), "wb").close()
+    publish(s3_client, b"model v1")
+    model_cache.get_file(transfer, BUCKET_NAME, KEY)
+    assert not [name for name in os.listdir(entry_dir) if name.endswith(PART_FILE_SUFFIX)]
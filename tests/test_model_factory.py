@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import GridSearchCV, KFold
+
+from HPP.entity import model_factory
+from HPP.entity.model_factory import SEARCH_GRID, ParallelModelFactory, split_early_stopping_rows
+
+
+@pytest.fixture
+def search_worker(monkeypatch):
+    """
+    Worker state of a search over 1000 rows where y holds the row numbers, fit_with_early_stopping
+    records the rows it was given
+    """
+    x = np.random.RandomState(0).normal(size=(1000, 3))
+    y = np.arange(1000, dtype=float)
+    random_state = np.random.RandomState(42)
+    folds = [(random_state.permutation(train_index), test_index)
+             for train_index, test_index in KFold(n_splits=3).split(x)]
+    monkeypatch.setattr(model_factory, "_worker_state",
+                        {"x": x, "y": y, "estimators": {"module_0": LinearRegression()},
+                         "candidates": {"module_0": [{}]}, "folds": folds, "threads": 1})
+    calls = []
+
+    def fit_with_early_stopping(estimator, x_train, y_train, x_valid, y_valid, early_stopping_rounds):
+        calls.append((y_train.astype(int), y_valid.astype(int)))
+        return estimator.fit(x_train, y_train)
+
+    monkeypatch.setattr(model_factory, "fit_with_early_stopping", fit_with_early_stopping)
+    return folds, calls
+
+
+@pytest.mark.parametrize("n_samples", [None, 100])
+def test_early_stopping_rows_never_overlap_the_scored_fold(search_worker, n_samples):
+    folds, calls = search_worker
+    for fold_index, (train_index, test_index) in enumerate(folds):
+        score, _, error = model_factory._fit_candidate("module_0", 0, fold_index, n_samples=n_samples,
+                                                       early_stopping_rounds=10, early_stopping_samples=50)
+        assert error is None and not np.isnan(score)
+        fit_rows, valid_rows = calls[-1]
+        assert len(valid_rows) == 50 and len(fit_rows) == (n_samples or len(train_index) - 50)
+        assert not set(valid_rows) & set(test_index)
+        assert not set(valid_rows) & set(fit_rows)
+        assert set(fit_rows) | set(valid_rows) <= set(train_index)
+
+
+def test_early_stopping_rows_are_capped_to_a_fifth_of_the_training_rows():
+    train_index = np.arange(100)
+    fit_index, valid_index = split_early_stopping_rows(train_index, 500)
+    assert valid_index.tolist() == list(range(80, 100)) and fit_index.tolist() == list(range(80))
+    fit_index, valid_index = split_early_stopping_rows(train_index, None)
+    assert len(valid_index) == 20
+
+
+MODEL_CONFIG = """
+grid_search:
+  class: GridSearchCV
+  module: sklearn.model_selection
+  params:
+    cv: 3
+search_engine:
+  backend: process_pool
+  n_jobs: 2
+  threads_per_worker: 1
+  search: grid
+model_selection:
+  module_0:
+    class: Ridge
+    module: sklearn.linear_model
+    params:
+      alpha: 1.0
+    search_param_grid:
+      alpha:
+      - 10.0
+      - 0.1
+      - 0.1
+      - 100.0
+      fit_intercept:
+      - true
+      - false
+  module_1:
+    class: DecisionTreeRegressor
+    module: sklearn.tree
+    params:
+      random_state: 0
+    search_param_grid:
+      max_depth:
+      - 2
+      - 4
+      - 8
+      min_samples_leaf:
+      - 1
+      - 20
+"""
+
+
+def test_parallel_grid_search_matches_grid_search_cv(tmp_path):
+    model_config_path = tmp_path / "model.yaml"
+    model_config_path.write_text(MODEL_CONFIG)
+    random_state = np.random.RandomState(0)
+    x = random_state.normal(size=(600, 5))
+    y = x @ np.array([3.0, -2.0, 0.5, 0.0, 1.0]) + np.sin(3 * x[:, 0]) * 2 + random_state.normal(scale=0.3, size=600)
+
+    parallel_model_factory = ParallelModelFactory(model_config_path=str(model_config_path))
+    initialized_models = parallel_model_factory.get_initialized_model_list()
+    best_models = parallel_model_factory.initiate_best_parameter_search_for_initialized_models(
+        initialized_models, input_feature=x, output_feature=y)
+    assert [best_model.model_serial_number for best_model in best_models] == ["module_0", "module_1"]
+
+    for initialized_model, best_model in zip(initialized_models, best_models):
+        grid_search_cv = GridSearchCV(clone(initialized_model.model), initialized_model.param_grid_search,
+                                      cv=3, scoring="r2").fit(x, y)
+        assert best_model.best_parameters == grid_search_cv.best_params_
+        assert best_model.best_score == pytest.approx(grid_search_cv.best_score_, abs=1e-12)
+        np.testing.assert_allclose(best_model.best_model.predict(x), grid_search_cv.best_estimator_.predict(x))
+    # the repeated alpha gives tied candidates, both searches still agree on the winner
+    assert best_models[0].best_parameters["alpha"] == 0.1
+
+    report = parallel_model_factory.search_report[SEARCH_GRID]
+    assert report["fits"] == (8 + 6) * 3
+    assert report["models"]["module_1"]["best_parameters"] == best_models[1].best_parameters
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+from moto import mock_aws
+
+from HPP.constants import SERVING_MODEL_FORMAT_PICKLE
+from HPP.entity.config_entity import HPPredictorConfig
+from HPP.entity.model_registry import ModelRegistry
+from HPP.exception import CustomException
+
+
+class FakeModel:
+    def __init__(self, version: str):
+        self.version = version
+        self.warmed_up = False
+
+    def warmup(self) -> None:
+        self.warmed_up = True
+
+
+class FakeEstimator:
+    """
+    Published model of the registry, its version is changed by the tests to publish a new model
+    """
+    def __init__(self, version=None):
+        self.version = version
+        self.model_path = "model.pkl"
+        self.bucket_name = "hpp-test"
+        self.loads = []
+        self.fail = False
+
+    def get_model_version(self):
+        return self.version
+
+    def load_model(self, version=None):
+        if self.fail:
+            raise Exception("model download failed")
+        self.loads.append(version)
+        return FakeModel(version)
+
+
+@pytest.fixture
+def estimator() -> FakeEstimator:
+    return FakeEstimator("v1")
+
+
+@pytest.fixture
+def model_registry(estimator, monkeypatch) -> ModelRegistry:
+    monkeypatch.setenv("AWS_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    with mock_aws():
+        model_registry = ModelRegistry(HPPredictorConfig(model_format=SERVING_MODEL_FORMAT_PICKLE,
+                                                         model_refresh_interval=0.01))
+    model_registry.estimator = estimator
+    yield model_registry
+    model_registry.stop()
+
+
+def test_model_is_loaded_once_per_version(model_registry, estimator):
+    model, version = model_registry.get_model_and_version()
+    assert (model.version, version) == ("v1", "v1") and model.warmed_up
+    assert model_registry.get_model() is model
+    assert model_registry.refresh() is False
+    assert estimator.loads == ["v1"]
+
+    assert model_registry.refresh(force=True) is True
+    assert model_registry.get_model() is not model
+    assert model_registry.metrics()["loads_total"] == 2
+
+
+def test_new_version_is_swapped_in_and_listeners_are_called(model_registry, estimator):
+    reloaded = []
+    model_registry.add_reload_listener(reloaded.append)
+    model_registry.add_reload_listener(lambda version: 1 / 0)
+    in_flight = model_registry.get_model()
+
+    estimator.version = "v2"
+    assert model_registry.refresh() is True
+    assert model_registry.model_version == "v2" and model_registry.get_model().version == "v2"
+    # a request which already got the model keeps it
+    assert in_flight.version == "v1"
+    assert reloaded == ["v1", "v2"]
+
+
+def test_failed_load_keeps_the_current_model(model_registry, estimator):
+    model = model_registry.get_model()
+    estimator.version, estimator.fail = "v2", True
+    model_registry._safe_refresh()
+    assert model_registry.get_model() is model
+    assert model_registry.metrics()["refresh_errors_total"] == 1
+
+    estimator.fail = False
+    model_registry._safe_refresh()
+    assert model_registry.get_model().version == "v2"
+
+
+def test_nothing_published(model_registry, estimator):
+    estimator.version = None
+    assert model_registry.refresh() is False
+    with pytest.raises(CustomException, match="No model available"):
+        model_registry.get_model()
+    assert model_registry.metrics()["model_loaded"] is False
+
+
+def test_background_thread_hot_swaps_new_versions(model_registry, estimator):
+    model_registry.start()
+    assert model_registry.model_version == "v1"
+    estimator.version = "v2"
+    deadline = time.monotonic() + 5
+    while model_registry.model_version != "v2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert model_registry.model_version == "v2"
+    model_registry.stop()
+    assert model_registry._refresh_thread is None
+
+
+def test_model_and_version_always_match_during_swaps(model_registry, estimator):
+    model_registry.get_model()
+    mismatches = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            model, version = model_registry.get_model_and_version()
+            if model.version != version:
+                mismatches.append((model.version, version))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for index in range(50):
+        estimator.version = f"v{index + 2}"
+        model_registry.refresh()
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert mismatches == []
+    assert model_registry.model_version == "v51"
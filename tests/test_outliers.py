@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from HPP.utils.main_utils import remove_bhk_outliers, remove_pps_outliers
+from tests import baseline
+from tests.datasets import load_outlier_input, scale
+
+
+@pytest.fixture(scope="module")
+def outlier_input() -> pd.DataFrame:
+    return load_outlier_input()
+
+
+@pytest.mark.parametrize("factor", [1, 20])
+def test_outlier_removal_matches_groupby_implementation(outlier_input, factor):
+    dataframe = outlier_input if factor == 1 else scale(outlier_input, factor, "price_per_sqft")
+
+    pps = remove_pps_outliers(dataframe)
+    pd.testing.assert_frame_equal(pps, baseline.remove_pps_outliers(dataframe))
+
+    bhk = remove_bhk_outliers(pps)
+    pd.testing.assert_frame_equal(bhk, baseline.remove_bhk_outliers(pps))
+    assert 0 < len(bhk) < len(pps) < len(dataframe)
+
+
+def test_bhk_outliers_need_more_than_five_smaller_apartments():
+    # 5 two bedroom flats are not enough to judge the three bedroom ones, 6 are
+    def frame(n_two_bhk):
+        return pd.DataFrame({"location": ["a"] * (n_two_bhk + 1),
+                             "no_of_BHK": [2] * n_two_bhk + [3],
+                             "price_per_sqft": [5000.0] * n_two_bhk + [4000.0]})
+
+    assert len(remove_bhk_outliers(frame(5))) == 6
+    assert 3 not in remove_bhk_outliers(frame(6))["no_of_BHK"].tolist()
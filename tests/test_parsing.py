@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from HPP.utils.main_utils import (SQFT_UNIT_CONVERSION, parse_bhk_value, parse_no_of_bhk, parse_sqft_value,
+                                  parse_total_sqft)
+from tests import baseline
+from tests.datasets import load_raw
+
+SQFT_CASES = [
+    ("1056", 1056.0),
+    ("1200.5", 1200.5),
+    (" 850 ", 850.0),
+    ("2100 - 2850", 2475.0),
+    ("1000-1200", 1100.0),
+    ("34.46Sq. Meter", 34.46 * SQFT_UNIT_CONVERSION["sqmeter"]),
+    ("151.11Sq. Yards", 151.11 * SQFT_UNIT_CONVERSION["sqyards"]),
+    ("5.31Acres", 5.31 * SQFT_UNIT_CONVERSION["acres"]),
+    ("30Acres", 30 * SQFT_UNIT_CONVERSION["acres"]),
+    ("1500Cents", 1500 * SQFT_UNIT_CONVERSION["cents"]),
+    ("3Guntha", 3 * SQFT_UNIT_CONVERSION["guntha"]),
+    ("1Grounds", 1 * SQFT_UNIT_CONVERSION["grounds"]),
+    ("4125Perch", 4125 * SQFT_UNIT_CONVERSION["perch"]),
+    ("1100 - 1200 Sq. Meter", 1150 * SQFT_UNIT_CONVERSION["sqmeter"]),
+    ("1000Sq. Furlong", np.nan),
+    ("about 1000", np.nan),
+    ("1000 - ", np.nan),
+    ("", np.nan),
+    ("abc", np.nan),
+    (None, np.nan),
+    (np.nan, np.nan),
+]
+
+BHK_CASES = [
+    ("2 BHK", 2),
+    ("4 Bedroom", 4),
+    ("1 RK", 1),
+    ("11 BHK", 11),
+    ("BHK", np.nan),
+    ("", np.nan),
+    (None, np.nan),
+    (np.nan, np.nan),
+]
+
+
+def test_every_unit_is_covered():
+    units = {"".join(c for c in value.lower() if c.isalpha()) for value, _ in SQFT_CASES if isinstance(value, str)}
+    assert set(SQFT_UNIT_CONVERSION) <= units
+
+
+@pytest.mark.parametrize("value,expected", SQFT_CASES)
+def test_parse_total_sqft(value, expected):
+    parsed = parse_total_sqft(pd.Series([value, value], dtype=object))
+    assert parsed.dtype == float
+    np.testing.assert_allclose(parsed.to_numpy(), [expected, expected])
+    np.testing.assert_allclose(parse_sqft_value(value), expected)
+
+
+@pytest.mark.parametrize("value,expected", BHK_CASES)
+def test_parse_no_of_bhk(value, expected):
+    parsed = parse_no_of_bhk(pd.Series([value, "3 BHK"], dtype=object))
+    np.testing.assert_array_equal(parsed.to_numpy(), [expected, 3])
+    np.testing.assert_array_equal(parse_bhk_value(value), expected)
+
+
+def test_parse_no_of_bhk_keeps_integers_and_index():
+    size = pd.Series(["2 BHK", "4 Bedroom", "2 BHK"], index=[10, 5, 7])
+    parsed = parse_no_of_bhk(size)
+    assert parsed.dtype == np.int64
+    assert parsed.index.tolist() == [10, 5, 7]
+    assert parsed.tolist() == [2, 4, 2]
+    assert parse_no_of_bhk(pd.Series(["2 BHK", None])).dtype == float
+
+
+def test_parsing_matches_per_row_implementation_on_dataset():
+    raw = load_raw().dropna(subset=["size", "total_sqft"])
+
+    expected = raw["total_sqft"].apply(baseline.convert_sqft_to_num).astype(float)
+    parsed = parse_total_sqft(raw["total_sqft"])
+    # the per row conversion gave up on unit suffixes, every other value has to agree
+    known = expected.notna()
+    pd.testing.assert_series_equal(parsed[known], expected[known])
+    assert parsed[~known].notna().sum() > 0
+
+    pd.testing.assert_series_equal(parse_no_of_bhk(raw["size"]), baseline.parse_no_of_bhk(raw["size"]),
+                                   check_names=False)
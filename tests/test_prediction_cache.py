@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from HPP.constants import SERVING_MODEL_FORMAT_PICKLE
+from HPP.entity import model_registry as model_registry_module
+from HPP.entity.config_entity import HPPredictorConfig, PredictionCacheConfig
+from HPP.pipeline import prediction_cache as prediction_cache_module
+from HPP.pipeline.prediction_cache import PredictionCache, get_prediction_cache, make_cache_key
+from HPP.pipeline.prediction_pipeline import HppClassifier
+
+RECORD = {"location": "Whitefield", "size": "2 BHK", "total_sqft": "1200", "bath": 2.0}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def make_cache(max_size: int = 3, ttl_seconds: float = 60) -> PredictionCache:
+    return PredictionCache(PredictionCacheConfig(enabled=True, max_size=max_size, ttl_seconds=ttl_seconds))
+
+
+def test_equivalent_inputs_share_a_key():
+    key = make_cache_key(RECORD, "v1")
+    assert make_cache_key({"location": "Whitefield", "no_of_BHK": "2.0", "total_sqft": 1200.0, "bath": "2"}, "v1") == key
+    assert make_cache_key(RECORD, "v2") != key
+    # NaN inputs still find their entry
+    missing_bath = {**RECORD, "bath": np.nan}
+    assert make_cache_key(missing_bath, "v1") == make_cache_key({**RECORD, "bath": None}, "v1")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    prediction_cache = make_cache(ttl_seconds=60)
+    prediction_cache.put("a", 1.0)
+    clock.now += 59
+    assert prediction_cache.get("a") == 1.0
+    clock.now += 2
+    assert prediction_cache.get("a") is None
+    metrics = prediction_cache.metrics()
+    assert (metrics["hits_total"], metrics["misses_total"], metrics["expirations_total"], metrics["size"]) == (1, 1, 1, 0)
+
+
+def test_zero_ttl_never_expires(clock):
+    prediction_cache = make_cache(ttl_seconds=0)
+    prediction_cache.put("a", 1.0)
+    clock.now += 10 ** 9
+    assert prediction_cache.get("a") == 1.0
+
+
+def test_least_recently_used_entry_is_evicted():
+    prediction_cache = make_cache(max_size=3)
+    prediction_cache.put_many(["a", "b", "c"], [1.0, 2.0, 3.0])
+    assert prediction_cache.get("a") == 1.0
+    prediction_cache.put("d", 4.0)
+    assert prediction_cache.get_many(["a", "b", "c", "d"]) == [1.0, None, 3.0, 4.0]
+    assert prediction_cache.metrics()["evictions_total"] == 1 and prediction_cache.metrics()["size"] == 3
+
+
+def test_disabled_cache():
+    assert not PredictionCache(PredictionCacheConfig(enabled=False, max_size=10, ttl_seconds=60)).enabled
+    assert not PredictionCache(PredictionCacheConfig(enabled=True, max_size=0, ttl_seconds=60)).enabled
+
+
+class FakeModel:
+    """
+    Predicts total_sqft times the price of its version, counting the rows it predicted
+    """
+    def __init__(self, price: float):
+        self.price = price
+        self.rows = 0
+
+    def warmup(self) -> None:
+        pass
+
+    def transform(self, dataframe: pd.DataFrame) -> np.ndarray:
+        return dataframe["total_sqft"].astype(float).to_numpy()
+
+    def predict_transformed(self, transformed_feature: np.ndarray) -> np.ndarray:
+        self.rows += len(transformed_feature)
+        return transformed_feature * self.price
+
+    def lookup_record(self, record: dict):
+        return None
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        return np.array([float(record["total_sqft"])])
+
+
+class FakeEstimator:
+    def __init__(self):
+        self.version = "v1"
+        self.model_path = "model.pkl"
+        self.bucket_name = "hpp-test"
+        self.models = {}
+
+    def get_model_version(self):
+        return self.version
+
+    def load_model(self, version=None):
+        return self.models.setdefault(version, FakeModel(price=float(len(self.models) + 1)))
+
+
+@pytest.fixture
+def process_wide(monkeypatch):
+    """
+    Process wide model registry and prediction cache, the registry serving FakeModels
+    """
+    monkeypatch.setattr(prediction_cache_module, "_prediction_cache",
+                        make_cache(max_size=100, ttl_seconds=60))
+    monkeypatch.setattr(model_registry_module, "_model_registry", None)
+    monkeypatch.setenv("AWS_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    with mock_aws():
+        model_registry = model_registry_module.get_model_registry()
+    estimator = FakeEstimator()
+    model_registry.estimator = estimator
+    model_registry.prediction_pipeline_config = HPPredictorConfig(model_format=SERVING_MODEL_FORMAT_PICKLE)
+    return model_registry, estimator
+
+
+def test_new_model_version_invalidates_the_cache(process_wide):
+    model_registry, estimator = process_wide
+    hpp_classifier = HppClassifier(model_registry=model_registry)
+    dataframe = pd.DataFrame([RECORD, {**RECORD, "total_sqft": "1500"}, RECORD])
+
+    np.testing.assert_array_equal(hpp_classifier.predict(dataframe), [1200.0, 1500.0, 1200.0])
+    assert hpp_classifier.predict_record(RECORD) == 1200.0
+    first_model = estimator.models["v1"]
+    # the repeated row of the first batch is a miss too, only the later lookups hit
+    assert first_model.rows == 3
+    assert get_prediction_cache().metrics()["hits_total"] == 1
+
+    estimator.version = "v2"
+    assert model_registry.refresh() is True
+    assert get_prediction_cache().metrics()["size"] == 0
+    assert get_prediction_cache().metrics()["invalidations_total"] == 2
+    np.testing.assert_array_equal(hpp_classifier.predict(dataframe), [2400.0, 3000.0, 2400.0])
+    assert hpp_classifier.predict_record(RECORD) == 2400.0
+    assert first_model.rows == 3
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+from catboost import CatBoostRegressor
+
+from HPP.entity.estimator import HPPModel
+from HPP.entity.feature_encoder import FeatureEncoder
+from HPP.entity.price_lookup_table import PriceLookupTable
+from HPP.entity.tree_ensemble import compile_tree_ensemble
+from tests.datasets import fit_hpp_model
+
+BHK_RANGE = (1, 4)
+BATH_RANGE = (1, 4)
+SQFT_RANGE = (1.0, 100000.0)
+LOCATIONS = ["Whitefield", "Hebbal", "a location never seen"]
+
+
+@pytest.fixture(scope="module", params=["xgboost", "catboost"])
+def hpp_model(request) -> HPPModel:
+    return fit_hpp_model(request.param)
+
+
+@pytest.fixture(scope="module")
+def lookup_table(hpp_model) -> PriceLookupTable:
+    # built the way ModelPusher.build_lookup_table builds it
+    tree_ensemble = compile_tree_ensemble(hpp_model.trained_model_object)
+    feature_encoder = FeatureEncoder.from_hpp_model(hpp_model)
+    feature_encoder.zero_as_missing = tree_ensemble.sparse_missing_as_nan
+    return PriceLookupTable.build(feature_encoder, tree_ensemble, predict_fn=hpp_model.trained_model_object.predict,
+                                  bhk_range=BHK_RANGE, bath_range=BATH_RANGE, sqft_range=SQFT_RANGE)
+
+
+def model_prices(hpp_model: HPPModel, records: list) -> np.ndarray:
+    return hpp_model.predict(pd.DataFrame(records))
+
+
+def raw_sqft(lookup_table: PriceLookupTable, scaled_sqft: np.float32) -> float:
+    # the total_sqft the table and the preprocessor scale back to exactly scaled_sqft
+    sqft = float(scaled_sqft) * lookup_table._scale_block["scale"][lookup_table._sqft_position] \
+        + lookup_table._scale_block["mean"][lookup_table._sqft_position]
+    assert np.float32(lookup_table._scale("total_sqft", sqft)) == scaled_sqft
+    return sqft
+
+
+def test_split_convention_follows_the_library(hpp_model, lookup_table):
+    assert lookup_table.less_equal == isinstance(hpp_model.trained_model_object, CatBoostRegressor)
+    assert len(lookup_table.thresholds) > 10
+    assert np.all(np.diff(lookup_table.thresholds) > 0)
+
+
+def test_lookup_matches_model_at_and_around_every_threshold(hpp_model, lookup_table):
+    records = []
+    for threshold in lookup_table.thresholds:
+        for scaled_sqft in (np.nextafter(threshold, np.float32(-np.inf)), threshold,
+                            np.nextafter(threshold, np.float32(np.inf))):
+            sqft = raw_sqft(lookup_table, scaled_sqft)
+            if not SQFT_RANGE[0] <= sqft <= SQFT_RANGE[1] or scaled_sqft == 0:
+                continue
+            for location, bhk, bath in zip(LOCATIONS, (2, 3, 4), (2.0, 3.0, 1.0)):
+                records.append({"location": location, "no_of_BHK": bhk, "total_sqft": sqft, "bath": bath})
+    assert len(records) > 30
+
+    looked_up = np.array([lookup_table.lookup(record) for record in records], dtype=float)
+    assert not np.isnan(looked_up).any()
+    np.testing.assert_allclose(looked_up, model_prices(hpp_model, records), rtol=1e-5, atol=1e-3)
+
+
+def test_lookup_matches_model_on_random_records(hpp_model, lookup_table):
+    random = np.random.RandomState(0)
+    locations = sorted(lookup_table.feature_encoder.location_mapping)
+    records = pd.DataFrame({"location": random.choice(locations, size=300),
+                            "no_of_BHK": random.randint(BHK_RANGE[0], BHK_RANGE[1] + 1, size=300),
+                            "total_sqft": random.uniform(300, 5000, size=300).round(0),
+                            "bath": random.randint(BATH_RANGE[0], BATH_RANGE[1] + 1, size=300).astype(float)})
+    records = records.to_dict("records")
+    looked_up = np.array([lookup_table.lookup(record) for record in records], dtype=float)
+    np.testing.assert_allclose(looked_up, model_prices(hpp_model, records), rtol=1e-5, atol=1e-3)
+
+
+def test_records_outside_the_grid_are_not_answered(lookup_table):
+    record = {"location": "Whitefield", "no_of_BHK": 2, "total_sqft": 1200, "bath": 2.0}
+    assert lookup_table.lookup(record) is not None
+    for key, value in (("no_of_BHK", BHK_RANGE[1] + 1), ("no_of_BHK", 2.5), ("bath", BATH_RANGE[0] - 1),
+                       ("bath", 1.5), ("total_sqft", SQFT_RANGE[1] * 2), ("total_sqft", "garbage"),
+                       ("bath", None)):
+        assert lookup_table.lookup({**record, key: value}) is None
+
+
+def test_unseen_locations(lookup_table):
+    record = {"location": "a location never seen", "no_of_BHK": 2, "total_sqft": 1200, "bath": 2.0}
+    other = lookup_table.lookup({**record, "location": lookup_table.feature_encoder.other_location})
+    assert lookup_table.lookup(record) == other
+
+    # a bucket the cleaner learned but the preprocessor never saw, e.g. all its rows were outliers
+    lookup_table.feature_encoder.location_mapping["Nowhere Nagar"] = "Nowhere Nagar"
+    try:
+        assert lookup_table.lookup({**record, "location": "Nowhere Nagar"}) is None
+    finally:
+        del lookup_table.feature_encoder.location_mapping["Nowhere Nagar"]
+
+
+def test_compact_dtypes_survive_npz_round_trip(lookup_table, tmp_path):
+    assert lookup_table.breakpoints.dtype == (np.uint8 if len(lookup_table.thresholds) < 2 ** 8 else np.uint16)
+    assert lookup_table.thresholds.dtype == np.float32 and lookup_table.prices.dtype == np.float32
+
+    np.savez(tmp_path / "lookup.npz", **lookup_table.get_arrays(prefix="lookup_"))
+    with np.load(tmp_path / "lookup.npz", allow_pickle=False) as arrays:
+        loaded = PriceLookupTable.from_arrays(arrays, prefix="lookup_")
+    for name in ("thresholds", "offsets", "breakpoints", "prices"):
+        assert getattr(loaded, name).dtype == getattr(lookup_table, name).dtype
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(lookup_table, name))
+    assert (loaded.bhk_range, loaded.bath_range, loaded.sqft_range, loaded.less_equal) == \
+        (lookup_table.bhk_range, lookup_table.bath_range, lookup_table.sqft_range, lookup_table.less_equal)
+
+    records = [{"location": "Hebbal", "no_of_BHK": bhk, "total_sqft": sqft, "bath": 2.0}
+               for bhk in range(1, 5) for sqft in (450, 1200, 2500)]
+    assert [loaded.lookup(record) for record in records] == [lookup_table.lookup(record) for record in records]
+
+
+def test_wide_threshold_index_uses_uint16(lookup_table):
+    thresholds = np.arange(300, dtype=np.float32)
+    table = PriceLookupTable(lookup_table.feature_encoder, BHK_RANGE, BATH_RANGE, SQFT_RANGE, thresholds=thresholds,
+                             offsets=np.zeros(1), breakpoints=np.array([299]), prices=np.zeros(0), less_equal=False)
+    assert table.breakpoints.dtype == np.uint16 and table.breakpoints[0] == 299
@@ -0,0 +1,87 @@
+import logging
+import os
+
+import pytest
+
+from HPP.entity.config_entity import LoggingConfig
+from HPP.logger.queue_logging import LogPipeline
+
+
+def make_record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("root", level, __file__, 1, message, None, None)
+
+
+@pytest.fixture
+def log_pipeline(tmp_path):
+    # records are handed to the queue handler, the root logger keeps the pipeline of the HPP logger
+    log_pipeline = LogPipeline(str(tmp_path / "hpp.log"), LoggingConfig(level="INFO", module_levels="",
+                                                                        log_format="text", sampled_modules=(),
+                                                                        sample_rate=1, queue_size=1000))
+    yield log_pipeline
+    log_pipeline.stop()
+
+
+def start_listener(log_pipeline: LogPipeline) -> None:
+    with log_pipeline._lock:
+        log_pipeline._start_listener()
+
+
+def read_log(log_pipeline: LogPipeline) -> str:
+    with open(log_pipeline.log_file_path) as file:
+        return file.read()
+
+
+def test_stop_is_safe_before_start_and_twice(log_pipeline):
+    log_pipeline.stop()
+    start_listener(log_pipeline)
+    log_pipeline.queue_handler.handle(make_record("queued before stop"))
+    log_pipeline.stop()
+    log_pipeline.stop()
+    assert log_pipeline.listener is None
+    assert "queued before stop" in read_log(log_pipeline)
+
+
+def test_restart_after_fork_opens_a_new_file_handler(log_pipeline):
+    start_listener(log_pipeline)
+    parent_handler = log_pipeline.file_handler
+    parent_queue = log_pipeline.queue_handler.queue
+
+    log_pipeline.restart_after_fork()
+    assert log_pipeline.file_handler is not parent_handler
+    assert log_pipeline.file_handler.baseFilename == parent_handler.baseFilename
+    assert log_pipeline.file_handler.formatter is parent_handler.formatter
+    assert log_pipeline.queue_handler.queue is not parent_queue
+    assert log_pipeline.listener.handlers == (log_pipeline.file_handler,)
+
+    log_pipeline.queue_handler.handle(make_record("logged by the child"))
+    log_pipeline.stop()
+    assert "logged by the child" in read_log(log_pipeline)
+    parent_handler.close()
+
+
+def test_restart_after_fork_without_listener_stays_stopped(log_pipeline):
+    file_handler = log_pipeline.file_handler
+    log_pipeline.restart_after_fork()
+    assert log_pipeline.listener is None and log_pipeline.file_handler is file_handler
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_writes_through_its_own_listener(log_pipeline):
+    start_listener(log_pipeline)
+    log_pipeline.queue_handler.handle(make_record("logged by the parent"))
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            log_pipeline.restart_after_fork()
+            log_pipeline.queue_handler.handle(make_record("logged by the child"))
+            log_pipeline.stop()
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    log_pipeline.stop()
+    lines = read_log(log_pipeline).splitlines()
+    assert sum("logged by the parent" in line for line in lines) == 1
+    assert sum("logged by the child" in line for line in lines) == 1
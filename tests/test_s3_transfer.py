@@ -0,0 +1,110 @@
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from HPP.cloud_storage.s3_transfer import SKIPPED, UPLOADED, S3TransferManager, normalize_etag
+from HPP.entity.config_entity import S3TransferConfig
+from HPP.exception import CustomException
+
+BUCKET_NAME = "hpp-test"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    for name, value in {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                        "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
+
+
+@pytest.fixture
+def transfer(s3_client) -> S3TransferManager:
+    # 5 MB is the smallest part s3 accepts
+    return S3TransferManager(s3_client, S3TransferConfig(multipart_threshold_mb=5, multipart_chunk_size_mb=5,
+                                                         max_concurrency=4, verify_checksums=True))
+
+
+@pytest.fixture
+def large_file(tmp_path) -> str:
+    file_path = str(tmp_path / "model.pkl")
+    with open(file_path, "wb") as file:
+        file.write(os.urandom(12 * MB + 123))
+    return file_path
+
+
+def test_multipart_upload_etag_matches_hash_file(transfer, s3_client, large_file):
+    etag, _ = transfer.hash_file(large_file)
+    assert etag.endswith("-3")
+
+    assert transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl") == UPLOADED
+    head = s3_client.head_object(Bucket=BUCKET_NAME, Key="model/model.pkl")
+    assert normalize_etag(head["ETag"]) == etag
+
+
+def test_unchanged_file_is_not_uploaded_again(transfer, tmp_path, large_file):
+    assert transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl", skip_unchanged=True) == UPLOADED
+    assert transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl", skip_unchanged=True) == SKIPPED
+
+    with open(large_file, "ab") as file:
+        file.write(b"changed")
+    assert transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl", skip_unchanged=True) == UPLOADED
+
+    artifact_dir = tmp_path / "artifact"
+    (artifact_dir / "nested").mkdir(parents=True)
+    (artifact_dir / "report.yaml").write_text("r2: 0.82")
+    (artifact_dir / "nested" / "model.npz").write_bytes(b"\x00" * 1024)
+    assert set(transfer.upload_directory(str(artifact_dir), BUCKET_NAME, "run/").values()) == {UPLOADED}
+    assert transfer.upload_directory(str(artifact_dir), BUCKET_NAME, "run/") == {"run/report.yaml": SKIPPED,
+                                                                                 "run/nested/model.npz": SKIPPED}
+
+
+def test_ranged_download_is_byte_identical(transfer, tmp_path, large_file):
+    transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl")
+    download_path = str(tmp_path / "download" / "model.pkl")
+
+    head = transfer.download_file(BUCKET_NAME, "model/model.pkl", download_path)
+    with open(large_file, "rb") as expected, open(download_path, "rb") as downloaded:
+        assert downloaded.read() == expected.read()
+    assert head["ContentLength"] == os.path.getsize(large_file)
+    assert os.listdir(os.path.dirname(download_path)) == ["model.pkl"]
+
+
+def test_tampered_checksum_is_rejected_without_a_file(transfer, s3_client, tmp_path, large_file):
+    transfer.upload_file(large_file, BUCKET_NAME, "model/model.pkl")
+    metadata_key = transfer.s3_transfer_config.checksum_metadata_key
+    s3_client.copy_object(Bucket=BUCKET_NAME, Key="model/model.pkl", MetadataDirective="REPLACE",
+                          CopySource={"Bucket": BUCKET_NAME, "Key": "model/model.pkl"},
+                          Metadata={metadata_key: "0" * 64})
+    download_dir = tmp_path / "download"
+
+    with pytest.raises(CustomException, match="Checksum mismatch"):
+        transfer.download_file(BUCKET_NAME, "model/model.pkl", str(download_dir / "model.pkl"))
+    assert os.listdir(download_dir) == []
+
+
+def test_directory_files_are_uploaded_without_nested_threads(transfer, s3_client, tmp_path, large_file, monkeypatch):
+    artifact_dir = tmp_path / "artifact"
+    artifact_dir.mkdir()
+    for name in ("model.pkl", "preprocessing.pkl", "cleaner.pkl"):
+        os.link(large_file, artifact_dir / name)
+    configs = []
+    upload_file = s3_client.upload_file
+
+    def recording_upload_file(*args, Config=None, **kwargs):
+        configs.append(Config)
+        return upload_file(*args, Config=Config, **kwargs)
+
+    monkeypatch.setattr(s3_client, "upload_file", recording_upload_file)
+    assert set(transfer.upload_directory(str(artifact_dir), BUCKET_NAME, "run").values()) == {UPLOADED}
+    assert len(configs) == 3
+    assert all(not config.use_threads and config.max_concurrency == 1 for config in configs)
+    # same parts as single file uploads, so the multipart ETags still verify
+    assert {config.multipart_chunksize for config in configs} == {transfer.transfer_config.multipart_chunksize}
+    head = s3_client.head_object(Bucket=BUCKET_NAME, Key="run/model.pkl")
+    assert normalize_etag(head["ETag"]) == transfer.hash_file(large_file)[0]
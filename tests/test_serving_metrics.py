@@ -0,0 +1,19 @@
+from HPP.entity.config_entity import ServingMetricsConfig
+from HPP.pipeline.serving_metrics import ServingMetrics
+
+
+def failing_source() -> dict:
+    raise RuntimeError("no AWS credentials")
+
+
+def test_failing_source_renders_nothing():
+    serving_metrics = ServingMetrics(ServingMetricsConfig())
+    serving_metrics.add_source("model_registry", failing_source)
+    serving_metrics.add_source("prediction_cache", lambda: {"size": 3, "hit_ratio": 0.5, "enabled": True})
+
+    rendered = serving_metrics.render()
+    namespace = serving_metrics.serving_metrics_config.namespace
+    assert f"{namespace}_model_registry" not in rendered
+    assert f"{namespace}_prediction_cache_size 3\n" in rendered
+    assert f"{namespace}_prediction_cache_hit_ratio 0.5\n" in rendered
+    assert f"{namespace}_requests_in_flight 0\n" in rendered
@@ -0,0 +1,131 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from HPP.constants import (SERVING_MODEL_DEFAULT_FORMAT, SERVING_MODEL_FORMAT_AUTO, SERVING_MODEL_FORMAT_NPZ,
+                           SERVING_MODEL_FORMAT_PICKLE)
+from HPP.entity.config_entity import HPPredictorConfig
+from HPP.entity.estimator import HPPModel
+from HPP.entity.model_registry import ModelRegistry
+from HPP.entity.serving_model import ServingModel
+from HPP.entity.tree_ensemble import compile_tree_ensemble
+from tests.datasets import ROOT_DIR, fit_hpp_model
+
+MAX_BATCH_ROWS = 8
+RECORDS = [{"location": "Whitefield", "no_of_BHK": 2, "total_sqft": "1100 - 1300", "bath": 2.0},
+           {"location": "a location never seen", "no_of_BHK": 3, "total_sqft": "1650", "bath": 3.0},
+           {"location": "Hebbal", "no_of_BHK": 9, "total_sqft": "4200", "bath": 8.0}]
+
+
+@pytest.fixture(scope="module")
+def hpp_model() -> HPPModel:
+    return fit_hpp_model("xgboost")
+
+
+@pytest.fixture(scope="module")
+def serving_model_path(hpp_model, tmp_path_factory) -> str:
+    tree_ensemble = compile_tree_ensemble(hpp_model.trained_model_object)
+    tree_ensemble.max_batch_rows = MAX_BATCH_ROWS
+    file_path = str(tmp_path_factory.mktemp("serving") / "serving_model.npz")
+    ServingModel.from_hpp_model(hpp_model, tree_ensemble).save(file_path)
+    return file_path
+
+
+def make_batch(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame((RECORDS * n_rows)[:n_rows])
+
+
+class CountingLoader:
+    def __init__(self, hpp_model: HPPModel = None):
+        self.hpp_model = hpp_model
+        self.calls = 0
+
+    def __call__(self) -> HPPModel:
+        self.calls += 1
+        if self.hpp_model is None:
+            raise Exception("no pickled model published")
+        return self.hpp_model
+
+
+def test_npz_loads_and_predicts_without_sklearn(hpp_model, serving_model_path):
+    script = f"""
+import json, sys
+import pandas as pd
+from HPP.entity.serving_model import ServingModel
+model = ServingModel.load({serving_model_path!r})
+records = {RECORDS!r}
+predictions = model.predict(pd.DataFrame(records)).tolist() + [model.predict_record(record) for record in records]
+print(json.dumps({{"predictions": predictions,
+                  "modules": [name for name in ("sklearn", "xgboost", "catboost") if name in sys.modules]}}))
+"""
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    assert result["modules"] == []
+    expected = hpp_model.predict(pd.DataFrame(RECORDS))
+    np.testing.assert_allclose(result["predictions"], np.concatenate([expected, expected]), rtol=1e-5)
+
+
+def test_large_batches_go_to_the_pickled_model(hpp_model, serving_model_path):
+    serving_model = ServingModel.load(serving_model_path)
+    loader = CountingLoader(hpp_model)
+    serving_model.batch_model_loader = loader
+    for n_rows in (1, MAX_BATCH_ROWS):
+        batch = make_batch(n_rows)
+        np.testing.assert_allclose(serving_model.predict_transformed(serving_model.transform(batch)),
+                                   hpp_model.predict(batch), rtol=1e-5)
+    assert loader.calls == 0
+
+    for _ in range(2):
+        batch = make_batch(MAX_BATCH_ROWS + 1)
+        assert serving_model.transform(batch).shape[0] == MAX_BATCH_ROWS + 1
+        np.testing.assert_array_equal(serving_model.predict(batch), hpp_model.predict(batch))
+    assert loader.calls == 1
+
+
+def test_batch_model_failing_to_load_leaves_the_trees(hpp_model, serving_model_path):
+    serving_model = ServingModel.load(serving_model_path)
+    loader = CountingLoader()
+    serving_model.batch_model_loader = loader
+    batch = make_batch(50)
+    for _ in range(2):
+        np.testing.assert_allclose(serving_model.predict(batch), hpp_model.predict(batch), rtol=1e-5)
+    assert loader.calls == 1
+
+
+class FakeEstimator:
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self.model_path = "model"
+
+    def get_model_version(self):
+        return self.version
+
+    def load_model(self, version=None):
+        return self.model
+
+
+@pytest.mark.parametrize("model_format", [SERVING_MODEL_FORMAT_AUTO, SERVING_MODEL_FORMAT_NPZ, SERVING_MODEL_FORMAT_PICKLE])
+def test_registry_serves_npz_with_pickled_batch_model_by_default(hpp_model, serving_model_path, model_format,
+                                                                 monkeypatch):
+    assert SERVING_MODEL_DEFAULT_FORMAT == SERVING_MODEL_FORMAT_AUTO
+    monkeypatch.setenv("AWS_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    with mock_aws():
+        model_registry = ModelRegistry(HPPredictorConfig(model_format=model_format))
+    model_registry.estimator = FakeEstimator(hpp_model, "pickle-version")
+    model_registry.serving_estimator = FakeEstimator(ServingModel.load(serving_model_path), "npz-version")
+
+    model, version = model_registry.get_model_and_version()
+    if model_format == SERVING_MODEL_FORMAT_PICKLE:
+        assert model is hpp_model and version == "pickle-version"
+        return
+    assert isinstance(model, ServingModel) and version == "npz-version"
+    batch = make_batch(MAX_BATCH_ROWS + 1)
+    model.predict(batch)
+    assert (model._batch_model is hpp_model) == (model_format == SERVING_MODEL_FORMAT_AUTO)
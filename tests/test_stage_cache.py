@@ -0,0 +1,134 @@
+import importlib.util
+import os
+
+import pytest
+
+from HPP.entity.artifact_entity import DataIngestionArtifact
+from HPP.entity.config_entity import DataTransformationConfig, StageCacheConfig
+from HPP.pipeline.stage_cache import CACHE_HIT, CACHE_MISS, StageCache
+
+
+def make_cache(root, run: str, max_size_mb: float = 100) -> StageCache:
+    artifact_root_dir = str(root / "artifact")
+    cache_dir = os.path.join(artifact_root_dir, "stage_cache")
+    return StageCache(StageCacheConfig(enabled=True, artifact_root_dir=artifact_root_dir,
+                                       current_artifact_dir=os.path.join(artifact_root_dir, run),
+                                       cache_dir=cache_dir, index_file_path=os.path.join(cache_dir, "index.yaml"),
+                                       report_file_path=os.path.join(artifact_root_dir, run, "stage_cache.yaml"),
+                                       keep_dirs=(cache_dir,), max_size_mb=max_size_mb))
+
+
+def write(file_path: str, content: bytes) -> str:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as file:
+        file.write(content)
+    return file_path
+
+
+def load_module(file_path: str):
+    spec = importlib.util.spec_from_file_location("stage_dependency", file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Stage:
+    """
+    Builds an ingestion artifact in the run directory of its cache and counts the builds
+    """
+    def __init__(self, cache: StageCache, size: int = 10):
+        self.cache = cache
+        self.size = size
+        self.builds = 0
+
+    def build(self) -> DataIngestionArtifact:
+        self.builds += 1
+        run_dir = self.cache.stage_cache_config.current_artifact_dir
+        return DataIngestionArtifact(train_file_path=write(os.path.join(run_dir, "train.parquet"), b"t" * self.size),
+                                     test_file_path=write(os.path.join(run_dir, "test.parquet"), b"t" * self.size),
+                                     feature_store_path=write(os.path.join(run_dir, "HPP.parquet"), b"f" * self.size))
+
+    def run(self, input_file: str, params: dict = None, dependencies=()) -> DataIngestionArtifact:
+        return self.cache.run_stage("data_ingestion", files=[input_file], params=params or {"ratio": 0.2},
+                                    artifact_cls=DataIngestionArtifact, build_fn=self.build, component=Stage,
+                                    dependencies=dependencies)
+
+
+@pytest.fixture
+def input_file(tmp_path) -> str:
+    return write(str(tmp_path / "input.csv"), b"location,price\nHebbal,80\n")
+
+
+def test_unchanged_stage_is_a_hit_in_the_next_run(tmp_path, input_file):
+    first = Stage(make_cache(tmp_path, "run1"))
+    built = first.run(input_file)
+
+    second = Stage(make_cache(tmp_path, "run2"))
+    reused = second.run(input_file)
+    assert reused == built and second.builds == 0
+    assert second.cache.report["data_ingestion"]["status"] == CACHE_HIT
+    assert second.cache.write_report()["hits"] == 1
+
+
+@pytest.mark.parametrize("change", ["input", "params", "dependency"])
+def test_changed_input_params_or_dependency_is_a_miss(tmp_path, input_file, change):
+    dependency = load_module(write(str(tmp_path / "dependency.py"), b"THRESHOLD = 300\n"))
+    Stage(make_cache(tmp_path, "run1")).run(input_file, dependencies=(dependency,))
+
+    params = {"ratio": 0.2}
+    if change == "input":
+        write(input_file, b"location,price\nHebbal,85\n")
+    elif change == "params":
+        params = {"ratio": 0.3}
+    else:
+        write(dependency.__file__, b"THRESHOLD = 400\n")
+    stage = Stage(make_cache(tmp_path, "run2"))
+    stage.run(input_file, params=params, dependencies=(dependency,))
+    assert stage.builds == 1 and stage.cache.report["data_ingestion"]["status"] == CACHE_MISS
+
+
+def test_artifact_with_missing_files_is_rebuilt(tmp_path, input_file):
+    built = Stage(make_cache(tmp_path, "run1")).run(input_file)
+    os.remove(built.test_file_path)
+
+    stage = Stage(make_cache(tmp_path, "run2"))
+    rebuilt = stage.run(input_file)
+    assert stage.builds == 1 and rebuilt.test_file_path.startswith(stage.cache.stage_cache_config.current_artifact_dir)
+    assert stage.cache.report["data_ingestion"]["status"] == CACHE_MISS
+
+
+def test_eviction_removes_least_recently_used_runs_but_keeps_reused_ones(tmp_path, input_file):
+    # every run holds 3 files of 200 kB, the limit fits two runs
+    limit_mb = 1.3
+    for run, content in (("run1", b"a"), ("run2", b"b"), ("run3", b"c")):
+        write(input_file, content)
+        Stage(make_cache(tmp_path, run, limit_mb), size=200 * 1024).run(input_file)
+
+    # run4 reuses the artifact of run1, so run2 is the least recently used one
+    write(input_file, b"a")
+    cache = make_cache(tmp_path, "run4", limit_mb)
+    stage = Stage(cache, size=200 * 1024)
+    stage.run(input_file)
+    assert stage.builds == 0
+    removed = cache.evict()
+
+    artifact_root_dir = cache.stage_cache_config.artifact_root_dir
+    assert removed == [os.path.join(artifact_root_dir, "run2")]
+    assert sorted(os.listdir(artifact_root_dir)) == ["run1", "run3", "stage_cache"]
+    # the evicted artifact is gone from the index as well
+    write(input_file, b"b")
+    stage = Stage(make_cache(tmp_path, "run5", limit_mb))
+    stage.run(input_file)
+    assert stage.builds == 1
+
+
+def test_config_params_do_not_depend_on_the_run_directory(tmp_path):
+    def params(run: str) -> dict:
+        cache = make_cache(tmp_path, run)
+        run_dir = cache.stage_cache_config.current_artifact_dir
+        config = DataTransformationConfig(data_transformation_dir=os.path.join(run_dir, "transformation"),
+                                          transformed_train_file_path=os.path.join(run_dir, "transformation", "train.npz"))
+        return cache.config_params(config)
+
+    assert params("run1") == params("run2")
+    assert params("run1")["transformed_train_file_path"] == os.path.join("transformation", "train.npz")
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import pytest
+
+from HPP.entity.config_entity import StageProfilerConfig
+from HPP.pipeline.stage_profiler import PEAK_RSS_PROCESS, PEAK_RSS_STEP, StageProfiler, files_size
+from HPP.utils.main_utils import read_yaml
+
+
+def make_profiler(tmp_path, profile_steps: tuple = (), enabled: bool = True) -> StageProfiler:
+    return StageProfiler(StageProfilerConfig(enabled=enabled, report_file_path=str(tmp_path / "stage_profile.yaml"),
+                                             profile_dir=str(tmp_path / "profiles"), profile_steps=profile_steps,
+                                             profile_top_functions=5))
+
+
+def busy(seconds: float) -> None:
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+
+def test_report_holds_nested_steps_with_their_counts(tmp_path):
+    stage_profiler = make_profiler(tmp_path)
+    stage_profiler.start_run()
+    with stage_profiler.step("data_transformation", rows=10):
+        stage_profiler.record(rows=5, bytes=100)
+        with stage_profiler.step("cleaning"):
+            busy(0.05)
+            stage_profiler.record(rows=7)
+        stage_profiler.record(bytes=20)
+    with pytest.raises(ValueError):
+        with stage_profiler.step("model_trainer"):
+            raise ValueError("no model")
+
+    report = stage_profiler.write_report(stage_cache_report={"data_transformation": {"status": "hit"}})
+    assert report == read_yaml(str(tmp_path / "stage_profile.yaml"))
+    steps = {entry["name"]: entry for entry in report["steps"]}
+    assert list(steps) == ["data_transformation", "data_transformation/cleaning", "model_trainer"]
+    assert (steps["data_transformation"]["rows"], steps["data_transformation"]["bytes"]) == (15, 120)
+    assert steps["data_transformation"]["stage_cache"] == "hit"
+    assert steps["data_transformation/cleaning"]["rows"] == 7
+    assert steps["data_transformation/cleaning"]["cpu_seconds"] >= 0.04
+    assert steps["data_transformation"]["wall_seconds"] >= steps["data_transformation/cleaning"]["wall_seconds"]
+    assert steps["model_trainer"]["status"] == "failed" and steps["data_transformation"]["status"] == "completed"
+    for entry in steps.values():
+        assert entry["peak_rss_mb"] > 0 and entry["peak_rss_scope"] in (PEAK_RSS_STEP, PEAK_RSS_PROCESS)
+    assert report["peak_rss_mb"] >= max(entry["peak_rss_mb"] for entry in steps.values())
+    assert not stage_profiler.active
+
+
+def test_configured_steps_are_profiled(tmp_path):
+    stage_profiler = make_profiler(tmp_path, profile_steps=("cleaning",))
+    stage_profiler.start_run()
+    with stage_profiler.step("data_transformation"):
+        with stage_profiler.step("cleaning"):
+            busy(0.01)
+            with stage_profiler.step("cleaning"):
+                pass
+    report = stage_profiler.write_report()
+    steps = {entry["name"]: entry for entry in report["steps"]}
+    profile = steps["data_transformation/cleaning"]["profile"]
+    assert os.path.getsize(profile["stats_file_path"]) > 0
+    with open(profile["summary_file_path"]) as summary:
+        assert "function calls" in summary.read()
+    # a step inside a profiled step is not profiled again
+    assert "profile" not in steps["data_transformation"] and "profile" not in steps["data_transformation/cleaning/cleaning"]
+
+
+def test_steps_of_other_threads_are_not_nested(tmp_path):
+    stage_profiler = make_profiler(tmp_path)
+    stage_profiler.start_run()
+    def refit():
+        with stage_profiler.step("refit"):
+            stage_profiler.record(rows=3)
+
+    with stage_profiler.step("model_trainer"):
+        thread = threading.Thread(target=refit)
+        thread.start()
+        thread.join()
+    steps = stage_profiler.write_report()["steps"]
+    assert [entry["name"] for entry in steps] == ["model_trainer", "refit"]
+    assert steps[1]["rows"] == 3 and "rows" not in steps[0]
+
+
+def test_outside_a_run_steps_only_run_their_block(tmp_path):
+    for stage_profiler in (make_profiler(tmp_path), make_profiler(tmp_path, enabled=False)):
+        stage_profiler.start_run()
+        if stage_profiler.stage_profiler_config.enabled:
+            stage_profiler.write_report()
+        ran = []
+        with stage_profiler.step("data_ingestion"):
+            stage_profiler.record(rows=1)
+            ran.append(True)
+        assert ran == [True] and stage_profiler.write_report() is None
+
+
+def test_files_size(tmp_path):
+    (tmp_path / "a.parquet").write_bytes(b"x" * 10)
+    (tmp_path / "b.parquet").write_bytes(b"x" * 5)
+    assert files_size([str(tmp_path / "a.parquet"), str(tmp_path / "b.parquet"), str(tmp_path / "missing"), None]) == 15
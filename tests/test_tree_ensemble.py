@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from catboost import CatBoostRegressor
+from scipy import sparse
+from xgboost import XGBRegressor
+
+from HPP.entity.tree_ensemble import NUMBA_AVAILABLE, TreeEnsemble, compile_tree_ensemble
+
+EVALUATORS = [False, pytest.param(True, marks=pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed"))]
+
+
+def make_data(n_rows: int = 600, random_state: int = 0):
+    """
+    Sparse inputs shaped like the preprocessor output: one hot columns, scaled numbers with
+    missing values stored as NaN, and a column which is never set
+    """
+    random = np.random.RandomState(random_state)
+    onehot = np.eye(5)[random.randint(0, 5, n_rows)]
+    numbers = random.normal(size=(n_rows, 3))
+    numbers[random.rand(n_rows, 3) < 0.1] = np.nan
+    dense = np.hstack([onehot, numbers, np.zeros((n_rows, 1))]).astype(np.float32)
+    y = onehot @ np.arange(5) * 10 + np.nan_to_num(numbers[:, 0]) * 5 + np.nan_to_num(numbers[:, 1]) ** 2 \
+        + random.normal(scale=0.5, size=n_rows)
+    return sparse.csr_matrix(dense), y
+
+
+def fit_xgboost(**params) -> XGBRegressor:
+    x, y = make_data()
+    return XGBRegressor(n_estimators=40, max_depth=4, learning_rate=0.3, n_jobs=1, **params).fit(x, y)
+
+
+def fit_catboost(**params) -> CatBoostRegressor:
+    x, y = make_data()
+    return CatBoostRegressor(iterations=40, depth=4, learning_rate=0.3, thread_count=1, verbose=False,
+                             allow_writing_files=False, **params).fit(x, y)
+
+
+def assert_parity(model, tree_ensemble: TreeEnsemble, native: bool):
+    x, _ = make_data(n_rows=300, random_state=1)
+    probe = tree_ensemble.make_probe_matrix(n_rows=500)
+    for features in (x, probe):
+        np.testing.assert_allclose(tree_ensemble.predict(features, native=native), model.predict(features),
+                                   rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize("native", EVALUATORS)
+def test_xgboost_compiles_to_the_same_predictions(native):
+    model = fit_xgboost()
+    tree_ensemble = compile_tree_ensemble(model)
+    assert tree_ensemble.n_trees == 40 and not tree_ensemble.less_equal and tree_ensemble.sparse_missing_as_nan
+    assert_parity(model, tree_ensemble, native)
+
+
+@pytest.mark.parametrize("native", EVALUATORS)
+def test_catboost_compiles_to_the_same_predictions(native):
+    model = fit_catboost()
+    tree_ensemble = compile_tree_ensemble(model)
+    assert tree_ensemble.n_trees == 40 and tree_ensemble.less_equal and not tree_ensemble.sparse_missing_as_nan
+    assert_parity(model, tree_ensemble, native)
+
+
+@pytest.mark.parametrize("native", EVALUATORS)
+def test_xgboost_best_iteration_is_respected(native):
+    x_valid, y_valid = make_data(n_rows=200, random_state=2)
+    x, y = make_data()
+    model = XGBRegressor(n_estimators=300, max_depth=6, learning_rate=0.5, n_jobs=1, early_stopping_rounds=5)
+    model.fit(x, y, eval_set=[(x_valid, y_valid)], verbose=False)
+    assert model.best_iteration < 299
+
+    tree_ensemble = compile_tree_ensemble(model)
+    assert tree_ensemble.n_trees == model.best_iteration + 1
+    assert_parity(model, tree_ensemble, native)
+
+
+@pytest.mark.parametrize("native", EVALUATORS)
+def test_catboost_best_iteration_is_respected(native):
+    x_valid, y_valid = make_data(n_rows=200, random_state=2)
+    x, y = make_data()
+    model = CatBoostRegressor(iterations=300, depth=6, learning_rate=0.5, thread_count=1, verbose=False,
+                              allow_writing_files=False)
+    model.fit(x, y, eval_set=(x_valid, y_valid), early_stopping_rounds=5)
+    assert model.get_best_iteration() < 299
+
+    tree_ensemble = compile_tree_ensemble(model)
+    assert tree_ensemble.n_trees == model.get_best_iteration() + 1
+    assert_parity(model, tree_ensemble, native)
+
+
+def test_compiled_model_survives_npz_round_trip(tmp_path):
+    tree_ensemble = compile_tree_ensemble(fit_xgboost())
+    tree_ensemble.save(str(tmp_path / "model.npz"))
+    loaded = TreeEnsemble.load(str(tmp_path / "model.npz"))
+    x, _ = make_data(n_rows=100)
+    np.testing.assert_array_equal(loaded.predict(x, native=False), tree_ensemble.predict(x, native=False))
+
+
+def test_unsupported_models_are_rejected():
+    from sklearn.linear_model import LinearRegression
+
+    with pytest.raises(Exception, match="only XGBoost and CatBoost"):
+        compile_tree_ensemble(LinearRegression())
+    with pytest.raises(Exception, match="objective"):
+        compile_tree_ensemble(fit_xgboost(objective="count:poisson"))